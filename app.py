@@ -1,226 +1,282 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 import sqlite3
-from datetime import datetime, timedelta
-import plotly.express as px
 import plotly.graph_objects as go
-import bcrypt
 import os
+import tempfile
+from datetime import datetime, timedelta
+from auth import SESSION_COOKIE, SESSION_TTL, Authenticator, ServerBusy
 from create_database import create_database
-
-# At the top of your app.py, add these configurations
-st.set_page_config(
-    page_title="School Fees Calculator",
-    layout="wide",  # This makes the app use full width
-    initial_sidebar_state="expanded"
+from cache import ProjectionCache
+from db import (ConnectionPool, HistorySummaryCache, ACTUAL_VALUES_QUERY, HISTORY_PAGE_SIZE,
+                PROJECTION_VARIANCE_QUERY, VARIANCE_SUMMARY_QUERY,
+                history_count, history_page, projection_matrix, projection_series)
+from charts import (SENSITIVITY_METRICS, create_projection_chart, create_comparison_chart, create_fan_chart,
+                    create_sensitivity_heatmap, create_tornado_chart)
+from incremental import IncrementalProjection
+from instrumentation import HistogramSink, configure_from_env, instrumentation
+from jobs import ACTIVE_STATUSES, JobWorkers, cancel, job_result, submit, user_jobs
+from export import EXPORT_FORMATS, export_archive
+from engine import (
+    PROJECTION_YEARS, DEFAULT_FEES, DEFAULT_BONUS, annual_values, combine_fee_streams,
+    plan_years, calculate_projection, save_actual_values, store_projection
 )
 
-# Initialize connection to database
+# Initialize the connection pool shared by all sessions
 @st.cache_resource
 def init_connection():
-    def dict_factory(cursor, row):
-        d = {}
-        for idx, col in enumerate(cursor.description):
-            d[col[0]] = row[idx]
-        return d
-    
-    conn = sqlite3.connect('school_fees.db', check_same_thread=False)
-    conn.row_factory = sqlite3.Row  # Change to sqlite3.Row for better compatibility
-    return conn
+    return ConnectionPool('school_fees.db')
 
-def save_projection(conn, inputs, yearly_results):
-    cursor = conn.cursor()
+# Projection results shared across sessions and reruns
+@st.cache_resource
+def init_cache():
+    return ProjectionCache()
+
+# Per-user projection counts for the Historical Projections tab
+@st.cache_resource
+def init_history_summaries():
+    return HistorySummaryCache(init_connection())
+
+# Process-wide stage histograms, plus any sinks configured in the environment
+@st.cache_resource
+def init_instrumentation():
+    configure_from_env()
+    return instrumentation.add_sink(HistogramSink())
+
+# Password checks for every session run on this bounded bcrypt pool
+@st.cache_resource
+def init_authenticator():
+    return Authenticator(init_connection(), workers=int(os.environ.get('SCHOOL_FEES_BCRYPT_WORKERS', '2')))
+
+# Jobs are run by `python jobs.py work`, started next to the app. For a single
+# local server, SCHOOL_FEES_JOB_WORKERS=N has the app start N workers itself;
+# they are not shared with, or stopped by, other server instances or reloads.
+@st.cache_resource
+def init_job_workers():
+    workers = int(os.environ.get('SCHOOL_FEES_JOB_WORKERS', '0'))
+    return JobWorkers('school_fees.db', workers) if workers > 0 else None
+
+# Seconds between job status polls while a job is queued or running
+JOB_POLL_INTERVAL = 2
+
+def default_fee_table(years, child_start_years):
+    """The default fees for each child, shifted to start in that child's start year"""
+    if len(child_start_years) == 1:
+        names = ['Fees']
+    else:
+        names = [f"Child {child} Fees" for child in range(1, len(child_start_years) + 1)]
+    table = {'Year': years}
+    for name, start_year in zip(names, child_start_years):
+        table[name] = combine_fee_streams([(start_year, DEFAULT_FEES)], years)
+    return pd.DataFrame(table)
+
+def total_fees(fee_table):
+    """Year/Fees table with every child's fees added up"""
+    return pd.DataFrame({
+        'Year': fee_table['Year'],
+        'Fees': fee_table.drop(columns='Year').sum(axis=1)
+    })
+
+def live_projection(inputs, fees_data, bonus_data):
+    """Re-project from the first edited year, reusing this session's last run"""
+    years = plan_years(fees_data)
+    fees = annual_values(fees_data, 'Fees', years)
+    bonus = annual_values(bonus_data, 'Bonus', years)
     
-    try:
-        # Save main projection with user_id
-        cursor.execute("""
-            INSERT INTO projections (
-                projection_date, seed_capital, investment_rate, 
-                contribution_escalation, user_id
-            )
-            VALUES (?, ?, ?, ?, ?)
-        """, (
-            datetime.now().date(), 
-            inputs['seed_capital'], 
-            inputs['investment_rate'], 
-            inputs['contribution_escalation'],
-            st.session_state.user_id
-        ))
-        
-        projection_id = cursor.lastrowid
-        
-        # Save yearly projections
-        for year, values in yearly_results.items():
-            cursor.execute("""
-                INSERT INTO projected_values 
-                (projection_id, year, school_fees, monthly_contribution, annual_bonus, projected_balance)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (projection_id, year, values['school_fees'], 
-                  values['monthly_contribution'], values['annual_bonus'], 
-                  values['balance']))
-        
-        conn.commit()
-        st.success("Projection saved successfully!")
-    except Exception as e:
-        st.error(f"Error saving projection: {str(e)}")
-        conn.rollback()
-
-def save_actual_values(conn, year, values):
-    cursor = conn.cursor()
-    cursor.execute("""
-        INSERT OR REPLACE INTO actual_values 
-        (year, school_fees, monthly_contribution, annual_bonus, actual_balance)
-        VALUES (?, ?, ?, ?, ?)
-    """, (year, values['school_fees'], values['monthly_contribution'],
-          values['annual_bonus'], values['balance']))
-    conn.commit()
-
-def calculate_monthly_contribution(inputs, fees_data, bonus_data):
-    def calculate_future_value(monthly_payment):
-        balance = float(inputs['seed_capital'])
-        monthly_payment_current = monthly_payment
-        MONTHLY_RATE = (1 + float(inputs['investment_rate'])) ** (1/12) - 1
-        
-        # Only simulate up to 2039
-        for year in range(2025, 2040):  # Changed end year to 2040 (exclusive)
-            # Get annual values for this year
-            school_fees = float(fees_data[fees_data['Year'] == year]['Fees'].iloc[0])
-            annual_bonus = float(bonus_data[bonus_data['Year'] == year]['Bonus'].iloc[0])
-            
-            # Deduct school fees at start of year (except first year)
-            if year > 2025:
-                if balance < school_fees:
-                    return float('-inf')
-                balance -= school_fees
-            
-            # Monthly contributions and growth
-            for _ in range(12):
-                balance += monthly_payment_current
-                balance *= (1 + MONTHLY_RATE)
-            
-            # Add bonus at end of year
-            balance += annual_bonus
-            monthly_payment_current *= (1 + float(inputs['contribution_escalation']))
-        
-        return balance
+    projection = st.session_state.get('live_projection')
+    if projection is None or projection.inputs != inputs or projection.years != years:
+        projection = IncrementalProjection(inputs, fees, bonus, years)
+        st.session_state.live_projection = projection
+    return projection.update(fees, bonus)
+
+# Goal seek targets and how their answers are shown
+GOAL_TARGETS = {
+    'seed_capital': ("Seed Capital Needed", lambda value: f"R{value:,.2f}"),
+    'investment_rate': ("Investment Rate Needed", lambda value: f"{value*100:.2f}%"),
+    'contribution_escalation': ("Contribution Escalation Needed", lambda value: f"{value*100:.2f}%"),
+    'fees_scale': ("Maximum Affordable Fees", lambda value: f"{value:.4f} x current fees"),
+}
 
-    # Binary search to find optimal monthly payment
-    payment_low = 0
-    payment_high = max(fees_data['Fees']) / 12 * 3
+def goal_seek_panel(inputs, fees_data, bonus_data):
+    target = st.selectbox("Solve For", list(GOAL_TARGETS), format_func=lambda name: GOAL_TARGETS[name][0])
+    payment = st.number_input("Monthly Contribution", value=10000.0, min_value=0.0, key='goal_payment')
     
-    while payment_high - payment_low > 0.01:
-        payment_mid = (payment_low + payment_high) / 2
-        final_balance = calculate_future_value(payment_mid)
-        
-        if final_balance == float('-inf'):
-            payment_low = payment_mid
-        elif abs(final_balance) < 1:
-            return payment_mid
-        elif final_balance < 0:
-            payment_low = payment_mid
+    if st.button("Solve"):
+        # NumPy is only needed once a goal is solved
+        from goal_seek import goal_seek
+        years = plan_years(fees_data)
+        result = goal_seek(
+            target, inputs,
+            annual_values(fees_data, 'Fees', years),
+            annual_values(bonus_data, 'Bonus', years),
+            payment
+        )
+        label, formatted = GOAL_TARGETS[target]
+        value = result['value'][0]
+        if not result['applicable'][0]:
+            st.info("This plan has no school fees, so there is nothing to scale.")
+        elif result['converged'][0]:
+            st.metric(label, formatted(value))
+            st.caption(f"{result['iterations'][0]} root-finding steps, "
+                       f"{result['evaluations']} projection solves")
+        elif value != value:
+            st.warning("The plan cannot work at this monthly contribution.")
         else:
-            payment_high = payment_mid
-    
-    return payment_low
+            st.info(f"The plan already works at the lowest value searched ({formatted(value)}).")
 
-def calculate_projection(inputs, fees_data, bonus_data):
-    # Calculate initial monthly payment
-    initial_monthly_payment = calculate_monthly_contribution(inputs, fees_data, bonus_data)
-    
-    balance = float(inputs['seed_capital'])
-    monthly_payment = initial_monthly_payment
-    MONTHLY_RATE = (1 + float(inputs['investment_rate'])) ** (1/12) - 1
+def sensitivity_panel(inputs, fees_data, bonus_data):
+    col1, col2, col3 = st.columns(3)
+    rate_range = col1.slider("Investment Rate Range", -0.05, 0.25,
+                             (max(-0.05, inputs['investment_rate'] - 0.04), min(0.25, inputs['investment_rate'] + 0.04)),
+                             step=0.0025, format="%.4f")
+    escalation_range = col2.slider("Contribution Escalation Range", -0.05, 0.25, (0.0, 0.10),
+                                   step=0.0025, format="%.4f")
+    steps = int(col3.number_input("Grid Size", value=200, min_value=10, max_value=400, step=10))
+    metric = st.selectbox("Sensitivity Metric", list(SENSITIVITY_METRICS), format_func=SENSITIVITY_METRICS.get)
+    change = st.number_input("Tornado Change", value=0.10, min_value=0.01, max_value=0.5, format="%.2f",
+                             help="Fraction each input is moved down and up by")
     
-    yearly_results = {}
+    if st.button("Analyse Sensitivity"):
+        # NumPy is only needed once an analysis is requested
+        import numpy as np
+        from sensitivity import sensitivity_grid, tornado
+        years = plan_years(fees_data)
+        fees = annual_values(fees_data, 'Fees', years)
+        bonus = annual_values(bonus_data, 'Bonus', years)
+        grid = sensitivity_grid(inputs, fees, bonus,
+                                np.linspace(*rate_range, steps), np.linspace(*escalation_range, steps))
+        st.plotly_chart(create_sensitivity_heatmap(grid, metric, inputs))
+        st.plotly_chart(create_tornado_chart(tornado(inputs, fees, bonus, years, change), metric))
+        if metric != 'monthly_contribution':
+            st.caption(f"Balances at the current plan's required contribution of "
+                       f"R {grid['fixed_contribution']:,.2f} a month.")
+
+def jobs_panel(polling):
+    """This user's background jobs; reruns the whole app once the last one finishes"""
+    pool = init_connection()
+    jobs = user_jobs(pool, st.session_state.user_id, limit=5)
+    if polling and not any(job['status'] in ACTIVE_STATUSES for job in jobs):
+        st.rerun()
     
-    # Only project up to 2039
-    for year in range(2025, 2040):  # Changed end year to 2040 (exclusive)
-        starting_balance = balance
-        
-        # Get annual values
-        school_fees = float(fees_data[fees_data['Year'] == year]['Fees'].iloc[0])
-        annual_bonus = float(bonus_data[bonus_data['Year'] == year]['Bonus'].iloc[0])
-        
-        # Deduct school fees at start of year (except first year)
-        if year > 2025:
-            balance -= school_fees
-            print(f"Year {year} - Deducted school fees: R{school_fees:,.2f}")
-            print(f"Balance after fees: R{balance:,.2f}")
-        
-        # Monthly contributions and growth
-        annual_contributions = 0
-        for _ in range(12):
-            balance += monthly_payment
-            annual_contributions += monthly_payment
-            balance *= (1 + MONTHLY_RATE)
-        
-        # Add annual bonus at end of year
-        balance += annual_bonus
-        
-        yearly_results[year] = {
-            'school_fees': float(school_fees),
-            'monthly_contribution': float(monthly_payment),
-            'annual_contributions': float(annual_contributions),
-            'annual_bonus': float(annual_bonus),
-            'balance': float(balance),
-            'investment_return': float(balance - starting_balance - annual_contributions - annual_bonus + 
-                                    (school_fees if year > 2025 else 0))
+    for job in jobs:
+        params = job['params']
+        col1, col2 = st.columns([4, 1])
+        col1.write(f"Job {job['id']} ({job['kind']}): {job['status']}")
+        if job['status'] in ACTIVE_STATUSES:
+            col1.progress(job['progress'], text=job['message'])
+            col2.button("Cancel", key=f"cancel_job_{job['id']}", on_click=cancel, args=(pool, job['id']),
+                        disabled=bool(job['cancel_requested']))
+        elif job['status'] == 'failed':
+            col1.error(job['error'])
+        elif job['status'] == 'done' and job['kind'] == 'simulation':
+            with col1.expander(f"{params['paths']:,} Path Simulation"):
+                simulation = job_result(pool, job['id'])
+                simulation['percentiles'] = dict(simulation['percentiles'])
+                st.metric("Chance of Running Short", f"{simulation['shortfall_probability']*100:.1f}%")
+                st.plotly_chart(create_fan_chart(simulation, params['years']), key=f"job_chart_{job['id']}")
+
+def history_filters():
+    """Historical Projections filters; only the ones that are set are returned"""
+    with st.expander("Filter Projections"):
+        col1, col2 = st.columns(2)
+        filters = {
+            'date_from': col1.date_input("From Date", value=None),
+            'date_to': col2.date_input("To Date", value=None),
+            'min_rate': col1.number_input("Min Investment Rate", value=None, format="%.4f"),
+            'max_rate': col2.number_input("Max Investment Rate", value=None, format="%.4f"),
+            'min_seed': col1.number_input("Min Seed Capital", value=None, min_value=0.0),
+            'max_seed': col2.number_input("Max Seed Capital", value=None, min_value=0.0),
         }
-        
-        # Increase monthly payment for next year
-        monthly_payment *= (1 + float(inputs['contribution_escalation']))
-    
-    return yearly_results
+    return {name: value for name, value in filters.items() if value is not None}
 
-def create_projection_chart(yearly_results):
-    df = pd.DataFrame.from_dict(yearly_results, orient='index')
-    df = df.astype(float)
-    df.reset_index(inplace=True)
-    df.rename(columns={'index': 'Year'}, inplace=True)
-    
-    fig = go.Figure()
+# Shared display format for Rand amounts in st.dataframe
+RAND_FORMAT = "R%,.2f"
+
+# Years actual values can be recorded for, whatever plan the Calculator shows
+ACTUAL_YEARS = range(2000, 2101)
+
+def history_cursors(user_id, filters, page_size):
+    """Keyset cursors of the pages visited so far; reset when the filters change"""
+    key = (user_id, tuple(sorted(filters.items())), page_size)
+    if st.session_state.get('history_key') != key:
+        st.session_state.history_key = key
+        st.session_state.history_cursors = [None]
+    return st.session_state.history_cursors
+
+def history_archive(pool, user_id, fmt):
+    """Zip of the user's exported history, in an anonymous temporary file"""
+    archive = tempfile.TemporaryFile()
+    export_archive(pool, user_id, archive, fmt)
+    archive.seek(0)
+    return archive
+
+def performance_panel(timings, histogram):
+    st.sidebar.markdown("---")
+    st.sidebar.subheader("Performance")
     
-    # Add balance line
-    fig.add_trace(go.Scatter(
-        x=df['Year'].astype(int),
-        y=df['balance'].astype(float),
-        name='Projected Balance',
-        line=dict(color='blue')
-    ))
+    if timings:
+        st.sidebar.caption("This rerun")
+        st.sidebar.dataframe(
+            pd.DataFrame(timings, columns=['Stage', 'ms']),
+            hide_index=True
+        )
     
-    # Add school fees bars
-    fig.add_trace(go.Bar(
-        x=df['Year'].astype(int),
-        y=df['school_fees'].astype(float),
-        name='School Fees',
-        marker_color='red',
-        opacity=0.6
-    ))
+    summary = histogram.summary()
+    if summary['stages']:
+        st.sidebar.caption("All sessions")
+        st.sidebar.dataframe(
+            pd.DataFrame.from_dict(summary['stages'], orient='index').round(3)
+        )
+    if summary['counters']:
+        st.sidebar.caption("Counters")
+        st.sidebar.json(summary['counters'])
     
-    fig.update_layout(
-        title='Projected Balance vs School Fees',
-        xaxis_title='Year',
-        yaxis_title='Amount',
-        hovermode='x unified',
-        showlegend=True
-    )
+    st.sidebar.caption("Connection pool")
+    st.sidebar.json(init_connection().metrics())
     
-    return fig
+    st.sidebar.caption("Authentication")
+    st.sidebar.json(init_authenticator().metrics())
+
+def save_projection(pool, inputs, yearly_results):
+    try:
+        store_projection(pool, inputs, yearly_results, st.session_state.user_id)
+        
+        st.success("Projection saved successfully!")
+    except Exception as e:
+        st.error(f"Error saving projection: {str(e)}")
 
 def init_session_state():
     if 'user_id' not in st.session_state:
         st.session_state.user_id = None
     if 'username' not in st.session_state:
         st.session_state.username = None
+    
+    # A browser refresh starts a new session; pick the login up from its cookie
+    if 'session_checked' not in st.session_state:
+        st.session_state.session_checked = True
+        session = init_authenticator().session(st.context.cookies.get(SESSION_COOKIE))
+        if session:
+            st.session_state.user_id, st.session_state.username = session
 
-def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+def sync_session_cookie():
+    """Write or clear the session cookie queued by the last login or logout"""
+    if 'session_cookie' not in st.session_state:
+        return
+    token = st.session_state.pop('session_cookie')
+    # Only needed when the cookie changes
+    from extra_streamlit_components import CookieManager
+    if token:
+        expires_at = datetime.now() + timedelta(seconds=SESSION_TTL)
+    else:
+        token, expires_at = '', datetime(1970, 1, 1)
+    CookieManager(key='session_cookies').set(SESSION_COOKIE, token, key='set_session',
+                                             expires_at=expires_at)
 
-def verify_password(password: str, hash_str: str) -> bool:
-    return bcrypt.checkpw(password.encode('utf-8'), hash_str.encode('utf-8'))
+LOGIN_ERRORS = {
+    'invalid': "Invalid username or password",
+    'rate_limited': "Too many failed attempts. Please wait a minute and try again.",
+    'busy': "The server is busy. Please try again in a moment.",
+}
 
 def login_user():
     st.sidebar.title("Login")
@@ -228,18 +284,17 @@ def login_user():
     password = st.sidebar.text_input("Password", type="password")
     
     if st.sidebar.button("Login"):
-        conn = init_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, password_hash FROM users WHERE username = ?", (username,))
-        user = cursor.fetchone()
+        authenticator = init_authenticator()
+        status, user_id = authenticator.login(username, password)
         
-        if user and verify_password(password, user['password_hash']):
-            st.session_state.user_id = user['id']
+        if status == 'ok':
+            st.session_state.user_id = user_id
             st.session_state.username = username
+            st.session_state.session_cookie = authenticator.issue_token(user_id, username)
             st.sidebar.success("Logged in successfully!")
             st.rerun()
         else:
-            st.sidebar.error("Invalid username or password")
+            st.sidebar.error(LOGIN_ERRORS[status])
 
 def register_user():
     st.sidebar.title("Register")
@@ -252,24 +307,22 @@ def register_user():
             st.sidebar.error("Passwords don't match!")
             return
             
-        conn = init_connection()
-        cursor = conn.cursor()
         try:
-            hashed_pw = hash_password(new_password)
-            cursor.execute(
-                "INSERT INTO users (username, password_hash) VALUES (?, ?)",
-                (new_username, hashed_pw)
-            )
-            conn.commit()
+            init_authenticator().register(new_username, new_password)
             st.sidebar.success("Registration successful! Please login.")
         except sqlite3.IntegrityError:
             st.sidebar.error("Username already exists!")
+        except ServerBusy:
+            st.sidebar.error(LOGIN_ERRORS['busy'])
 
 def ensure_database_exists():
     """Ensure the database exists and has all required tables"""
     try:
-        if not os.path.exists('school_fees.db'):
-            create_database()
+        existed = os.path.exists('school_fees.db')
+        # Also applies any pending schema migrations to an existing database
+        if not create_database():
+            return False
+        if not existed:
             st.success("Database created successfully!")
         return True
     except Exception as e:
@@ -277,12 +330,20 @@ def ensure_database_exists():
         return False
 
 def main():
+    # Must be the first Streamlit call of every run
+    st.set_page_config(
+        page_title="School Fees Calculator",
+        layout="wide",  # This makes the app use full width
+        initial_sidebar_state="expanded"
+    )
+    
     # Ensure database exists before proceeding
     if not ensure_database_exists():
         st.error("Could not initialize database. Please contact support.")
         return
 
     init_session_state()
+    sync_session_cookie()
     
     # Authentication sidebar
     if not st.session_state.user_id:
@@ -295,56 +356,28 @@ def main():
     # Rest of your main app code...
     st.sidebar.markdown(f"Welcome, {st.session_state.username}!")
     if st.sidebar.button("Logout"):
+        # A copy of the session cookie must stop working too
+        init_authenticator().revoke_sessions(st.session_state.user_id)
         st.session_state.user_id = None
         st.session_state.username = None
+        st.session_state.session_cookie = None
         st.rerun()
 
-    st.title("School Fees Projection Calculator")
+    histogram = init_instrumentation()
+    show_performance = st.sidebar.checkbox("Show performance panel")
     
-    conn = init_connection()
+    # Time every stage of this rerun
+    with instrumentation.collect() as timings:
+        render_tabs()
     
-    # Load initial data
-    fees_df = pd.DataFrame({
-        'Year': range(2025, 2040),  # Changed to 2040 (exclusive)
-        'Fees': [
-            0,      # 2025
-            181413, # 2026
-            203907, # 2027
-            259330, # 2028
-            287039, # 2029
-            311901, # 2030
-            323677, # 2031
-            359029, # 2032
-            384372, # 2033
-            411551, # 2034
-            465033, # 2035
-            497920, # 2036
-            524159, # 2037
-            554905, # 2038
-            627957  # 2039
-        ]
-    })
+    if show_performance:
+        performance_panel(timings, histogram)
+
+def render_tabs():
+    st.title("School Fees Projection Calculator")
     
-    bonus_df = pd.DataFrame({
-        'Year': range(2025, 2040),  # Changed to 2040 (exclusive)
-        'Bonus': [
-            50000,  # 2025
-            75000,  # 2026
-            78750,  # 2027
-            82688,  # 2028
-            86822,  # 2029
-            91163,  # 2030
-            95721,  # 2031
-            100507, # 2032
-            105533, # 2033
-            110809, # 2034
-            116350, # 2035
-            122167, # 2036
-            128256, # 2037
-            134629, # 2038
-            0       # 2039
-        ]
-    })
+    pool = init_connection()
+    cache = init_cache()
     
     tab1, tab2, tab3 = st.tabs(["Calculator", "Historical Projections", "Actual Values"])
     
@@ -356,24 +389,74 @@ def main():
         investment_rate = st.number_input("Investment Rate", value=0.0878, format="%.4f")
         contribution_escalation = st.number_input("Contribution Escalation", value=0.05, format="%.4f")
         
+        # Plan horizon and one fee stream per child
+        col1, col2, col3 = st.columns(3)
+        start_year = int(col1.number_input("Start Year", value=PROJECTION_YEARS.start, step=1))
+        horizon = int(col2.number_input("Horizon (Years)", value=len(PROJECTION_YEARS),
+                                        min_value=1, max_value=60, step=1))
+        children = int(col3.number_input("Children", value=1, min_value=1, max_value=8, step=1))
+        years = list(range(start_year, start_year + horizon))
+        child_start_years = [start_year]
+        if children > 1:
+            with st.expander("Children's Start Years"):
+                child_start_years = [
+                    int(st.number_input(f"Child {child} Start Year", value=start_year + 3 * (child - 1), step=1))
+                    for child in range(1, children + 1)
+                ]
+        
+        # Load initial data
+        fees_df = default_fee_table(years, child_start_years)
+        bonus_df = pd.DataFrame({
+            'Year': years,
+            'Bonus': (DEFAULT_BONUS + [0] * horizon)[:horizon]
+        })
+        
         # Editable tables for fees and bonus
         with st.expander("Edit School Fees"):
-            edited_fees = st.data_editor(fees_df, num_rows="fixed")
+            edited_fees = total_fees(st.data_editor(fees_df, num_rows="fixed"))
         
         with st.expander("Edit Annual Bonus"):
             edited_bonus = st.data_editor(bonus_df, num_rows="fixed")
         
-        if st.button("Calculate Projection"):
+        with st.expander("Stochastic Returns"):
+            stochastic = st.checkbox("Simulate random investment returns")
+            volatility = st.number_input("Return Volatility", value=0.15, min_value=0.0, format="%.4f")
+            paths = st.number_input("Simulated Paths", value=10000, min_value=100, max_value=1000000, step=1000)
+            random_seed = st.number_input("Random Seed", value=42, min_value=0, step=1)
+            background = st.checkbox("Run in background",
+                                     help="Queue the simulation as a job and keep using the app")
+        
+        with st.expander("Goal Seek"):
+            goal_seek_panel({
+                'seed_capital': seed_capital,
+                'investment_rate': investment_rate,
+                'contribution_escalation': contribution_escalation
+            }, edited_fees, edited_bonus)
+        
+        with st.expander("Sensitivity Analysis"):
+            sensitivity_panel({
+                'seed_capital': seed_capital,
+                'investment_rate': investment_rate,
+                'contribution_escalation': contribution_escalation
+            }, edited_fees, edited_bonus)
+        
+        live = st.checkbox("Live recalculation", help="Update the projection as the tables are edited")
+        calculate = st.button("Calculate Projection")
+        
+        if calculate or live:
             inputs = {
                 'seed_capital': seed_capital,
                 'investment_rate': investment_rate,
                 'contribution_escalation': contribution_escalation
             }
             
-            yearly_results = calculate_projection(inputs, edited_fees, edited_bonus)
-            
-            # Save projection to database
-            save_projection(conn, inputs, yearly_results)
+            if calculate:
+                yearly_results = cache.projection(inputs, edited_fees, edited_bonus, calculate_projection)
+                
+                # Save projection to database
+                save_projection(pool, inputs, yearly_results)
+            else:
+                yearly_results = live_projection(inputs, edited_fees, edited_bonus)
             
             # Display results
             fig = create_projection_chart(yearly_results)
@@ -384,47 +467,90 @@ def main():
             results_df.reset_index(inplace=True)
             results_df.rename(columns={'index': 'Year'}, inplace=True)
             st.dataframe(results_df)
+            
+            if stochastic and calculate:
+                # NumPy is only needed once a simulation is requested
+                from simulation import simulate_projection
+                years = list(yearly_results)
+                params = {
+                    'inputs': inputs,
+                    'fees': annual_values(edited_fees, 'Fees', years),
+                    'bonus': annual_values(edited_bonus, 'Bonus', years),
+                    'volatility': volatility,
+                    'paths': int(paths),
+                    'seed': int(random_seed),
+                    'workers': min(4, os.cpu_count() or 1)
+                }
+                if background:
+                    job_id = submit(pool, 'simulation', dict(params, years=years),
+                                    user_id=st.session_state.user_id)
+                    st.success(f"Simulation queued as job {job_id}.")
+                    if init_job_workers() is None:
+                        st.caption("It runs once a job worker (`python jobs.py work`) picks it up.")
+                else:
+                    simulation = simulate_projection(
+                        params.pop('inputs'), params.pop('fees'), params.pop('bonus'), **params
+                    )
+                    st.metric("Chance of Running Short", f"{simulation['shortfall_probability']*100:.1f}%")
+                    st.plotly_chart(create_fan_chart(simulation, years))
+        
+        # Poll only while one of this user's jobs is queued or running
+        init_job_workers()
+        jobs = user_jobs(pool, st.session_state.user_id, limit=5)
+        if jobs:
+            st.subheader("Background Jobs")
+            polling = any(job['status'] in ACTIVE_STATUSES for job in jobs)
+            st.fragment(jobs_panel, run_every=JOB_POLL_INTERVAL if polling else None)(polling)
     
     with tab2:
         st.header("Historical Projections")
         
         try:
-            # Query historical projections for current user
-            projections = pd.read_sql_query("""
-                SELECT 
-                    p.id,
-                    p.projection_date,
-                    p.seed_capital,
-                    p.investment_rate,
-                    p.contribution_escalation,
-                    COUNT(pv.id) as value_count
-                FROM projections p
-                LEFT JOIN projected_values pv ON p.id = pv.projection_id
-                WHERE p.user_id = ?
-                GROUP BY p.id
-                ORDER BY p.projection_date DESC
-            """, conn, params=(st.session_state.user_id,))
+            user_id = st.session_state.user_id
+            summary = init_history_summaries().get(user_id)
+            filters = history_filters()
+            page_size = st.selectbox("Projections per Page", [HISTORY_PAGE_SIZE, 50, 100])
+            cursors = history_cursors(user_id, filters, page_size)
+            
+            # Fetch only the visible page of the current user's projections
+            with instrumentation.timer('history_query'), pool.read() as conn:
+                page, next_cursor = history_page(conn, user_id, filters, cursors[-1], page_size)
+                matching = history_count(conn, user_id, filters) if filters else summary['count']
             
-            if projections.empty:
+            if summary['count'] == 0:
                 st.info("No historical projections found for your account.")
+            elif not page:
+                st.info("No projections match the filters.")
             else:
+                first = (len(cursors) - 1) * page_size + 1
+                st.caption(f"Showing {first:,}-{first + len(page) - 1:,} of {matching:,} "
+                           f"matching projections ({summary['count']:,} saved)")
+                
+                col1, col2 = st.columns(2)
+                col1.button("Previous Page", disabled=len(cursors) == 1,
+                            on_click=cursors.pop)
+                col2.button("Next Page", disabled=next_cursor is None,
+                            on_click=cursors.append, args=(next_cursor,))
+                
                 st.write("Select a projection to view:")
                 
                 # Format the selection box to show more details
+                projections = {proj['id']: proj for proj in page}
+                
                 def format_projection(proj_id):
-                    proj = projections[projections['id'] == proj_id].iloc[0]
+                    proj = projections[proj_id]
                     return (f"Projection {proj_id} - {proj['projection_date']} "
                            f"(Seed: {proj['seed_capital']:,.2f}, Rate: {proj['investment_rate']*100:.1f}%)")
                 
                 selected_projection = st.selectbox(
                     "Historical Projections",
-                    projections['id'].tolist(),
+                    list(projections),
                     format_func=format_projection
                 )
                 
                 if selected_projection:
                     # Show projection details
-                    proj_details = projections[projections['id'] == selected_projection].iloc[0]
+                    proj_details = projections[selected_projection]
                     st.write("Projection Details:")
                     st.write(f"- Date: {proj_details['projection_date']}")
                     st.write(f"- Seed Capital: R{proj_details['seed_capital']:,.2f}")
@@ -432,27 +558,21 @@ def main():
                     st.write(f"- Contribution Escalation: {proj_details['contribution_escalation']*100:.1f}%")
                     
                     # Get projection data
-                    projection_data = pd.read_sql_query("""
-                        SELECT 
-                            year,
-                            school_fees,
-                            monthly_contribution,
-                            annual_bonus,
-                            projected_balance
-                        FROM projected_values
-                        WHERE projection_id = ?
-                        ORDER BY year
-                    """, conn, params=(selected_projection,))
+                    with instrumentation.timer('history_query'), pool.read() as conn:
+                        series = projection_series(conn, selected_projection)
+                        variance_data = pd.read_sql_query(
+                            PROJECTION_VARIANCE_QUERY, conn, params=(selected_projection,)
+                        )
+                    projection_data = pd.DataFrame(series or {})
                     
                     if projection_data.empty:
                         st.warning("No detailed data found for this projection.")
                     else:
-                        # Format the dataframe for display
-                        display_df = projection_data.copy()
-                        for col in ['school_fees', 'monthly_contribution', 'annual_bonus', 'projected_balance']:
-                            display_df[col] = display_df[col].apply(lambda x: f"R{x:,.2f}")
-                        
-                        st.dataframe(display_df)
+                        # Format the amounts for display without touching the data
+                        st.dataframe(projection_data, column_config={
+                            col: st.column_config.NumberColumn(format=RAND_FORMAT)
+                            for col in ['school_fees', 'monthly_contribution', 'annual_bonus', 'projected_balance']
+                        })
                         
                         # Create visualization
                         fig = go.Figure()
@@ -478,6 +598,59 @@ def main():
                         )
                         
                         st.plotly_chart(fig, use_container_width=True)
+                    
+                    if not variance_data.empty:
+                        st.write("Projected minus actual values:")
+                        st.dataframe(variance_data, hide_index=True, column_config={
+                            col: st.column_config.NumberColumn(format=RAND_FORMAT)
+                            for col in ['balance_variance', 'fees_variance', 'contribution_variance']
+                        })
+                
+                st.subheader("Compare Projections")
+                if st.checkbox("Compare every projection on this page"):
+                    compare_ids = list(projections)
+                else:
+                    compare_ids = st.multiselect(
+                        "Projections to Compare",
+                        list(projections),
+                        format_func=format_projection
+                    )
+                
+                if compare_ids:
+                    # One query for every selected series, plus the actual values
+                    with instrumentation.timer('history_query'), pool.read() as conn:
+                        matrix = projection_matrix(conn, compare_ids)
+                        actual_data = pd.read_sql_query(ACTUAL_VALUES_QUERY, conn, params=(user_id,))
+                    
+                    if matrix is None:
+                        st.warning("No detailed data found for the selected projections.")
+                    else:
+                        labels = [f"Projection {proj_id} ({projections[proj_id]['projection_date']})"
+                                  for proj_id in matrix['ids']]
+                        st.plotly_chart(
+                            create_comparison_chart(matrix['year'], matrix['projected_balance'],
+                                                    labels, actual_data),
+                            use_container_width=True
+                        )
+                        comparison_df = pd.DataFrame(
+                            matrix['projected_balance'].T,
+                            index=pd.Index(matrix['year'], name='Year'),
+                            columns=labels
+                        )
+                        st.dataframe(comparison_df, column_config={
+                            label: st.column_config.NumberColumn(format=RAND_FORMAT) for label in labels
+                        })
+            
+            if summary['count']:
+                with st.expander("Export History"):
+                    export_format = st.selectbox("Export Format", EXPORT_FORMATS)
+                    # Built only when clicked, off the script thread
+                    st.download_button(
+                        "Download History",
+                        data=lambda: history_archive(pool, user_id, export_format),
+                        file_name=f"projection_history_{export_format}.zip",
+                        mime="application/zip"
+                    )
                         
         except Exception as e:
             st.error(f"Error loading historical projections: {str(e)}")
@@ -486,7 +659,8 @@ def main():
         st.header("Actual Values")
         
         # Form for adding actual values
-        year = st.number_input("Year", min_value=2025, max_value=2039, step=1)
+        year = st.number_input("Year", value=datetime.now().year, min_value=ACTUAL_YEARS.start,
+                               max_value=ACTUAL_YEARS[-1], step=1)
         actual_fees = st.number_input("Actual School Fees", min_value=0.0)
         actual_monthly = st.number_input("Actual Monthly Contribution", min_value=0.0)
         actual_bonus = st.number_input("Actual Annual Bonus", min_value=0.0)
@@ -499,17 +673,27 @@ def main():
                 'annual_bonus': actual_bonus,
                 'balance': actual_balance
             }
-            save_actual_values(conn, year, values)
+            save_actual_values(pool, year, values, st.session_state.user_id)
             st.success(f"Actual values for {year} saved successfully!")
         
         # Display actual values
-        actual_data = pd.read_sql_query("""
-            SELECT * FROM actual_values ORDER BY year
-        """, conn)
+        with pool.read() as conn:
+            actual_data = pd.read_sql_query(ACTUAL_VALUES_QUERY, conn, params=(st.session_state.user_id,))
+            variance_summary = pd.read_sql_query(
+                VARIANCE_SUMMARY_QUERY, conn, params=(st.session_state.user_id,)
+            )
         
         if not actual_data.empty:
             st.subheader("Recorded Actual Values")
             st.dataframe(actual_data)
+        
+        if not variance_summary.empty:
+            # Maintained as projections and actual values are saved; nothing is recomputed here
+            st.subheader("Projected vs Actual")
+            st.dataframe(variance_summary, hide_index=True, column_config={
+                col: st.column_config.NumberColumn(format=RAND_FORMAT)
+                for col in variance_summary.columns if col.endswith('variance')
+            })
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
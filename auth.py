@@ -0,0 +1,224 @@
+"""Password checks off the script thread, login rate limiting and session tokens.
+
+bcrypt is deliberately slow, so the Authenticator runs it on a small thread
+pool (bcrypt releases the GIL) with a bounded number of waiting calls: a
+login storm queues at most `max_pending` checks and the rest are turned away
+at once instead of piling up CPU work. Usernames with `max_failures` failed
+attempts inside `window` seconds are refused before any hashing.
+
+A successful login issues an HMAC-SHA256 signed session token holding the
+user id, username, expiry and the user's token version. The app keeps it in
+a cookie, so a browser refresh resumes the session from the signature and
+one primary-key read of the version, without bcrypt. Logging out or changing
+the password bumps the version, which revokes every token issued before.
+The signing key is SCHOOL_FEES_SECRET_KEY if set, otherwise the random key
+created with the database.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from instrumentation import instrumentation
+
+SESSION_COOKIE = 'school_fees_session'
+SESSION_TTL = 7 * 24 * 3600
+
+class ServerBusy(Exception):
+    """Too many password checks are already waiting"""
+
+def hash_password(password: str) -> str:
+    import bcrypt
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+
+def verify_password(password: str, hash_str: str) -> bool:
+    import bcrypt
+    return bcrypt.checkpw(password.encode('utf-8'), hash_str.encode('utf-8'))
+
+def session_secret(pool):
+    """The session signing key: SCHOOL_FEES_SECRET_KEY, else the database's own"""
+    secret = os.environ.get('SCHOOL_FEES_SECRET_KEY')
+    if not secret:
+        with pool.read() as conn:
+            secret = conn.execute(
+                "SELECT value FROM settings WHERE name = 'session_secret'"
+            ).fetchone()[0]
+    return secret.encode('utf-8')
+
+def _encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=')
+
+def _decode(text):
+    return base64.urlsafe_b64decode(text + b'=' * (-len(text) % 4))
+
+def issue_token(secret, user_id, username, version, ttl=SESSION_TTL, now=None):
+    """Signed token for a logged-in user, valid for `ttl` seconds or until
+    the user's token version moves on from `version`"""
+    expires = int((time.time() if now is None else now) + ttl)
+    body = _encode(json.dumps(
+        {'uid': user_id, 'name': username, 'exp': expires, 'ver': version}, separators=(',', ':')
+    ).encode('utf-8'))
+    signature = _encode(hmac.new(secret, body, hashlib.sha256).digest())
+    return (body + b'.' + signature).decode('ascii')
+
+def verify_token(secret, token, token_version, now=None):
+    """(user_id, username) from a correctly signed, unexpired, unrevoked token, else None.
+
+    `token_version(user_id)` gives the user's current token version, or None
+    if there is no such user.
+    """
+    try:
+        body, signature = token.encode('ascii').split(b'.')
+        expected = _encode(hmac.new(secret, body, hashlib.sha256).digest())
+        if not hmac.compare_digest(signature, expected):
+            return None
+        payload = json.loads(_decode(body))
+    except (AttributeError, UnicodeError, ValueError):
+        return None
+    if payload['exp'] <= (time.time() if now is None else now):
+        return None
+    if payload.get('ver') != token_version(payload['uid']):
+        return None
+    return payload['uid'], payload['name']
+
+class Authenticator:
+    def __init__(self, pool, workers=2, max_pending=16, max_failures=5, window=60.0):
+        self.secret = session_secret(pool)
+        self.workers = workers
+        self.max_failures = max_failures
+        self.window = window
+        self._pool = pool
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt')
+        # One slot per running or waiting check
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._failures = defaultdict(deque)
+
+    def _run(self, function, *args):
+        """Run a bcrypt call on the pool and wait for it; ServerBusy if it is full"""
+        if not self._slots.acquire(blocking=False):
+            raise ServerBusy()
+        with self._lock:
+            self._in_flight += 1
+
+        def timed():
+            with instrumentation.timer('bcrypt'):
+                return function(*args)
+
+        try:
+            return self._executor.submit(timed).result()
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            self._slots.release()
+
+    def _recent_failures(self, username, now):
+        # Caller holds self._lock
+        failures = self._failures.get(username)
+        if failures is None:
+            return 0
+        while failures and failures[0] <= now - self.window:
+            failures.popleft()
+        if not failures:
+            del self._failures[username]
+            return 0
+        return len(failures)
+
+    def login(self, username, password):
+        """Check a user's password; returns (status, user_id).
+
+        status is 'ok', 'invalid', 'rate_limited' or 'busy'; user_id is set
+        only when it is 'ok'.
+        """
+        user_id = None
+        with instrumentation.timer('login'):
+            with self._lock:
+                limited = self._recent_failures(username, time.monotonic()) >= self.max_failures
+            if limited:
+                status = 'rate_limited'
+            else:
+                with self._pool.read() as conn:
+                    user = conn.execute(
+                        "SELECT id, password_hash FROM users WHERE username = ?", (username,)
+                    ).fetchone()
+                try:
+                    if user and self._run(verify_password, password, user['password_hash']):
+                        status, user_id = 'ok', user['id']
+                    else:
+                        status = 'invalid'
+                except ServerBusy:
+                    status = 'busy'
+
+            with self._lock:
+                if status == 'ok':
+                    self._failures.pop(username, None)
+                elif status == 'invalid':
+                    self._failures[username].append(time.monotonic())
+        instrumentation.count(f'login_{status}')
+        return status, user_id
+
+    def hash_password(self, password):
+        """bcrypt hash for a new password, on the pool; raises ServerBusy if it is full"""
+        return self._run(hash_password, password)
+
+    def register(self, username, password):
+        """Create a user; returns the new id.
+
+        Raises sqlite3.IntegrityError if the username is taken and
+        ServerBusy if the pool is full.
+        """
+        password_hash = self.hash_password(password)
+        with self._pool.write() as conn:
+            return conn.execute(
+                "INSERT INTO users (username, password_hash) VALUES (?, ?)",
+                (username, password_hash)
+            ).lastrowid
+
+    def token_version(self, user_id):
+        with self._pool.read() as conn:
+            row = conn.execute("SELECT token_version FROM users WHERE id = ?", (user_id,)).fetchone()
+        return row[0] if row else None
+
+    def revoke_sessions(self, user_id):
+        """Invalidate every session token issued to a user so far, as on logout"""
+        with self._pool.write() as conn:
+            conn.execute("UPDATE users SET token_version = token_version + 1 WHERE id = ?", (user_id,))
+
+    def change_password(self, user_id, password):
+        """Set a new password and revoke the user's session tokens.
+
+        Raises ServerBusy if the pool is full.
+        """
+        password_hash = self.hash_password(password)
+        with self._pool.write() as conn:
+            conn.execute("""
+                UPDATE users SET password_hash = ?, token_version = token_version + 1 WHERE id = ?
+            """, (password_hash, user_id))
+
+    def issue_token(self, user_id, username):
+        return issue_token(self.secret, user_id, username, self.token_version(user_id))
+
+    def session(self, token):
+        """(user_id, username) for a valid session token, else None"""
+        session = verify_token(self.secret, token, self.token_version) if token else None
+        instrumentation.count('session_resumed' if session else 'session_rejected')
+        return session
+
+    def metrics(self):
+        now = time.monotonic()
+        with self._lock:
+            locked_out = sum(
+                self._recent_failures(username, now) >= self.max_failures
+                for username in list(self._failures)
+            )
+            return {
+                'workers': self.workers,
+                'in_flight': self._in_flight,
+                'locked_out_users': locked_out,
+            }
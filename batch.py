@@ -0,0 +1,173 @@
+import numpy as np
+
+import engine
+
+def monthly_rates(investment_rate):
+    """Monthly rate for each annual rate, computed exactly as the scalar code does.
+
+    The power is taken in Python floats (once per distinct rate) so batch
+    results are bit-for-bit identical to calculate_projection.
+    """
+    rates = np.asarray(investment_rate, dtype=float)
+    unique, inverse = np.unique(rates, return_inverse=True)
+    monthly = np.array([engine.monthly_rate(rate) for rate in unique.tolist()])
+    return monthly[inverse].reshape(rates.shape)
+
+def year_factors(monthly_rate):
+    """(growth, annuity) arrays for an array of monthly rates.
+
+    A 1-D array of scenario rates goes through engine.year_factors once per
+    distinct rate, matching the scalar engine bit for bit. Per-year rates
+    (2-D, as in the Monte Carlo engine) use the same formulas in NumPy.
+    """
+    monthly_rate = np.asarray(monthly_rate, dtype=float)
+    if monthly_rate.ndim > 1:
+        return _year_factors(monthly_rate)
+    unique, inverse = np.unique(monthly_rate, return_inverse=True)
+    factors = np.array([engine.year_factors(rate) for rate in unique.tolist()]).reshape(-1, 2)
+    return (factors[inverse, 0].reshape(monthly_rate.shape),
+            factors[inverse, 1].reshape(monthly_rate.shape))
+
+def _year_factors(monthly_rate):
+    compounded = np.expm1(12 * np.log1p(monthly_rate))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        annuity = np.where(monthly_rate == 0, 12.0, (1 + monthly_rate) * compounded / monthly_rate)
+    return 1 + compounded, annuity
+
+def _broadcast_inputs(seed_capital, investment_rate, contribution_escalation, fees, bonus):
+    """Broadcast scalar/1-D inputs to (N,) and schedules to (N, years)"""
+    seed_capital = np.asarray(seed_capital, dtype=float)
+    investment_rate = np.asarray(investment_rate, dtype=float)
+    contribution_escalation = np.asarray(contribution_escalation, dtype=float)
+    fees = np.asarray(fees, dtype=float)
+    bonus = np.asarray(bonus, dtype=float)
+
+    if fees.ndim not in (1, 2) or bonus.ndim not in (1, 2):
+        raise ValueError("fees and bonus must be 1-D (years) or 2-D (scenarios x years)")
+    if fees.shape[-1] != bonus.shape[-1]:
+        raise ValueError("fees and bonus must cover the same number of years")
+
+    n = np.broadcast_shapes(
+        seed_capital.shape, investment_rate.shape, contribution_escalation.shape,
+        fees.shape[:-1], bonus.shape[:-1], (1,)
+    )
+    if len(n) != 1:
+        raise ValueError("scenario inputs must be scalars or 1-D arrays")
+
+    years = fees.shape[-1]
+    return (
+        np.broadcast_to(seed_capital, n),
+        np.broadcast_to(investment_rate, n),
+        np.broadcast_to(contribution_escalation, n),
+        np.broadcast_to(fees, n + (years,)),
+        np.broadcast_to(bonus, n + (years,)),
+    )
+
+def solve_monthly_contribution_batch(seed_capital, investment_rate, contribution_escalation,
+                                     fees, bonus):
+    """Vectorized solve_monthly_contribution: one required payment per scenario"""
+    seed_capital, investment_rate, contribution_escalation, fees, bonus = _broadcast_inputs(
+        seed_capital, investment_rate, contribution_escalation, fees, bonus
+    )
+    return _solve(seed_capital, year_factors(monthly_rates(investment_rate)),
+                  contribution_escalation, fees, bonus)
+
+def _solve(seed_capital, factors, contribution_escalation, fees, bonus):
+    # Mirrors solve_monthly_contribution operation for operation;
+    # `factors` is the (growth, annuity) pair from year_factors
+    growth, annuity = factors
+    a = seed_capital.copy()
+    b = np.zeros_like(a)
+    payment_factor = np.ones_like(a)
+    required = np.zeros_like(a)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for index in range(fees.shape[1]):
+            if index > 0:
+                required = np.where(b > 0, np.maximum(required, (fees[:, index] - a) / b), required)
+                a = a - fees[:, index]
+
+            a = a * growth + bonus[:, index]
+            b = b * growth + annuity * payment_factor
+            payment_factor = payment_factor * (1 + contribution_escalation)
+
+        required = np.where(b > 0, np.maximum(required, -a / b), required)
+
+    return required
+
+def calculate_projection_batch(seed_capital, investment_rate, contribution_escalation,
+                               fees, bonus, monthly_contribution=None):
+    """Project N scenarios at once.
+
+    Scenario inputs may be scalars or length-N arrays; `fees` and `bonus` may
+    be a single (years,) schedule shared by every scenario or an (N, years)
+    array. The required monthly contribution is solved per scenario unless
+    `monthly_contribution` is given.
+
+    Returns a dict of (N, years) arrays with the same keys as the per-year
+    dicts from calculate_projection, matching them exactly.
+    """
+    seed_capital, investment_rate, contribution_escalation, fees, bonus = _broadcast_inputs(
+        seed_capital, investment_rate, contribution_escalation, fees, bonus
+    )
+    monthly_rate = monthly_rates(investment_rate)
+
+    if monthly_contribution is None:
+        monthly_payment = _solve(seed_capital, year_factors(monthly_rate),
+                                 contribution_escalation, fees, bonus)
+    else:
+        monthly_payment = np.broadcast_to(
+            np.asarray(monthly_contribution, dtype=float), seed_capital.shape
+        ).copy()
+
+    results = project(seed_capital, monthly_payment, monthly_rate, contribution_escalation, fees, bonus)
+    results['school_fees'] = np.array(fees)
+    results['annual_bonus'] = np.array(bonus)
+    return results
+
+def project(seed_capital, monthly_payment, monthly_rate, contribution_escalation, fees, bonus):
+    """Year-by-year projection kernel shared by the batch and stochastic engines.
+
+    `monthly_rate` is either (N,) for a fixed rate per scenario or
+    (N, years) for a rate that varies from year to year.
+    """
+    n, years = fees.shape
+    growth, annuity = year_factors(monthly_rate)
+    if growth.ndim == 1:
+        growth = np.broadcast_to(growth[:, None], (n, years))
+        annuity = np.broadcast_to(annuity[:, None], (n, years))
+    results = {
+        key: np.empty((n, years))
+        for key in ('monthly_contribution', 'annual_contributions', 'balance', 'investment_return')
+    }
+    balance = seed_capital.copy()
+
+    for index in range(years):
+        starting_balance = balance
+        school_fees = fees[:, index]
+        annual_bonus = bonus[:, index]
+
+        # Deduct school fees at start of year (except first year)
+        if index > 0:
+            balance = balance - school_fees
+
+        # Twelve monthly contributions and months of growth, in closed form
+        annual_contributions = 12 * monthly_payment
+        balance = balance * growth[:, index] + monthly_payment * annuity[:, index]
+
+        # Add annual bonus at end of year
+        balance = balance + annual_bonus
+
+        investment_return = balance - starting_balance - annual_contributions - annual_bonus
+        if index > 0:
+            investment_return = investment_return + school_fees
+
+        results['monthly_contribution'][:, index] = monthly_payment
+        results['annual_contributions'][:, index] = annual_contributions
+        results['balance'][:, index] = balance
+        results['investment_return'][:, index] = investment_return
+
+        # Increase monthly payment for next year
+        monthly_payment = monthly_payment * (1 + contribution_escalation)
+
+    return results
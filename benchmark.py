@@ -0,0 +1,242 @@
+"""Benchmarks for the projection maths and the database hot paths.
+
+Times calculate_monthly_contribution, calculate_projection,
+create_projection_chart, save_projection (engine.store_projection) and the
+Historical Projections queries against synthetic databases of each --sizes
+projection count. Synthetic databases are built once, from a fixed random
+seed, under --db-dir and reused (migrated first) by later runs; saves are
+timed on a throwaway copy so the reused databases never change.
+
+Results, with p50/p90/p99 per benchmark in milliseconds, are written as JSON.
+With --compare BASELINE any benchmark whose p50 is more than --threshold
+slower than the baseline is reported and the exit status is 1.
+
+Usage: python benchmark.py [--sizes 1000,100000,1000000] [--output results.json]
+                           [--compare baseline.json] [--threshold 0.25]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+import engine
+from create_database import create_database
+from db import ConnectionPool, history_page, insert_projections, projection_series
+
+DEFAULT_SIZES = (1000, 100000, 1000000)
+PROJECTIONS_PER_USER = 100
+
+INPUTS = {
+    'seed_capital': 119000.0,
+    'investment_rate': 0.0878,
+    'contribution_escalation': 0.05
+}
+
+def summarize(timings):
+    """Percentiles of a list of timings in seconds, reported in milliseconds"""
+    ordered = sorted(timings)
+
+    def percentile(fraction):
+        return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))] * 1000
+
+    return {
+        'runs': len(ordered),
+        'min_ms': ordered[0] * 1000,
+        'mean_ms': statistics.fmean(ordered) * 1000,
+        'p50_ms': percentile(0.50),
+        'p90_ms': percentile(0.90),
+        'p99_ms': percentile(0.99),
+        'max_ms': ordered[-1] * 1000,
+    }
+
+def measure(function, repeat, warmup=3):
+    for _ in range(warmup):
+        function()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return summarize(timings)
+
+def default_tables():
+    years = list(engine.PROJECTION_YEARS)
+    return (
+        pd.DataFrame({'Year': years, 'Fees': engine.DEFAULT_FEES}),
+        pd.DataFrame({'Year': years, 'Bonus': engine.DEFAULT_BONUS})
+    )
+
+def build_synthetic_database(path, projections, seed=0, batch_size=10000):
+    """Create a database of `projections` random projections spread over users"""
+    if not create_database(path):
+        raise RuntimeError(f"could not create {path}")
+    rng = random.Random(seed)
+    users = max(1, projections // PROJECTIONS_PER_USER)
+    years = list(engine.PROJECTION_YEARS)
+    first_day = date(2024, 1, 1)
+
+    pool = ConnectionPool(path, max_readers=1)
+    try:
+        with pool.write() as conn:
+            conn.executemany(
+                "INSERT INTO users (username, password_hash) VALUES (?, ?)",
+                ((f"user{user_id}", "x") for user_id in range(1, users + 1))
+            )
+        for start in range(0, projections, batch_size):
+            records = []
+            for _ in range(min(batch_size, projections - start)):
+                seed_capital = rng.uniform(0, 500000)
+                balance = seed_capital
+                values = []
+                for year, fees, bonus in zip(years, engine.DEFAULT_FEES, engine.DEFAULT_BONUS):
+                    balance = balance * 1.08 + bonus - fees + 120000
+                    values.append((year, float(fees), 10000.0, float(bonus), balance))
+                projection = (
+                    (first_day + timedelta(days=rng.randrange(700))).isoformat(),
+                    seed_capital, rng.uniform(0.04, 0.12), rng.uniform(0.0, 0.08),
+                    rng.randrange(1, users + 1)
+                )
+                records.append((projection, values))
+            with pool.write() as conn:
+                insert_projections(conn, records)
+    finally:
+        pool.close()
+
+def synthetic_database(db_dir, projections):
+    """Path of the synthetic database of `projections`, built on first use.
+
+    A database left by an earlier run is migrated to the current schema
+    before it is reused.
+    """
+    path = os.path.join(db_dir, f"bench_{projections}.db")
+    if not os.path.exists(path):
+        print(f"Building synthetic database with {projections:,} projections...", file=sys.stderr)
+        build_synthetic_database(path, projections)
+    elif not create_database(path):
+        raise RuntimeError(f"could not migrate {path}")
+    return path
+
+@contextmanager
+def scratch_copy(path):
+    """A throwaway copy of a synthetic database, for runs that write to it"""
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(path) or None) as directory:
+        copy = os.path.join(directory, os.path.basename(path))
+        source = sqlite3.connect(path)
+        target = sqlite3.connect(copy)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+        yield copy
+
+def run_benchmarks(sizes, db_dir, repeat):
+    from charts import create_projection_chart
+
+    fees_df, bonus_df = default_tables()
+    yearly_results = engine.calculate_projection(INPUTS, fees_df, bonus_df)
+
+    results = {
+        'calculate_monthly_contribution': measure(
+            lambda: engine.calculate_monthly_contribution(INPUTS, fees_df, bonus_df), repeat * 10
+        ),
+        'calculate_projection': measure(
+            lambda: engine.calculate_projection(INPUTS, fees_df, bonus_df), repeat * 10
+        ),
+        'create_projection_chart': measure(lambda: create_projection_chart(yearly_results), repeat),
+    }
+
+    os.makedirs(db_dir, exist_ok=True)
+    for size in sizes:
+        path = synthetic_database(db_dir, size)
+        pool = ConnectionPool(path)
+        try:
+            with pool.read() as conn:
+                projection_id = conn.execute(
+                    "SELECT id FROM projections WHERE user_id = 1 ORDER BY id DESC LIMIT 1"
+                ).fetchone()[0]
+
+            def history():
+                with pool.read() as conn:
+                    history_page(conn, 1)
+
+            def series():
+                with pool.read() as conn:
+                    projection_series(conn, projection_id)
+
+            results[f'history_query[{size}]'] = measure(history, repeat)
+            results[f'projection_series_query[{size}]'] = measure(series, repeat)
+        finally:
+            pool.close()
+
+        # Saves go to a copy so every run reads the same history
+        with scratch_copy(path) as copy:
+            pool = ConnectionPool(copy)
+            try:
+                results[f'save_projection[{size}]'] = measure(
+                    lambda: engine.store_projection(pool, INPUTS, yearly_results, 1), repeat
+                )
+            finally:
+                pool.close()
+
+    return {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'sizes': list(sizes),
+            'repeat': repeat,
+        },
+        'results': results,
+    }
+
+def compare(report, baseline, threshold):
+    """Return (name, baseline p50, current p50) for every regressed benchmark"""
+    regressions = []
+    for name, current in report['results'].items():
+        previous = baseline['results'].get(name)
+        if previous and current['p50_ms'] > previous['p50_ms'] * (1 + threshold):
+            regressions.append((name, previous['p50_ms'], current['p50_ms']))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark projection maths and database paths")
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES),
+                        help="comma-separated synthetic database sizes in projections")
+    parser.add_argument('--db-dir', default='bench_dbs')
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', help="baseline results JSON to check against")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="allowed p50 slowdown versus the baseline (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    report = run_benchmarks(sizes, args.db_dir, args.repeat)
+    with open(args.output, 'w') as output:
+        json.dump(report, output, indent=2)
+
+    for name, stats in report['results'].items():
+        print(f"{name:45} p50 {stats['p50_ms']:10.3f} ms  p99 {stats['p99_ms']:10.3f} ms")
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare(report, json.load(baseline_file), args.threshold)
+        for name, previous, current in regressions:
+            print(f"REGRESSION {name}: p50 {previous:.3f} ms -> {current:.3f} ms")
+        if regressions:
+            raise SystemExit(1)
+        print("No regressions against baseline.")
+
+if __name__ == "__main__":
+    main()
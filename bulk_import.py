@@ -0,0 +1,130 @@
+"""Stream projections from CSV or JSONL files into the database.
+
+CSV files are in long format, one row per projection year, with the columns
+projection, projection_date, seed_capital, investment_rate,
+contribution_escalation, user_id, year, school_fees, monthly_contribution,
+annual_bonus, projected_balance. Consecutive rows with the same `projection`
+key form one projection.
+
+JSONL files hold one projection per line: the projection columns plus a
+"values" list of objects with the per-year columns.
+
+Usage: python bulk_import.py FILE [--format csv|jsonl] [--batch-size N]
+                                  [--commit-every N] [--db PATH]
+"""
+import argparse
+import csv
+import itertools
+import json
+import time
+
+from create_database import create_database
+from db import ConnectionPool, insert_projections
+
+def _projection(row):
+    user_id = row.get('user_id')
+    return (
+        row['projection_date'],
+        float(row['seed_capital']),
+        float(row['investment_rate']),
+        float(row['contribution_escalation']),
+        int(user_id) if user_id not in (None, '') else None
+    )
+
+def _value(row):
+    return (
+        int(row['year']),
+        float(row['school_fees']),
+        float(row['monthly_contribution']),
+        float(row['annual_bonus']),
+        float(row['projected_balance'])
+    )
+
+def read_csv_projections(path):
+    """Yield (projection, values) records from a long-format CSV file"""
+    with open(path, newline='') as csv_file:
+        rows = csv.DictReader(csv_file)
+        for _, group in itertools.groupby(rows, key=lambda row: row['projection']):
+            first = next(group)
+            values = [_value(first)]
+            values.extend(_value(row) for row in group)
+            yield _projection(first), values
+
+def read_jsonl_projections(path):
+    """Yield (projection, values) records from a JSONL file"""
+    with open(path) as jsonl_file:
+        for line in jsonl_file:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            yield _projection(row), [_value(value) for value in row['values']]
+
+READERS = {
+    'csv': read_csv_projections,
+    'jsonl': read_jsonl_projections,
+}
+
+def bulk_import(pool, path, file_format=None, batch_size=1000, commit_every=10, progress=None):
+    """Import projections from `path` in batches of `batch_size` projections.
+
+    Each batch is written with executemany; a transaction is committed every
+    `commit_every` batches. Only one transaction's worth of records is held
+    in memory at a time. `progress`, if given, is called with the running
+    stats after each commit. Returns the final stats.
+    """
+    if file_format is None:
+        file_format = 'jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv'
+    records = READERS[file_format](path)
+
+    stats = {'projections': 0, 'rows': 0, 'seconds': 0.0, 'rows_per_sec': 0.0}
+    started = time.perf_counter()
+
+    while True:
+        batches = [
+            batch for batch in (
+                list(itertools.islice(records, batch_size)) for _ in range(commit_every)
+            ) if batch
+        ]
+        if not batches:
+            break
+
+        with pool.write() as conn:
+            for batch in batches:
+                insert_projections(conn, batch)
+                stats['projections'] += len(batch)
+                stats['rows'] += len(batch) + sum(len(values) for _, values in batch)
+
+        stats['seconds'] = time.perf_counter() - started
+        stats['rows_per_sec'] = stats['rows'] / stats['seconds'] if stats['seconds'] else 0.0
+        if progress:
+            progress(dict(stats))
+
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import projections")
+    parser.add_argument('path')
+    parser.add_argument('--format', choices=sorted(READERS), dest='file_format')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--commit-every', type=int, default=10)
+    parser.add_argument('--db', default='school_fees.db')
+    args = parser.parse_args()
+
+    if not create_database(args.db):
+        raise SystemExit(1)
+    pool = ConnectionPool(args.db, max_readers=1)
+    try:
+        stats = bulk_import(
+            pool, args.path, args.file_format, args.batch_size, args.commit_every,
+            progress=lambda stats: print(
+                f"{stats['projections']:,} projections, {stats['rows']:,} rows "
+                f"({stats['rows_per_sec']:,.0f} rows/sec)"
+            )
+        )
+    finally:
+        pool.close()
+    print(f"Imported {stats['projections']:,} projections ({stats['rows']:,} rows) "
+          f"in {stats['seconds']:.1f}s, {stats['rows_per_sec']:,.0f} rows/sec")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from db import connect
+from instrumentation import instrumentation
+
+# Bump when the projection maths changes so stale results are never served
+CACHE_VERSION = 2
+
+def schedule_arrays(data, column):
+    """Normalise a Year/<column> table to (years, values) arrays sorted by year.
+
+    Accepts a DataFrame or a dict of columns. The first row wins for a
+    repeated year, as in annual_values.
+    """
+    if hasattr(data, 'columns'):
+        # One conversion for the whole frame; column access is slow in pandas
+        table = data.to_numpy(dtype=float)
+        years = table[:, data.columns.get_loc('Year')]
+        values = table[:, data.columns.get_loc(column)]
+    else:
+        years = np.asarray(data['Year'], dtype=float)
+        values = np.asarray(data[column], dtype=float)
+    years = years.astype(np.int64)
+    if len(years) > 1 and not (years[1:] > years[:-1]).all():
+        years, first = np.unique(years, return_index=True)
+        values = values[first]
+    return years, values
+
+def scenario_key(kind, inputs, fees_data, bonus_data):
+    """Content hash of a scenario: inputs plus the normalised fees and bonus tables"""
+    digest = hashlib.sha256(json.dumps({
+        'version': CACHE_VERSION,
+        'kind': kind,
+        'inputs': {name: float(value) for name, value in sorted(inputs.items())},
+    }, separators=(',', ':')).encode('utf-8'))
+    for data, column in ((fees_data, 'Fees'), (bonus_data, 'Bonus')):
+        years, values = schedule_arrays(data, column)
+        digest.update(len(years).to_bytes(4, 'little'))
+        digest.update(years.tobytes())
+        digest.update(values.tobytes())
+    return digest.hexdigest()
+
+def _encode_projection(yearly_results):
+    return json.dumps([[year, values] for year, values in yearly_results.items()])
+
+def _decode_projection(text):
+    return {year: values for year, values in json.loads(text)}
+
+def _copy_projection(yearly_results):
+    # Callers may modify the per-year dicts; never hand out the cached ones
+    return {year: dict(values) for year, values in yearly_results.items()}
+
+# Kept out of the app database so cache writes never queue behind, or
+# contend with, the ConnectionPool writer
+DEFAULT_CACHE_PATH = 'projection_cache.db'
+
+class ProjectionCache:
+    """Two-level LRU cache of projection results.
+
+    Entries are keyed by scenario_key and kept decoded in an in-memory LRU of
+    `max_entries`, backed as JSON by a projection_cache table in its own
+    SQLite file, which holds at most `max_stored` entries and survives
+    restarts. Lookups never write: the keys they use are remembered and
+    their last_used times written along with the next new entry.
+    """
+
+    def __init__(self, db_path=DEFAULT_CACHE_PATH, max_entries=512, max_stored=20000):
+        self.max_entries = max_entries
+        self.max_stored = max_stored
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self._memory = OrderedDict()
+        self._touched = {}
+        self._lock = threading.Lock()
+        self._conn = connect(db_path)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS projection_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                last_used REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_projection_cache_last_used
+                ON projection_cache(last_used);
+        """)
+
+    def projection(self, inputs, fees_data, bonus_data, compute):
+        """calculate_projection through the cache; `compute` is called on a miss"""
+        key = scenario_key('projection', inputs, fees_data, bonus_data)
+        value = self._get(key, _decode_projection)
+        if value is None:
+            value = compute(inputs, fees_data, bonus_data)
+            self._put(key, _copy_projection(value), _encode_projection(value))
+        return _copy_projection(value)
+
+    def contribution(self, inputs, fees_data, bonus_data, compute):
+        """calculate_monthly_contribution through the cache"""
+        key = scenario_key('contribution', inputs, fees_data, bonus_data)
+        value = self._get(key, json.loads)
+        if value is None:
+            value = float(compute(inputs, fees_data, bonus_data))
+            self._put(key, value, json.dumps(value))
+        return value
+
+    def _get(self, key, decode):
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self._touched[key] = time.time()
+                self.hits += 1
+                instrumentation.count('cache_hit')
+                return value
+
+            row = self._conn.execute(
+                "SELECT value FROM projection_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                instrumentation.count('cache_miss')
+                return None
+
+            self._touched[key] = time.time()
+            value = decode(row[0])
+            self._remember(key, value)
+            self.hits += 1
+            self.disk_hits += 1
+            instrumentation.count('cache_hit', source='disk')
+            return value
+
+    def _put(self, key, value, text):
+        with self._lock:
+            self._remember(key, value)
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "UPDATE projection_cache SET last_used = ? WHERE key = ?",
+                    ((used, touched) for touched, used in self._touched.items())
+                )
+                self._touched.clear()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO projection_cache (key, value, last_used) VALUES (?, ?, ?)",
+                    (key, text, time.time())
+                )
+                # Evict everything beyond the newest max_stored entries
+                self._conn.execute("""
+                    DELETE FROM projection_cache WHERE key IN (
+                        SELECT key FROM projection_cache
+                        ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                    )
+                """, (self.max_stored,))
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._touched.clear()
+            self._conn.execute("DELETE FROM projection_cache")
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'disk_hits': self.disk_hits,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'memory_entries': len(self._memory),
+            }
@@ -0,0 +1,194 @@
+import pandas as pd
+import plotly.graph_objects as go
+from instrumentation import instrumentation
+
+def create_projection_chart(yearly_results):
+    with instrumentation.timer('chart'):
+        return _create_projection_chart(yearly_results)
+
+def _create_projection_chart(yearly_results):
+    df = pd.DataFrame.from_dict(yearly_results, orient='index')
+    df = df.astype(float)
+    df.reset_index(inplace=True)
+    df.rename(columns={'index': 'Year'}, inplace=True)
+    
+    fig = go.Figure()
+    
+    # Add balance line
+    fig.add_trace(go.Scatter(
+        x=df['Year'].astype(int),
+        y=df['balance'].astype(float),
+        name='Projected Balance',
+        line=dict(color='blue')
+    ))
+    
+    # Add school fees bars
+    fig.add_trace(go.Bar(
+        x=df['Year'].astype(int),
+        y=df['school_fees'].astype(float),
+        name='School Fees',
+        marker_color='red',
+        opacity=0.6
+    ))
+    
+    fig.update_layout(
+        title='Projected Balance vs School Fees',
+        xaxis_title='Year',
+        yaxis_title='Amount',
+        hovermode='x unified',
+        showlegend=True
+    )
+    
+    return fig
+
+def create_comparison_chart(years, balances, labels, actual=None):
+    """Overlay each row of a (projections x years) balance matrix.
+
+    `actual`, if given, is a DataFrame of year and actual_balance.
+    """
+    with instrumentation.timer('chart'):
+        years = list(years)
+        fig = go.Figure()
+        
+        fig.add_traces([
+            go.Scatter(x=years, y=row, name=label, mode='lines', line=dict(width=1.5))
+            for label, row in zip(labels, balances)
+        ])
+        
+        if actual is not None and not actual.empty:
+            fig.add_trace(go.Scatter(
+                x=actual['year'],
+                y=actual['actual_balance'],
+                name='Actual Balance',
+                mode='lines+markers',
+                line=dict(color='black', width=3)
+            ))
+        
+        fig.update_layout(
+            title=f'Projected Balance Comparison ({len(labels)} projections)',
+            xaxis_title='Year',
+            yaxis_title='Amount (R)',
+            # A unified tooltip over dozens of lines is unreadable
+            hovermode='x unified' if len(labels) <= 10 else 'closest',
+            showlegend=True
+        )
+        
+        return fig
+
+def create_fan_chart(simulation, years):
+    bands = simulation['percentiles']
+    years = list(years)
+    
+    fig = go.Figure()
+    
+    # Shaded P5-P95 band
+    fig.add_trace(go.Scatter(
+        x=years,
+        y=bands[95],
+        name='P95 Balance',
+        line=dict(color='lightblue', width=0)
+    ))
+    fig.add_trace(go.Scatter(
+        x=years,
+        y=bands[5],
+        name='P5 Balance',
+        fill='tonexty',
+        fillcolor='rgba(0, 0, 255, 0.15)',
+        line=dict(color='lightblue', width=0)
+    ))
+    
+    # Median path
+    fig.add_trace(go.Scatter(
+        x=years,
+        y=bands[50],
+        name='Median Balance',
+        line=dict(color='blue')
+    ))
+    
+    fig.update_layout(
+        title=f"Simulated Balance ({simulation['paths']:,} paths)",
+        xaxis_title='Year',
+        yaxis_title='Amount',
+        hovermode='x unified',
+        showlegend=True
+    )
+    
+    return fig
+
+SENSITIVITY_METRICS = {
+    'monthly_contribution': 'Required Monthly Contribution',
+    'final_balance': 'Final Balance',
+    'minimum_balance': 'Minimum Balance',
+}
+
+def create_sensitivity_heatmap(grid, metric, base_inputs=None):
+    """Heatmap of one metric over investment rate (x) and contribution escalation (y)"""
+    with instrumentation.timer('chart'):
+        fig = go.Figure(go.Heatmap(
+            x=grid['investment_rate'] * 100,
+            y=grid['contribution_escalation'] * 100,
+            z=grid[metric],
+            colorscale='RdBu' if metric == 'minimum_balance' else 'Viridis',
+            # Keep zero, where the plan just works, at the middle of the diverging scale
+            zmid=0 if metric == 'minimum_balance' else None,
+            colorbar=dict(title='R'),
+            hovertemplate='Rate %{x:.2f}%<br>Escalation %{y:.2f}%<br>R %{z:,.0f}<extra></extra>'
+        ))
+        
+        if base_inputs is not None:
+            fig.add_trace(go.Scatter(
+                x=[base_inputs['investment_rate'] * 100],
+                y=[base_inputs['contribution_escalation'] * 100],
+                name='Current Plan',
+                mode='markers',
+                marker=dict(color='black', size=10, symbol='x')
+            ))
+        
+        fig.update_layout(
+            title=SENSITIVITY_METRICS[metric],
+            xaxis_title='Investment Rate (%)',
+            yaxis_title='Contribution Escalation (%)',
+            showlegend=False
+        )
+        
+        return fig
+
+def create_tornado_chart(tornado, metric, limit=None):
+    """Bars from each input's low to high case, largest swing at the top.
+
+    Every input is shown unless `limit` is given; the title then says how
+    many of the smallest swings were left out.
+    """
+    with instrumentation.timer('chart'):
+        base = tornado['base'][metric]
+        low = tornado['low'][metric]
+        high = tornado['high'][metric]
+        order = sorted(range(len(tornado['names'])), key=lambda index: abs(high[index] - low[index]))
+        hidden = max(len(order) - limit, 0) if limit is not None else 0
+        order = order[hidden:]
+        names = [tornado['names'][index] for index in order]
+        percent = tornado['change'] * 100
+        title = f'{SENSITIVITY_METRICS[metric]} (base R {base:,.0f})'
+        if hidden:
+            title += f' - {hidden} smallest of {len(tornado["names"])} factors not shown'
+        
+        fig = go.Figure()
+        for label, values, color in ((f'-{percent:g}%', low, 'red'), (f'+{percent:g}%', high, 'green')):
+            fig.add_trace(go.Bar(
+                y=names,
+                x=[values[index] - base for index in order],
+                base=base,
+                name=label,
+                orientation='h',
+                marker_color=color,
+                opacity=0.7
+            ))
+        
+        fig.update_layout(
+            title=title,
+            xaxis_title='Amount (R)',
+            barmode='overlay',
+            showlegend=True
+        )
+        
+        return fig
@@ -1,39 +1,67 @@
+import argparse
 import sqlite3
 import os
+from migrations import migrate
 
-def create_database():
-    """Create the database and all required tables"""
+def create_database(db_path='school_fees.db'):
+    """Create the database if needed and bring its schema up to date"""
+    existed = os.path.exists(db_path)
     try:
         # Connect to SQLite database (creates it if it doesn't exist)
-        conn = sqlite3.connect('school_fees.db')
-        cursor = conn.cursor()
-
-        # Read schema from file
-        with open('schema.sql', 'r') as schema_file:
-            schema_script = schema_file.read()
-            
-        # Execute schema script
-        cursor.executescript(schema_script)
-        
-        # Commit the changes and close the connection
-        conn.commit()
+        conn = sqlite3.connect(db_path)
+
+        # Apply any outstanding schema migrations
+        migrate(conn)
+
         conn.close()
-        
+
         return True
 
     except Exception as e:
         print(f"Error creating database: {str(e)}")
-        # If something went wrong and the file was created, remove it
-        if os.path.exists('school_fees.db'):
+        # If something went wrong and we created the file, remove it
+        if not existed and os.path.exists(db_path):
             try:
-                os.remove('school_fees.db')
+                os.remove(db_path)
             except:
                 pass
         return False
 
+def assign_actual_values(db_path, username, from_username=None):
+    """Move unassigned actual values, or another user's, to `username`; returns how many"""
+    from db import ConnectionPool, reassign_actual_values
+
+    pool = ConnectionPool(db_path, max_readers=1)
+    try:
+        with pool.read() as conn:
+            user_ids = {}
+            for name in filter(None, (username, from_username)):
+                row = conn.execute("SELECT id FROM users WHERE username = ?", (name,)).fetchone()
+                if row is None:
+                    raise SystemExit(f"No user {name}")
+                user_ids[name] = row[0]
+        return reassign_actual_values(pool, user_ids[username], user_ids.get(from_username))
+    finally:
+        pool.close()
+
 if __name__ == "__main__":
-    success = create_database()
+    parser = argparse.ArgumentParser(description="Create or upgrade the database")
+    parser.add_argument('--db', default='school_fees.db')
+    parser.add_argument('--assign-actual-values', metavar='USERNAME',
+                        help="give the actual values no user owns to USERNAME")
+    parser.add_argument('--from-user', metavar='USERNAME',
+                        help="with --assign-actual-values, move this user's actual values instead")
+    args = parser.parse_args()
+    if args.from_user and not args.assign_actual_values:
+        parser.error("--from-user needs --assign-actual-values")
+
+    success = create_database(args.db)
     if success:
         print("Database created successfully!")
     else:
-        print("Failed to create database.") 
\ No newline at end of file
+        print("Failed to create database.")
+        raise SystemExit(1)
+
+    if args.assign_actual_values:
+        moved = assign_actual_values(args.db, args.assign_actual_values, args.from_user)
+        print(f"Moved {moved} actual value rows to {args.assign_actual_values}")
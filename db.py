@@ -0,0 +1,663 @@
+import hashlib
+import queue
+import sqlite3
+import struct
+import sys
+import threading
+import time
+from array import array
+from contextlib import contextmanager
+from datetime import date
+
+DEFAULT_DB_PATH = 'school_fees.db'
+
+NAN = float('nan')
+
+def connect(db_path=DEFAULT_DB_PATH, busy_timeout=5000, cache_size=-16000,
+            mmap_size=256 * 1024 * 1024, read_only=False):
+    """Open a connection with WAL journaling and the pool's tuned pragmas.
+
+    Connections are in autocommit mode; writers open their own transactions
+    with BEGIN IMMEDIATE so they take the write lock up front.
+    """
+    conn = sqlite3.connect(
+        db_path,
+        timeout=busy_timeout / 1000,
+        check_same_thread=False,
+        isolation_level=None
+    )
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(f"PRAGMA busy_timeout={int(busy_timeout)}")
+    # NORMAL is durable across application crashes in WAL mode
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA cache_size={int(cache_size)}")
+    conn.execute(f"PRAGMA mmap_size={int(mmap_size)}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    if read_only:
+        conn.execute("PRAGMA query_only=ON")
+    return conn
+
+class ConnectionPool:
+    """A small pool of read connections and a single serialized writer.
+
+    In WAL mode readers never block behind the writer, so reads get their
+    own connections (at most `max_readers`, opened lazily and reused across
+    threads) while all writes go through one connection guarded by a lock.
+    A thread that nests read() calls keeps the connection it already holds.
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, max_readers=4, **pragmas):
+        self.db_path = db_path
+        self.max_readers = max_readers
+        self._pragmas = pragmas
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+        self._open_lock = threading.Lock()
+        self._local = threading.local()
+        self._writer = connect(db_path, **pragmas)
+        self._write_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._metrics = {
+            'reads': 0,
+            'writes': 0,
+            'rollbacks': 0,
+            'read_wait_seconds': 0.0,
+            'write_wait_seconds': 0.0,
+            'max_read_wait_seconds': 0.0,
+            'max_write_wait_seconds': 0.0,
+        }
+
+    def _record(self, kind, waited):
+        with self._metrics_lock:
+            self._metrics[f'{kind}s'] += 1
+            self._metrics[f'{kind}_wait_seconds'] += waited
+            if waited > self._metrics[f'max_{kind}_wait_seconds']:
+                self._metrics[f'max_{kind}_wait_seconds'] = waited
+
+    def _checkout(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._open_lock:
+            if self._opened < self.max_readers:
+                self._opened += 1
+                open_new = True
+            else:
+                open_new = False
+        if open_new:
+            return connect(self.db_path, read_only=True, **self._pragmas)
+        return self._idle.get()
+
+    @contextmanager
+    def read(self):
+        """Borrow a read-only connection for the duration of the block"""
+        held = getattr(self._local, 'reader', None)
+        if held is not None:
+            yield held
+            return
+
+        started = time.perf_counter()
+        conn = self._checkout()
+        self._record('read', time.perf_counter() - started)
+        self._local.reader = conn
+        try:
+            yield conn
+        finally:
+            self._local.reader = None
+            self._idle.put(conn)
+
+    @contextmanager
+    def write(self):
+        """Run the block in one write transaction on the shared writer.
+
+        Commits on success and rolls back if the block raises.
+        """
+        started = time.perf_counter()
+        with self._write_lock:
+            self._record('write', time.perf_counter() - started)
+            conn = self._writer
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                with self._metrics_lock:
+                    self._metrics['rollbacks'] += 1
+                raise
+            else:
+                conn.execute("COMMIT")
+
+    def metrics(self):
+        with self._metrics_lock:
+            metrics = dict(self._metrics)
+        metrics['readers_open'] = self._opened
+        metrics['readers_idle'] = self._idle.qsize()
+        return metrics
+
+    def close(self):
+        with self._write_lock:
+            self._writer.close()
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+def projection_record(inputs, yearly_results, user_id, projection_date=None):
+    """Turn calculate_projection output into the rows insert_projections expects"""
+    projection = (
+        (projection_date or date.today()).isoformat(),
+        float(inputs['seed_capital']),
+        float(inputs['investment_rate']),
+        float(inputs['contribution_escalation']),
+        user_id
+    )
+    values = [
+        (int(year), values['school_fees'], values['monthly_contribution'],
+         values['annual_bonus'], values['balance'])
+        for year, values in yearly_results.items()
+    ]
+    return projection, values
+
+def pack_series(values):
+    """Pack floats into a little-endian float64 BLOB"""
+    packed = array('d', values)
+    if sys.byteorder != 'little':
+        packed.byteswap()
+    return packed.tobytes()
+
+def series_values(blob):
+    """Packed BLOB as a list of floats, without NumPy"""
+    values = array('d')
+    values.frombytes(blob)
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values.tolist()
+
+def unpack_series(blob):
+    """Read-only float64 NumPy view of a packed BLOB; nothing is copied"""
+    import numpy as np
+    return np.frombuffer(blob, dtype='<f8')
+
+def series_columns(values):
+    """Split (year, school_fees, monthly_contribution, annual_bonus, balance)
+    rows into (first_year, [fees, contributions, bonus, balances]) covering
+    every year from the first to the last. Missing years are NaN and, as in
+    annual_values, the first row for a year wins.
+    """
+    years = [int(value[0]) for value in values]
+    first_year = min(years)
+    columns = [[NAN] * (max(years) - first_year + 1) for _ in range(4)]
+    seen = set()
+    for year, value in zip(years, values):
+        if year in seen:
+            continue
+        seen.add(year)
+        for column, amount in zip(columns, value[1:]):
+            column[year - first_year] = NAN if amount is None else float(amount)
+    return first_year, columns
+
+def store_schedules(conn, blobs):
+    """Return {blob: schedules.id} for packed schedules, storing new ones once"""
+    ids = {}
+    for blob in blobs:
+        if blob in ids:
+            continue
+        digest = hashlib.sha256(blob).digest()
+        conn.execute(
+            "INSERT OR IGNORE INTO schedules (digest, amounts) VALUES (?, ?)", (digest, blob)
+        )
+        ids[blob] = conn.execute(
+            "SELECT id FROM schedules WHERE digest = ?", (digest,)
+        ).fetchone()[0]
+    return ids
+
+def pack_projection_values(conn, value_lists):
+    """Pack each projection's yearly rows for projection_series.
+
+    Returns one (fees_schedule_id, bonus_schedule_id, first_year,
+    monthly_contributions, balances) tuple per list, or None for an empty one.
+    """
+    packed = []
+    for values in value_lists:
+        if not values:
+            packed.append(None)
+            continue
+        first_year, columns = series_columns(values)
+        packed.append((first_year, [pack_series(column) for column in columns]))
+
+    schedule_ids = store_schedules(conn, (
+        blob for entry in packed if entry for blob in (entry[1][0], entry[1][2])
+    ))
+
+    rows = []
+    for entry in packed:
+        if entry is None:
+            rows.append(None)
+            continue
+        first_year, (fees, contributions, bonus, balances) = entry
+        rows.append((schedule_ids[fees], schedule_ids[bonus], first_year, contributions, balances))
+    return rows
+
+def insert_projections(conn, records):
+    """Insert (projection, values) records with one executemany per table.
+
+    `projection` is (projection_date, seed_capital, investment_rate,
+    contribution_escalation, user_id) and `values` a list of (year,
+    school_fees, monthly_contribution, annual_bonus, projected_balance).
+    Fees and bonus go to the shared schedules table, the rest to one packed
+    projection_series row. Ids are allocated up front so every table can be
+    written in bulk, which is only safe inside a write transaction. Returns
+    the new projection ids.
+    """
+    records = list(records)
+    if not records:
+        return []
+
+    row = conn.execute("""
+        SELECT MAX(
+            COALESCE((SELECT MAX(id) FROM projections), 0),
+            COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'projections'), 0)
+        )
+    """).fetchone()
+    first_id = row[0] + 1
+    ids = range(first_id, first_id + len(records))
+    series = pack_projection_values(conn, (values for _, values in records))
+
+    conn.executemany("""
+        INSERT INTO projections (
+            id, projection_date, seed_capital, investment_rate,
+            contribution_escalation, user_id, fees_schedule_id, bonus_schedule_id
+        )
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, ((projection_id,) + tuple(projection) + (packed[:2] if packed else (None, None))
+          for projection_id, (projection, _), packed in zip(ids, records, series)))
+
+    conn.executemany("""
+        INSERT INTO projection_series
+        (projection_id, first_year, monthly_contributions, balances)
+        VALUES (?, ?, ?, ?)
+    """, ((projection_id,) + packed[2:]
+          for projection_id, packed in zip(ids, series) if packed))
+
+    _insert_variance(conn, ids, records)
+    return list(ids)
+
+def replace_projection_values(conn, ids, records):
+    """Overwrite stored projections' yearly values with re-projected ones.
+
+    `records` are (projection, values) records as for insert_projections,
+    one per id. Each projection keeps its id, date, inputs and owner; its
+    schedules, packed series and variance rows are replaced. Must run
+    inside a write transaction.
+    """
+    ids = list(ids)
+    records = list(records)
+    if not ids:
+        return
+    series = pack_projection_values(conn, (values for _, values in records))
+    conn.executemany("""
+        UPDATE projections SET fees_schedule_id = ?, bonus_schedule_id = ? WHERE id = ?
+    """, ((packed[:2] if packed else (None, None)) + (projection_id,)
+          for projection_id, packed in zip(ids, series)))
+    conn.executemany(
+        "DELETE FROM projection_series WHERE projection_id = ?", ((projection_id,) for projection_id in ids)
+    )
+    conn.executemany("""
+        INSERT INTO projection_series
+        (projection_id, first_year, monthly_contributions, balances)
+        VALUES (?, ?, ?, ?)
+    """, ((projection_id,) + packed[2:]
+          for projection_id, packed in zip(ids, series) if packed))
+    conn.executemany(
+        "DELETE FROM projection_variance WHERE projection_id = ?", ((projection_id,) for projection_id in ids)
+    )
+    _insert_variance(conn, ids, records)
+
+def _difference(projected, actual):
+    """projected - actual, or None if either is missing"""
+    if projected is None or actual is None or projected != projected:
+        return None
+    return projected - actual
+
+def actual_values_by_user(conn, user_ids, chunk_size=500):
+    """{user_id: {year: (school_fees, monthly_contribution, actual_balance)}}"""
+    actuals = {}
+    user_ids = list(user_ids)
+    for start in range(0, len(user_ids), chunk_size):
+        chunk = user_ids[start:start + chunk_size]
+        rows = conn.execute(f"""
+            SELECT user_id, year, school_fees, monthly_contribution, actual_balance
+            FROM actual_values
+            WHERE user_id IN ({', '.join('?' * len(chunk))})
+        """, chunk)
+        for user_id, year, *values in rows:
+            actuals.setdefault(user_id, {})[year] = tuple(values)
+    return actuals
+
+INSERT_VARIANCE = """
+    INSERT OR IGNORE INTO projection_variance (
+        projection_id, year, user_id, balance_variance,
+        fees_variance, contribution_variance
+    )
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+def _insert_variance(conn, ids, records):
+    # New projections are compared with their owners' existing actual values
+    owned = [(projection_id, projection[4], values)
+             for projection_id, (projection, values) in zip(ids, records)
+             if projection[4] is not None]
+    actuals = actual_values_by_user(conn, {user_id for _, user_id, _ in owned})
+    if not actuals:
+        return
+    # OR IGNORE: the first row for a year wins, as in series_columns
+    conn.executemany(INSERT_VARIANCE, (
+        (projection_id, year, user_id,
+         _difference(balance, actual[2]), _difference(fees, actual[0]),
+         _difference(contribution, actual[1]))
+        for projection_id, user_id, values in owned if user_id in actuals
+        for year, fees, contribution, _, balance in values
+        for actual in [actuals[user_id].get(year)]
+        if actual is not None and balance is not None
+    ))
+
+def _packed_value(blob):
+    """The float in an 8-byte slice of a packed series, or NaN if it is short"""
+    return struct.unpack('<d', blob)[0] if blob is not None and len(blob) == 8 else NAN
+
+def year_variance(conn, user_id, year, actual, after_id=None, through_id=None):
+    """projection_variance rows comparing a user's projections with one year's actual values.
+
+    `actual` is (school_fees, monthly_contribution, actual_balance). Only
+    projections with after_id < id <= through_id are compared, reading just
+    that year's 8-byte slice of each packed series.
+    """
+    if after_id is None:
+        conditions = ['p.user_id = :user_id']
+    else:
+        # Only the projections saved since after_id: walk the primary key
+        conditions = ['+p.user_id = :user_id', 'p.id > :after_id']
+    if through_id is not None:
+        conditions.append('p.id <= :through_id')
+    rows = conn.execute(f"""
+        SELECT p.id,
+               SUBSTR(s.balances, 8 * (:year - s.first_year) + 1, 8),
+               SUBSTR(f.amounts, 8 * (:year - s.first_year) + 1, 8),
+               SUBSTR(s.monthly_contributions, 8 * (:year - s.first_year) + 1, 8)
+        FROM projections p
+        JOIN projection_series s ON s.projection_id = p.id
+        JOIN schedules f ON f.id = p.fees_schedule_id
+        WHERE {' AND '.join(conditions)} AND :year >= s.first_year
+    """, {'user_id': user_id, 'year': year, 'after_id': after_id, 'through_id': through_id})
+    actual_fees, actual_contribution, actual_balance = actual
+    return [
+        (projection_id, year, user_id,
+         _difference(balance, actual_balance),
+         _difference(_packed_value(fees), actual_fees),
+         _difference(_packed_value(contribution), actual_contribution))
+        for projection_id, balance, fees, contribution in rows
+        for balance in [_packed_value(balance)]
+        if balance == balance
+    ]
+
+def reassign_actual_values(pool, user_id, from_user_id=None):
+    """Give another user's actual values, or the unassigned ones, to `user_id`.
+
+    Years `user_id` already has a value for stay where they are. The moved
+    years' variance rows are rebuilt for their new owner. Returns the
+    number of rows moved.
+    """
+    if from_user_id is None:
+        source, params = 'user_id IS NULL', (user_id,)
+    else:
+        source, params = 'user_id = ?', (from_user_id, user_id)
+    condition = f"{source} AND year NOT IN (SELECT year FROM actual_values WHERE user_id = ?)"
+    with pool.write() as conn:
+        moved = conn.execute(f"""
+            SELECT year, school_fees, monthly_contribution, actual_balance
+            FROM actual_values WHERE {condition}
+        """, params).fetchall()
+        conn.execute(f"UPDATE actual_values SET user_id = ? WHERE {condition}", (user_id,) + params)
+        for year, *actual in moved:
+            if from_user_id is not None:
+                conn.execute("DELETE FROM projection_variance WHERE user_id = ? AND year = ?",
+                             (from_user_id, year))
+            conn.executemany(INSERT_VARIANCE, year_variance(conn, user_id, year, tuple(actual)))
+    return len(moved)
+
+def projection_series(conn, projection_id):
+    """Yearly values of a stored projection as NumPy arrays, or None.
+
+    Keys are year, school_fees, monthly_contribution, annual_bonus and
+    projected_balance; years with no stored balance are left out.
+    """
+    row = conn.execute(PROJECTION_SERIES_QUERY, (projection_id,)).fetchone()
+    if row is None:
+        return None
+    import numpy as np
+
+    balances = unpack_series(row['balances'])
+    series = {
+        'year': np.arange(row['first_year'], row['first_year'] + len(balances)),
+        'school_fees': unpack_series(row['school_fees']),
+        'monthly_contribution': unpack_series(row['monthly_contributions']),
+        'annual_bonus': unpack_series(row['annual_bonus']),
+        'projected_balance': balances,
+    }
+    stored = ~np.isnan(balances)
+    if not stored.all():
+        series = {name: values[stored] for name, values in series.items()}
+    return series
+
+# Optional Historical Projections filters and the condition each adds
+HISTORY_FILTERS = {
+    'date_from': 'p.projection_date >= ?',
+    'date_to': 'p.projection_date <= ?',
+    'min_rate': 'p.investment_rate >= ?',
+    'max_rate': 'p.investment_rate <= ?',
+    'min_seed': 'p.seed_capital >= ?',
+    'max_seed': 'p.seed_capital <= ?',
+}
+
+HISTORY_PAGE_SIZE = 20
+
+def _history_conditions(user_id, filters):
+    conditions = ['p.user_id = ?']
+    params = [user_id]
+    for name, value in (filters or {}).items():
+        if value is not None:
+            conditions.append(HISTORY_FILTERS[name])
+            params.append(value.isoformat() if isinstance(value, date) else value)
+    return conditions, params
+
+def history_query(user_id, filters=None, after=None, limit=HISTORY_PAGE_SIZE):
+    """SQL and parameters for one page of a user's projections, newest first.
+
+    Pages are keyset-paginated on (projection_date, id): `after` is the
+    (projection_date, id) of the last row of the previous page, so every
+    page is an index range scan however deep the user pages.
+    """
+    conditions, params = _history_conditions(user_id, filters)
+    if after is not None:
+        conditions.append('(p.projection_date, p.id) < (?, ?)')
+        params.extend(after)
+    params.append(limit)
+    query = f"""
+        SELECT 
+            p.id,
+            p.projection_date,
+            p.seed_capital,
+            p.investment_rate,
+            p.contribution_escalation,
+            LENGTH(s.balances) / 8 as value_count
+        FROM projections p
+        LEFT JOIN projection_series s ON s.projection_id = p.id
+        WHERE {' AND '.join(conditions)}
+        ORDER BY p.projection_date DESC, p.id DESC
+        LIMIT ?
+    """
+    return query, params
+
+def history_page(conn, user_id, filters=None, after=None, page_size=HISTORY_PAGE_SIZE):
+    """Return (rows, next_after) for one page; next_after is None on the last page"""
+    query, params = history_query(user_id, filters, after, page_size + 1)
+    rows = [dict(row) for row in conn.execute(query, params)]
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    return rows, (rows[-1]['projection_date'], rows[-1]['id'])
+
+def history_count(conn, user_id, filters=None):
+    conditions, params = _history_conditions(user_id, filters)
+    return conn.execute(
+        f"SELECT COUNT(*) FROM projections p WHERE {' AND '.join(conditions)}", params
+    ).fetchone()[0]
+
+# Above this many newer projections a summary is recounted from the user's index
+SUMMARY_CATCH_UP_LIMIT = 10000
+
+class HistorySummaryCache:
+    """Per-user projection count and date range.
+
+    Projections are only ever added, with increasing ids, so each summary
+    remembers the highest projection id it covers and later get() calls
+    fold in just the rows stored since, whichever process stored them
+    (the app, bulk_import.py, run_projections.py or a background job).
+    That costs one MAX(id) lookup per call. invalidate() forces a full
+    recount.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self._lock = threading.Lock()
+        self._summaries = {}
+
+    def get(self, user_id):
+        with self._lock:
+            covered, summary = self._summaries.get(user_id, (None, None))
+        with self.pool.read() as conn:
+            latest = conn.execute("SELECT MAX(id) FROM projections").fetchone()[0] or 0
+            if covered == latest:
+                return summary
+            if covered is None or latest - covered > SUMMARY_CATCH_UP_LIMIT:
+                # Every row of the user's, through idx_projections_user_date
+                row = conn.execute("""
+                    SELECT COUNT(*), MIN(projection_date), MAX(projection_date)
+                    FROM projections WHERE user_id = ? AND +id <= ?
+                """, (user_id, latest)).fetchone()
+                summary = {'count': 0, 'first_date': None, 'last_date': None}
+            else:
+                # Only the rows stored since, through the primary key
+                row = conn.execute("""
+                    SELECT COUNT(*), MIN(projection_date), MAX(projection_date)
+                    FROM projections WHERE +user_id = ? AND id > ? AND id <= ?
+                """, (user_id, covered, latest)).fetchone()
+        summary = {
+            'count': summary['count'] + row[0],
+            'first_date': min(filter(None, (summary['first_date'], row[1])), default=None),
+            'last_date': max(filter(None, (summary['last_date'], row[2])), default=None),
+        }
+        with self._lock:
+            # Keep whichever summary covers more, if another thread got there first
+            if self._summaries.get(user_id, (-1, None))[0] < latest:
+                self._summaries[user_id] = (latest, summary)
+        return summary
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._summaries.pop(user_id, None)
+
+def projection_matrix_query(count):
+    return f"""
+        SELECT projection_id, first_year, monthly_contributions, balances
+        FROM projection_series
+        WHERE projection_id IN ({', '.join('?' * count)})
+    """
+
+def projection_matrix(conn, projection_ids):
+    """Yearly values of several projections as (projections x years) matrices.
+
+    All series are read with one IN (...) query and scattered into the
+    matrices with NumPy. Returns None if none of the ids are stored, else
+    a dict of ids (in the order given), year, projected_balance and
+    monthly_contribution; years a projection does not cover are NaN.
+    """
+    projection_ids = list(dict.fromkeys(int(projection_id) for projection_id in projection_ids))
+    if not projection_ids:
+        return None
+    found = {
+        row['projection_id']: row
+        for row in conn.execute(projection_matrix_query(len(projection_ids)), projection_ids)
+    }
+    rows = [found[projection_id] for projection_id in projection_ids if projection_id in found]
+    if not rows:
+        return None
+    import numpy as np
+
+    lengths = np.array([len(row['balances']) // 8 for row in rows])
+    first_years = np.array([row['first_year'] for row in rows])
+    first_year = first_years.min()
+    width = (first_years + lengths).max() - first_year
+
+    # Row and column of every stored value, in concatenated order
+    row_index = np.repeat(np.arange(len(rows)), lengths)
+    starts = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    column_index = np.arange(lengths.sum()) - starts + np.repeat(first_years - first_year, lengths)
+
+    matrix = {
+        'ids': [row['projection_id'] for row in rows],
+        'year': np.arange(first_year, first_year + width),
+    }
+    for name, column in (('projected_balance', 'balances'),
+                         ('monthly_contribution', 'monthly_contributions')):
+        values = np.full((len(rows), width), np.nan)
+        values[row_index, column_index] = unpack_series(b''.join(row[column] for row in rows))
+        matrix[name] = values
+    return matrix
+
+PROJECTION_SERIES_QUERY = """
+    SELECT 
+        s.first_year,
+        s.monthly_contributions,
+        s.balances,
+        f.amounts as school_fees,
+        b.amounts as annual_bonus
+    FROM projection_series s
+    JOIN projections p ON p.id = s.projection_id
+    JOIN schedules f ON f.id = p.fees_schedule_id
+    JOIN schedules b ON b.id = p.bonus_schedule_id
+    WHERE s.projection_id = ?
+"""
+
+ACTUAL_VALUES_QUERY = """
+    SELECT year, school_fees, monthly_contribution, annual_bonus, actual_balance, recorded_at
+    FROM actual_values
+    WHERE user_id = ?
+    ORDER BY year
+"""
+
+# Projected minus actual, per year across all of a user's projections
+VARIANCE_SUMMARY_QUERY = """
+    SELECT
+        year,
+        COUNT(*) as projections,
+        AVG(balance_variance) as mean_balance_variance,
+        MIN(balance_variance) as min_balance_variance,
+        MAX(balance_variance) as max_balance_variance,
+        AVG(fees_variance) as mean_fees_variance,
+        AVG(contribution_variance) as mean_contribution_variance
+    FROM projection_variance
+    WHERE user_id = ?
+    GROUP BY year
+    ORDER BY year
+"""
+
+PROJECTION_VARIANCE_QUERY = """
+    SELECT year, balance_variance, fees_variance, contribution_variance
+    FROM projection_variance
+    WHERE projection_id = ?
+    ORDER BY year
+"""
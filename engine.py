@@ -0,0 +1,232 @@
+"""Projection maths and persistence, importable without Streamlit.
+
+Only the standard library is imported up front. The NumPy-backed batch and
+Monte Carlo engines are loaded on first access (engine.calculate_projection_batch,
+engine.simulate_projection), so scripts and workers start quickly.
+"""
+import math
+
+from db import INSERT_VARIANCE, insert_projections, projection_record, year_variance
+from instrumentation import DEBUG, instrumentation
+
+# Default horizon and plan shown in the Calculator tab; a projection covers
+# whatever years its fees table has
+PROJECTION_YEARS = range(2025, 2040)
+
+DEFAULT_FEES = [
+    0,      # 2025
+    181413, # 2026
+    203907, # 2027
+    259330, # 2028
+    287039, # 2029
+    311901, # 2030
+    323677, # 2031
+    359029, # 2032
+    384372, # 2033
+    411551, # 2034
+    465033, # 2035
+    497920, # 2036
+    524159, # 2037
+    554905, # 2038
+    627957  # 2039
+]
+
+DEFAULT_BONUS = [
+    50000,  # 2025
+    75000,  # 2026
+    78750,  # 2027
+    82688,  # 2028
+    86822,  # 2029
+    91163,  # 2030
+    95721,  # 2031
+    100507, # 2032
+    105533, # 2033
+    110809, # 2034
+    116350, # 2035
+    122167, # 2036
+    128256, # 2037
+    134629, # 2038
+    0       # 2039
+]
+
+def store_projection(pool, inputs, yearly_results, user_id, projection_date=None):
+    """Save a projection and its yearly values in one transaction; returns its id"""
+    record = projection_record(inputs, yearly_results, user_id, projection_date)
+    with instrumentation.timer('db_save'), pool.write() as conn:
+        return insert_projections(conn, [record])[0]
+
+def save_actual_values(pool, year, values, user_id):
+    """Save a user's actual values for a year and refresh that year's variance.
+
+    The variance of the projections stored so far is worked out on a read
+    connection, so the write lock is only held to swap the rows in, along
+    with any projection saved in the meantime.
+    """
+    actual = (values['school_fees'], values['monthly_contribution'], values['balance'])
+    with pool.read() as conn:
+        through_id = conn.execute("SELECT MAX(id) FROM projections").fetchone()[0] or 0
+        variance = year_variance(conn, user_id, year, actual, through_id=through_id)
+    with instrumentation.timer('db_save'), pool.write() as conn:
+        conn.execute("""
+            INSERT OR REPLACE INTO actual_values 
+            (user_id, year, school_fees, monthly_contribution, annual_bonus, actual_balance)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (user_id, year, values['school_fees'], values['monthly_contribution'],
+              values['annual_bonus'], values['balance']))
+        conn.execute("DELETE FROM projection_variance WHERE user_id = ? AND year = ?", (user_id, year))
+        conn.executemany(INSERT_VARIANCE, variance)
+        conn.executemany(INSERT_VARIANCE, year_variance(conn, user_id, year, actual, after_id=through_id))
+
+def plan_years(fees_data):
+    """Sorted distinct years of a fees table; the first has no fees deducted"""
+    return sorted({int(year) for year in fees_data['Year']})
+
+def combine_fee_streams(streams, years):
+    """Total fees for each of `years` from (start_year, annual_fees) streams.
+
+    Each stream is one child's fees, the first amount falling due in
+    start_year; amounts outside `years` are ignored.
+    """
+    position = {year: index for index, year in enumerate(years)}
+    totals = [0.0] * len(position)
+    for start_year, amounts in streams:
+        for offset, amount in enumerate(amounts):
+            index = position.get(int(start_year) + offset)
+            if index is not None:
+                totals[index] += float(amount)
+    return totals
+
+def monthly_rate(investment_rate):
+    return (1 + float(investment_rate)) ** (1/12) - 1
+
+def year_factors(monthly_rate):
+    """Closed-form effect of one year of monthly compounding.
+
+    Returns (growth, annuity): the factor on the opening balance, (1 + m)^12,
+    and the year-end value of 1 paid at the start of every month, the
+    geometric series (1 + m) * ((1 + m)^12 - 1) / m.
+    """
+    if monthly_rate == 0:
+        return 1.0, 12.0
+    # (1 + m)^12 - 1 without cancellation for small m
+    compounded = math.expm1(12 * math.log1p(monthly_rate))
+    return 1 + compounded, (1 + monthly_rate) * compounded / monthly_rate
+
+def annual_values(data, column, years):
+    """Return the float value of `column` for each of `years`, in order"""
+    lookup = {}
+    for year, value in zip(data['Year'], data[column]):
+        # Keep the first row for a year, as the old boolean-mask lookup did
+        lookup.setdefault(int(year), value)
+    return [float(lookup[year]) for year in years]
+
+def solve_monthly_contribution(seed_capital, investment_rate, contribution_escalation, fees, bonus):
+    """Exact minimum first-year monthly payment for per-year fees and bonus lists.
+
+    Every balance in the projection is affine in the initial payment p
+    (balance = a + b * p with b > 0), so each "balance >= school fees" check
+    and the final "balance >= 0" target reduce to p >= (x - a) / b. The
+    answer is the largest of those bounds, found in a single pass.
+    """
+    growth, annuity = year_factors(monthly_rate(investment_rate))
+
+    a = float(seed_capital)
+    b = 0.0
+    payment_factor = 1.0
+    required = 0.0
+
+    for index, (school_fees, annual_bonus) in enumerate(zip(fees, bonus)):
+        # Deduct school fees at start of year (except first year)
+        if index > 0:
+            if b > 0:
+                required = max(required, (school_fees - a) / b)
+            a -= school_fees
+
+        a = a * growth + annual_bonus
+        b = b * growth + annuity * payment_factor
+        payment_factor *= (1 + float(contribution_escalation))
+
+    if b > 0:
+        required = max(required, -a / b)
+
+    return required
+
+def calculate_monthly_contribution(inputs, fees_data, bonus_data):
+    years = plan_years(fees_data)
+    with instrumentation.timer('solver'):
+        return solve_monthly_contribution(
+            inputs['seed_capital'],
+            inputs['investment_rate'],
+            inputs['contribution_escalation'],
+            annual_values(fees_data, 'Fees', years),
+            annual_values(bonus_data, 'Bonus', years)
+        )
+
+def calculate_projection(inputs, fees_data, bonus_data):
+    with instrumentation.timer('projection'):
+        return _calculate_projection(inputs, fees_data, bonus_data)
+
+def _calculate_projection(inputs, fees_data, bonus_data):
+    years = plan_years(fees_data)
+    fees = annual_values(fees_data, 'Fees', years)
+    bonus = annual_values(bonus_data, 'Bonus', years)
+    
+    # Calculate initial monthly payment
+    with instrumentation.timer('solver'):
+        initial_monthly_payment = solve_monthly_contribution(
+            inputs['seed_capital'], inputs['investment_rate'],
+            inputs['contribution_escalation'], fees, bonus
+        )
+    
+    balance = float(inputs['seed_capital'])
+    monthly_payment = initial_monthly_payment
+    growth, annuity = year_factors(monthly_rate(inputs['investment_rate']))
+    
+    yearly_results = {}
+    
+    for index, (year, school_fees, annual_bonus) in enumerate(zip(years, fees, bonus)):
+        starting_balance = balance
+        
+        # Deduct school fees at start of year (except first year)
+        if index > 0:
+            balance -= school_fees
+            if instrumentation.enabled(DEBUG):
+                instrumentation.event(DEBUG, 'fees_deducted', year=year,
+                                      school_fees=school_fees, balance=balance)
+        
+        # Twelve monthly contributions and months of growth, in closed form
+        annual_contributions = 12 * monthly_payment
+        balance = balance * growth + monthly_payment * annuity
+        
+        # Add annual bonus at end of year
+        balance += annual_bonus
+        
+        yearly_results[year] = {
+            'school_fees': float(school_fees),
+            'monthly_contribution': float(monthly_payment),
+            'annual_contributions': float(annual_contributions),
+            'annual_bonus': float(annual_bonus),
+            'balance': float(balance),
+            'investment_return': float(balance - starting_balance - annual_contributions - annual_bonus + 
+                                    (school_fees if index > 0 else 0))
+        }
+        
+        # Increase monthly payment for next year
+        monthly_payment *= (1 + float(inputs['contribution_escalation']))
+    
+    return yearly_results
+
+# Heavy engines resolved lazily on attribute access
+_LAZY_ATTRIBUTES = {
+    'calculate_projection_batch': 'batch',
+    'solve_monthly_contribution_batch': 'batch',
+    'simulate_projection': 'simulation',
+    'IncrementalProjection': 'incremental',
+    'goal_seek': 'goal_seek',
+}
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        import importlib
+        return getattr(importlib.import_module(_LAZY_ATTRIBUTES[name]), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
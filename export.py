@@ -0,0 +1,239 @@
+"""Stream a user's projection history out of the database.
+
+Every table is read through a cursor with fetchmany and written a batch at a
+time, so memory use depends on the batch size rather than on how much
+history the user has. Projected values are unpacked from projection_series
+into one row per projection year, the layout of the old projected_values
+table. All three tables are read in one transaction, so they agree with each
+other even while projections are being saved.
+
+Usage: python export.py USERNAME [--format csv|jsonl|parquet]
+                        [--output DIR_OR_ZIP] [--batch-size N]
+"""
+import argparse
+import csv
+import json
+import os
+import tempfile
+import time
+import zipfile
+
+from create_database import create_database
+from db import ACTUAL_VALUES_QUERY, ConnectionPool, series_values
+from instrumentation import configure_from_env, instrumentation
+
+EXPORT_FORMATS = ('csv', 'jsonl', 'parquet')
+
+# Projections per fetchmany call; projected values come 15 or so rows per projection
+EXPORT_BATCH_SIZE = 1000
+
+# Exported tables with their (column, type) fields
+EXPORT_TABLES = {
+    'projections': (
+        ('id', 'int'), ('projection_date', 'str'), ('seed_capital', 'float'),
+        ('investment_rate', 'float'), ('contribution_escalation', 'float'), ('created_at', 'str'),
+    ),
+    'projected_values': (
+        ('projection_id', 'int'), ('year', 'int'), ('school_fees', 'float'),
+        ('monthly_contribution', 'float'), ('annual_bonus', 'float'), ('projected_balance', 'float'),
+    ),
+    'actual_values': (
+        ('year', 'int'), ('school_fees', 'float'), ('monthly_contribution', 'float'),
+        ('annual_bonus', 'float'), ('actual_balance', 'float'), ('recorded_at', 'str'),
+    ),
+}
+
+def _batches(cursor, batch_size):
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield rows
+
+def projection_batches(conn, user_id, batch_size=EXPORT_BATCH_SIZE):
+    cursor = conn.execute("""
+        SELECT id, projection_date, seed_capital, investment_rate,
+               contribution_escalation, created_at
+        FROM projections
+        WHERE user_id = ?
+        ORDER BY projection_date, id
+    """, (user_id,))
+    for rows in _batches(cursor, batch_size):
+        yield [tuple(row) for row in rows]
+
+def projected_value_batches(conn, user_id, batch_size=EXPORT_BATCH_SIZE):
+    cursor = conn.execute("""
+        SELECT p.id, s.first_year, s.monthly_contributions, s.balances,
+               f.amounts as school_fees, b.amounts as annual_bonus
+        FROM projections p
+        JOIN projection_series s ON s.projection_id = p.id
+        JOIN schedules f ON f.id = p.fees_schedule_id
+        JOIN schedules b ON b.id = p.bonus_schedule_id
+        WHERE p.user_id = ?
+        ORDER BY p.projection_date, p.id
+    """, (user_id,))
+    # Most projections share a handful of schedules; decode each once per batch
+    for rows in _batches(cursor, batch_size):
+        schedules = {}
+        batch = []
+        for projection_id, first_year, contributions, balances, fees, bonus in rows:
+            for blob in (fees, bonus):
+                if blob not in schedules:
+                    schedules[blob] = series_values(blob)
+            batch.extend(
+                (projection_id, year, *values)
+                for year, *values in zip(
+                    range(first_year, first_year + len(balances) // 8),
+                    schedules[fees], series_values(contributions),
+                    schedules[bonus], series_values(balances)
+                )
+                # NaN balance: a year the projection has no value for
+                if values[3] == values[3]
+            )
+        yield batch
+
+def actual_value_batches(conn, user_id, batch_size=EXPORT_BATCH_SIZE):
+    cursor = conn.execute(ACTUAL_VALUES_QUERY, (user_id,))
+    for rows in _batches(cursor, batch_size):
+        yield [tuple(row) for row in rows]
+
+TABLE_BATCHES = {
+    'projections': projection_batches,
+    'projected_values': projected_value_batches,
+    'actual_values': actual_value_batches,
+}
+
+class CsvWriter:
+    def __init__(self, path, fields):
+        self._file = open(path, 'w', newline='')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow([name for name, _ in fields])
+
+    def write(self, rows):
+        self._writer.writerows(rows)
+
+    def close(self):
+        self._file.close()
+
+class JsonlWriter:
+    def __init__(self, path, fields):
+        self._file = open(path, 'w')
+        self._names = [name for name, _ in fields]
+
+    def write(self, rows):
+        # NaN is not valid JSON; write it as null
+        self._file.writelines(
+            json.dumps({name: (None if value != value else value)
+                        for name, value in zip(self._names, row)}) + '\n'
+            for row in rows
+        )
+
+    def close(self):
+        self._file.close()
+
+class ParquetWriter:
+    """Buffers at most `row_group_size` rows before writing a row group"""
+
+    def __init__(self, path, fields, row_group_size=50000):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Parquet export needs pyarrow: pip install pyarrow")
+        types = {'int': pa.int64(), 'float': pa.float64(), 'str': pa.string()}
+        self._pa = pa
+        self._schema = pa.schema([(name, types[kind]) for name, kind in fields])
+        self._writer = pq.ParquetWriter(path, self._schema)
+        self._row_group_size = row_group_size
+        self._buffer = []
+
+    def write(self, rows):
+        self._buffer.extend(rows)
+        if len(self._buffer) >= self._row_group_size:
+            self._flush()
+
+    def _flush(self):
+        if self._buffer:
+            columns = zip(*self._buffer)
+            self._writer.write_table(self._pa.Table.from_arrays(
+                [self._pa.array(column, type=field.type)
+                 for column, field in zip(columns, self._schema)],
+                schema=self._schema
+            ))
+            self._buffer = []
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+WRITERS = {'csv': CsvWriter, 'jsonl': JsonlWriter, 'parquet': ParquetWriter}
+
+def export_history(pool, user_id, directory, fmt='csv', batch_size=EXPORT_BATCH_SIZE):
+    """Write a user's projections, projected values and actual values to
+    `directory`, one <table>.<fmt> file each. Returns {table: rows written}.
+    """
+    if fmt not in WRITERS:
+        raise ValueError(f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    os.makedirs(directory, exist_ok=True)
+    counts = {}
+    with instrumentation.timer('export', format=fmt), pool.read() as conn:
+        # One read transaction: a consistent snapshot of all three tables
+        conn.execute("BEGIN")
+        try:
+            for table, fields in EXPORT_TABLES.items():
+                writer = WRITERS[fmt](os.path.join(directory, f'{table}.{fmt}'), fields)
+                counts[table] = 0
+                try:
+                    for rows in TABLE_BATCHES[table](conn, user_id, batch_size):
+                        writer.write(rows)
+                        counts[table] += len(rows)
+                finally:
+                    writer.close()
+        finally:
+            conn.execute("COMMIT")
+    instrumentation.count('export_rows', sum(counts.values()), format=fmt)
+    return counts
+
+def export_archive(pool, user_id, output, fmt='csv', batch_size=EXPORT_BATCH_SIZE):
+    """export_history into a zip archive at `output`, a path or binary file,
+    going through a temporary directory. Returns {table: rows written}.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        counts = export_history(pool, user_id, directory, fmt, batch_size)
+        with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED, allowZip64=True) as zipped:
+            for table in EXPORT_TABLES:
+                zipped.write(os.path.join(directory, f'{table}.{fmt}'), f'{table}.{fmt}')
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a user's projection history")
+    parser.add_argument('username')
+    parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv')
+    parser.add_argument('--output', default='export',
+                        help="directory for the exported files, or a .zip archive")
+    parser.add_argument('--batch-size', type=int, default=EXPORT_BATCH_SIZE)
+    parser.add_argument('--db', default='school_fees.db')
+    args = parser.parse_args()
+    configure_from_env()
+
+    if not create_database(args.db):
+        raise SystemExit(1)
+    pool = ConnectionPool(args.db, max_readers=1)
+    try:
+        with pool.read() as conn:
+            user = conn.execute("SELECT id FROM users WHERE username = ?", (args.username,)).fetchone()
+        if user is None:
+            raise SystemExit(f"No user named {args.username}")
+
+        started = time.perf_counter()
+        export = export_archive if args.output.endswith('.zip') else export_history
+        rows = sum(export(pool, user['id'], args.output, args.format, args.batch_size).values())
+        seconds = time.perf_counter() - started
+    finally:
+        pool.close()
+
+    print(f"Exported {rows:,} rows to {args.output} in {seconds:.1f}s, "
+          f"{rows / seconds if seconds else 0:,.0f} rows/sec")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+import numpy as np
+
+from batch import _broadcast_inputs, _solve, _year_factors, year_factors
+
+TARGETS = ('seed_capital', 'investment_rate', 'contribution_escalation', 'fees_scale')
+
+# Search ranges for the targets that need a root finder
+DEFAULT_BRACKETS = {
+    'investment_rate': (-0.5, 1.0),
+    'contribution_escalation': (-0.5, 1.0),
+}
+
+def goal_seek(target, inputs, fees, bonus, monthly_contribution, bracket=None,
+              xtol=1e-10, ftol=1e-6, max_iterations=100):
+    """Solve for the `target` input that makes a plan work at a given payment.
+
+    `target` is one of TARGETS; the other inputs come from `inputs` (with
+    fees_scale, a factor applied to every year's fees, defaulting to 1).
+    Inputs and `monthly_contribution` may be scalars or length-N arrays and
+    fees/bonus a (years,) or (N, years) schedule, so many goals are solved
+    together.
+
+    The answer is the smallest seed capital, investment rate or contribution
+    escalation, or the largest fees scale, for which the first-year monthly
+    contribution covers every year's fees and leaves a non-negative final
+    balance. Seed capital and fees scale enter every balance linearly and
+    are solved in closed form. Rates are found with Chandrupatla's bracketed
+    method (inverse quadratic interpolation with a bisection fallback)
+    within `bracket`, returning the feasible end of the final bracket.
+
+    Returns a dict of (N,) arrays: value, converged, applicable and
+    iterations (root finder steps, zero for closed forms), plus evaluations,
+    the number of batched projection solves. Where the plan already works at
+    the bottom of the bracket value is that bound; where it cannot work
+    value is NaN; both are reported as not converged. A fees scale is not
+    applicable to a plan with no fees in any year: value is NaN there and
+    applicable False.
+    """
+    if target not in TARGETS:
+        raise ValueError(f"target must be one of {', '.join(TARGETS)}")
+
+    values = {
+        'seed_capital': inputs.get('seed_capital', 0.0),
+        'investment_rate': inputs.get('investment_rate', 0.0),
+        'contribution_escalation': inputs.get('contribution_escalation', 0.0),
+    }
+    if target in values:
+        # Placeholder so the target broadcasts with the other inputs
+        values[target] = 0.0
+    payment = np.asarray(monthly_contribution, dtype=float)
+    fees_scale = np.asarray(inputs.get('fees_scale', 1.0), dtype=float)
+    shape = np.broadcast_shapes(np.shape(values['seed_capital']), payment.shape, fees_scale.shape)
+    seed_capital, investment_rate, contribution_escalation, fees, bonus = _broadcast_inputs(
+        np.broadcast_to(values['seed_capital'], shape), values['investment_rate'],
+        values['contribution_escalation'], fees, bonus
+    )
+    shape = seed_capital.shape
+    payment = np.broadcast_to(payment, shape)
+    fees_scale = np.broadcast_to(fees_scale, shape)
+    monthly_rate = np.power(1 + investment_rate, 1/12) - 1
+    factors = year_factors(monthly_rate)
+
+    if target == 'seed_capital':
+        value = _seed_capital(payment, factors, contribution_escalation,
+                              fees * fees_scale[:, None], bonus)
+        return _closed_form(value)
+    if target == 'fees_scale':
+        value = _fees_scale(seed_capital, payment, factors, contribution_escalation, fees, bonus)
+        # No fees to scale leaves the bound at infinity
+        applicable = ~np.isinf(value)
+        return _closed_form(np.where(applicable, value, np.nan), applicable)
+
+    def surplus(x, index):
+        """Payment left over at target value x; positive once the plan works"""
+        growth, annuity = factors
+        rate_factors = (growth[index], annuity[index])
+        escalation = contribution_escalation[index]
+        if target == 'investment_rate':
+            rate_factors = _year_factors(np.power(1 + x, 1/12) - 1)
+        else:
+            escalation = x
+        required = _solve(seed_capital[index], rate_factors, escalation,
+                          fees[index] * fees_scale[index][:, None], bonus[index])
+        return payment[index] - required
+
+    low, high = bracket or DEFAULT_BRACKETS[target]
+    return _chandrupatla(surplus, np.full(shape, float(low)), np.full(shape, float(high)),
+                         xtol, ftol, max_iterations)
+
+def _closed_form(value, applicable=None):
+    return {
+        'value': value,
+        'converged': np.isfinite(value),
+        'applicable': np.ones(value.shape, dtype=bool) if applicable is None else applicable,
+        'iterations': np.zeros(value.shape, dtype=int),
+        'evaluations': 1,
+    }
+
+def _seed_capital(payment, factors, contribution_escalation, fees, bonus):
+    # Balance = constant + seed * seed_growth, with the payment folded into constant
+    growth, annuity = factors
+    constant = np.zeros_like(payment)
+    seed_growth = np.ones_like(payment)
+    payment = np.array(payment)
+    needed = np.zeros_like(payment)
+
+    for index in range(fees.shape[1]):
+        if index > 0:
+            needed = np.maximum(needed, (fees[:, index] - constant) / seed_growth)
+            constant = constant - fees[:, index]
+        constant = constant * growth + payment * annuity + bonus[:, index]
+        seed_growth = seed_growth * growth
+        payment = payment * (1 + contribution_escalation)
+
+    return np.maximum(needed, -constant / seed_growth)
+
+def _fees_scale(seed_capital, payment, factors, contribution_escalation, fees, bonus):
+    # Balance = funded - scale * drained, where drained is the grown-on sum of fees
+    growth, annuity = factors
+    funded = np.array(seed_capital)
+    drained = np.zeros_like(funded)
+    payment = np.array(payment)
+    scale = np.full_like(funded, np.inf)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for index in range(fees.shape[1]):
+            if index > 0:
+                # funded - scale * drained >= scale * fees
+                due = drained + fees[:, index]
+                scale = np.where(due > 0, np.minimum(scale, funded / due), scale)
+                drained = drained + fees[:, index]
+            funded = funded * growth + payment * annuity + bonus[:, index]
+            drained = drained * growth
+            payment = payment * (1 + contribution_escalation)
+        scale = np.where(drained > 0, np.minimum(scale, funded / drained), scale)
+
+    # A negative scale means even zero fees leave the plan short
+    return np.where(scale >= 0, scale, np.nan)
+
+def _chandrupatla(function, low, high, xtol, ftol, max_iterations):
+    """Vectorized Chandrupatla root finder over brackets [low, high].
+
+    `function(x, index)` evaluates the elements selected by `index`; only
+    unconverged elements are evaluated each step.
+    """
+    everything = np.arange(low.shape[0])
+    f_low = function(low, everything)
+    f_high = function(high, everything)
+    evaluations = 2
+
+    value = np.where(f_low >= 0, low, np.nan)
+    converged = np.zeros(low.shape, dtype=bool)
+    iterations = np.zeros(low.shape, dtype=int)
+
+    # Only brackets that go from short (f < 0) to working (f >= 0) are searched
+    active = (f_low < 0) & (f_high >= 0)
+    index = everything[active]
+    x1, f1 = high[active], f_high[active]
+    x2, f2 = low[active], f_low[active]
+    x3, f3 = x2, f2
+    t = np.full(index.shape, 0.5)
+
+    while index.size and evaluations < max_iterations + 2:
+        xt = x1 + t * (x2 - x1)
+        ft = function(xt, index)
+        evaluations += 1
+        iterations[index] += 1
+
+        # Keep the bracket [x1, x2] around the sign change; x3 is the point dropped
+        same = np.sign(ft) == np.sign(f1)
+        x3 = np.where(same, x1, x2)
+        f3 = np.where(same, f1, f2)
+        x2 = np.where(same, x2, x1)
+        f2 = np.where(same, f2, f1)
+        x1, f1 = xt, ft
+
+        # Feasible end of the bracket; f >= 0 there by construction
+        feasible = f1 >= 0
+        x_best = np.where(feasible, x1, x2)
+        f_best = np.where(feasible, f1, f2)
+
+        tolerance = 4 * np.finfo(float).eps * np.abs(x_best) + xtol / 2
+        with np.errstate(divide='ignore', invalid='ignore'):
+            tl = tolerance / np.abs(x2 - x1)
+        done = (tl > 0.5) | (np.abs(f_best) <= ftol)
+        value[index[done]] = x_best[done]
+        converged[index[done]] = True
+
+        keep = ~done
+        index, x1, x2, x3, f1, f2, f3, tl = (
+            array[keep] for array in (index, x1, x2, x3, f1, f2, f3, tl)
+        )
+
+        # Inverse quadratic interpolation where it is safe, else bisection
+        with np.errstate(divide='ignore', invalid='ignore'):
+            xi = (x1 - x2) / (x3 - x2)
+            phi = (f1 - f2) / (f3 - f2)
+            interpolate = (phi ** 2 < xi) & ((1 - phi) ** 2 < 1 - xi)
+            t = np.where(
+                interpolate,
+                f1 / (f2 - f1) * f3 / (f2 - f3) + (x3 - x1) / (x2 - x1) * f1 / (f3 - f1) * f2 / (f3 - f2),
+                0.5
+            )
+        t = np.clip(np.nan_to_num(t, nan=0.5), tl, 1 - tl)
+
+    # Out of iterations: still report the feasible end of the bracket
+    if index.size:
+        value[index] = np.where(f1 >= 0, x1, x2)
+
+    return {
+        'value': value,
+        'converged': converged,
+        'applicable': np.ones(low.shape, dtype=bool),
+        'iterations': iterations,
+        'evaluations': evaluations,
+    }
@@ -0,0 +1,126 @@
+"""Incremental re-projection for live edits of the fees and bonus tables.
+
+engine.calculate_projection solves and projects every year from the start.
+IncrementalProjection keeps the per-year state of its last run instead: each
+closing balance as a + b * p in the first-year monthly payment p, and the
+running maximum of the bounds that each year's school fees put on p. The
+slopes b never depend on fees or bonus, and the intercepts a and bounds
+before an edited year do not change, so an edit to year j only rebuilds
+them from j onward. The new payment is the larger of the kept bound and
+the rebuilt ones, exactly as the full solver would find it.
+
+Yearly results are then read off a + b * p directly, and
+when the payment is unchanged the results before year j are reused as-is.
+They agree with engine.calculate_projection to floating-point rounding.
+"""
+from engine import PROJECTION_YEARS, monthly_rate, year_factors
+from instrumentation import instrumentation
+
+class IncrementalProjection:
+    def __init__(self, inputs, fees, bonus, years=PROJECTION_YEARS):
+        self.inputs = dict(inputs)
+        self.years = list(years)
+        self.fees = [float(value) for value in fees]
+        self.bonus = [float(value) for value in bonus]
+        if not len(self.years) == len(self.fees) == len(self.bonus):
+            raise ValueError("fees and bonus need one value per projection year")
+
+        escalation = 1 + float(inputs['contribution_escalation'])
+        self._seed_capital = float(inputs['seed_capital'])
+        growth, annuity = year_factors(monthly_rate(inputs['investment_rate']))
+        self._growth = growth
+
+        # Payment escalation and closing-balance slope b for each year
+        self._factors = []
+        self._slopes = []
+        factor = 1.0
+        slope = 0.0
+        for _ in self.years:
+            slope = slope * growth + annuity * factor
+            self._factors.append(factor)
+            self._slopes.append(slope)
+            factor *= escalation
+
+        count = len(self.years)
+        self._intercepts = [0.0] * count
+        self._bounds = [0.0] * count
+        self._results = [None] * count
+        self.monthly_contribution = None
+        self.yearly_results = {}
+        self._rebuild(0)
+
+    def update(self, fees=None, bonus=None):
+        """Apply edited fees and/or bonus lists; returns the new yearly results.
+
+        Only years from the first changed value onward are recomputed. The
+        per-year dicts of untouched years are shared between calls, so treat
+        the results as read-only.
+        """
+        fees = self.fees if fees is None else [float(value) for value in fees]
+        bonus = self.bonus if bonus is None else [float(value) for value in bonus]
+        if not len(fees) == len(bonus) == len(self.years):
+            raise ValueError("fees and bonus need one value per projection year")
+
+        start = next(
+            (index for index, (old_fees, new_fees, old_bonus, new_bonus)
+             in enumerate(zip(self.fees, fees, self.bonus, bonus))
+             if old_fees != new_fees or old_bonus != new_bonus),
+            None
+        )
+        if start is None:
+            return self.yearly_results
+
+        self.fees = fees
+        self.bonus = bonus
+        with instrumentation.timer('incremental_projection', start_year=self.years[start]):
+            self._rebuild(start)
+        return self.yearly_results
+
+    def _rebuild(self, start):
+        fees, bonus = self.fees, self.bonus
+        slopes, intercepts, bounds = self._slopes, self._intercepts, self._bounds
+
+        for index in range(start, len(self.years)):
+            if index == 0:
+                intercepts[0] = self._seed_capital * self._growth + bonus[0]
+                bounds[0] = 0.0
+                continue
+            # Balance after school fees must cover them: p >= (fees - a) / b
+            bound = bounds[index - 1]
+            if slopes[index - 1] > 0:
+                bound = max(bound, (fees[index] - intercepts[index - 1]) / slopes[index - 1])
+            bounds[index] = bound
+            intercepts[index] = (intercepts[index - 1] - fees[index]) * self._growth + bonus[index]
+
+        required = bounds[-1]
+        if slopes[-1] > 0:
+            required = max(required, -intercepts[-1] / slopes[-1])
+
+        if required != self.monthly_contribution:
+            self.monthly_contribution = required
+            start = 0
+        self._project(start)
+
+    def _project(self, start):
+        payment = self.monthly_contribution
+        for index in range(start, len(self.years)):
+            if index == 0:
+                starting_balance = self._seed_capital
+            else:
+                starting_balance = self._intercepts[index - 1] + self._slopes[index - 1] * payment
+            monthly_payment = payment * self._factors[index]
+            annual_contributions = monthly_payment * 12
+            balance = self._intercepts[index] + self._slopes[index] * payment
+            school_fees = self.fees[index]
+            annual_bonus = self.bonus[index]
+
+            self._results[index] = {
+                'school_fees': school_fees,
+                'monthly_contribution': monthly_payment,
+                'annual_contributions': annual_contributions,
+                'annual_bonus': annual_bonus,
+                'balance': balance,
+                'investment_return': (balance - starting_balance - annual_contributions - annual_bonus +
+                                      (school_fees if index > 0 else 0))
+            }
+        self.yearly_results = dict(zip(self.years, self._results))
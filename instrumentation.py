@@ -0,0 +1,148 @@
+"""Stage timers, counters and level-gated events with pluggable sinks.
+
+Nothing is measured unless a sink is installed or the current thread is
+collecting, so instrumented code costs a flag check when it is all off.
+Events below the configured level are skipped before their fields are
+built when callers guard them with enabled():
+
+    if instrumentation.enabled(DEBUG):
+        instrumentation.event(DEBUG, 'fees_deducted', year=year, balance=balance)
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+DEBUG = logging.DEBUG
+INFO = logging.INFO
+WARNING = logging.WARNING
+
+class LogSink:
+    """Writes every timing, counter and event as one JSON log line"""
+
+    def __init__(self, logger_name='school_fees.perf'):
+        self.logger = logging.getLogger(logger_name)
+
+    def _log(self, level, record):
+        if self.logger.isEnabledFor(level):
+            self.logger.log(level, json.dumps(record, default=str))
+
+    def timing(self, stage, seconds, fields):
+        self._log(INFO, {'type': 'timing', 'stage': stage, 'ms': seconds * 1000, **fields})
+
+    def count(self, name, value, fields):
+        self._log(INFO, {'type': 'count', 'name': name, 'value': value, **fields})
+
+    def event(self, level, name, fields):
+        self._log(level, {'type': 'event', 'name': name, **fields})
+
+class HistogramSink:
+    """Keeps the last `max_samples` timings per stage and running counters"""
+
+    def __init__(self, max_samples=1000):
+        self._lock = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=max_samples))
+        self._counters = defaultdict(int)
+
+    def timing(self, stage, seconds, fields):
+        with self._lock:
+            self._samples[stage].append(seconds)
+
+    def count(self, name, value, fields):
+        with self._lock:
+            self._counters[name] += value
+
+    def event(self, level, name, fields):
+        pass
+
+    def summary(self):
+        """Per-stage count and p50/p90/p99/max in milliseconds, plus counters"""
+        with self._lock:
+            samples = {stage: sorted(values) for stage, values in self._samples.items()}
+            counters = dict(self._counters)
+        stages = {}
+        for stage, ordered in samples.items():
+            def percentile(fraction):
+                return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000
+            stages[stage] = {
+                'count': len(ordered),
+                'p50_ms': percentile(0.50),
+                'p90_ms': percentile(0.90),
+                'p99_ms': percentile(0.99),
+                'max_ms': ordered[-1] * 1000,
+            }
+        return {'stages': stages, 'counters': counters}
+
+class Instrumentation:
+    def __init__(self, level=INFO):
+        self.level = level
+        self._sinks = []
+        self._local = threading.local()
+
+    def add_sink(self, sink):
+        self._sinks = self._sinks + [sink]
+        return sink
+
+    def remove_sink(self, sink):
+        self._sinks = [existing for existing in self._sinks if existing is not sink]
+
+    def enabled(self, level):
+        return level >= self.level and bool(self._sinks)
+
+    @contextmanager
+    def collect(self):
+        """Record (stage, ms) timings made on this thread into the yielded list"""
+        collected = []
+        previous = getattr(self._local, 'collected', None)
+        self._local.collected = collected
+        try:
+            yield collected
+        finally:
+            self._local.collected = previous
+
+    @contextmanager
+    def timer(self, stage, **fields):
+        collected = getattr(self._local, 'collected', None)
+        if not self._sinks and collected is None:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            if collected is not None:
+                collected.append((stage, seconds * 1000))
+            for sink in self._sinks:
+                sink.timing(stage, seconds, fields)
+
+    def count(self, name, value=1, **fields):
+        for sink in self._sinks:
+            sink.count(name, value, fields)
+
+    def event(self, level, name, **fields):
+        if level < self.level:
+            return
+        for sink in self._sinks:
+            sink.event(level, name, fields)
+
+# Shared by the engine, the app and the command-line tools
+instrumentation = Instrumentation()
+
+def configure_from_env():
+    """Install sinks requested by SCHOOL_FEES_PERF_LOG / SCHOOL_FEES_PERF_LEVEL"""
+    level = os.environ.get('SCHOOL_FEES_PERF_LEVEL')
+    if level:
+        value = int(level) if level.isdigit() else logging.getLevelName(level.upper())
+        # getLevelName returns the string "Level X" for a name it doesn't know
+        if not isinstance(value, int):
+            raise ValueError(f"SCHOOL_FEES_PERF_LEVEL must be a logging level such as "
+                             f"DEBUG, INFO or WARNING, not {level!r}")
+        instrumentation.level = value
+    if os.environ.get('SCHOOL_FEES_PERF_LOG'):
+        logging.basicConfig(level=min(instrumentation.level, INFO))
+        return instrumentation.add_sink(LogSink())
+    return None
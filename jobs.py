@@ -0,0 +1,423 @@
+"""Background jobs for long-running projection work.
+
+Jobs are rows in the jobs table, so the queue survives app restarts. submit()
+queues a job, worker processes claim the oldest queued one in a write
+transaction, and the app polls job_status() / user_jobs() without waiting on
+them. A running job reports through the progress callback it is given, which
+raises JobCancelled once cancel() has been called for that job. Workers
+heartbeat while a job runs; requeue_stale() puts jobs whose worker died back
+in the queue, up to MAX_ATTEMPTS times. A job that must not repeat work on a
+retry saves a checkpoint as it goes and reads it back on the next attempt.
+
+A reproject job re-runs the projections of the user who submitted it, or
+every user's if it was submitted without one. With persist it writes the
+new values back to those projections rather than adding new ones.
+
+Workers are meant to run as their own service with `python jobs.py work`,
+which stops cleanly on SIGTERM. run_pending() runs queued jobs on the
+calling thread instead, a local stand-in for the worker processes that needs
+nothing but the database.
+
+Usage: python jobs.py work [--workers N]
+       python jobs.py submit KIND [PARAMS_JSON]
+       python jobs.py status JOB_ID
+       python jobs.py cancel JOB_ID
+"""
+import argparse
+import atexit
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+
+from create_database import create_database
+from db import DEFAULT_DB_PATH, ConnectionPool
+from instrumentation import configure_from_env, instrumentation
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+# Seconds between a running job's heartbeats, and without one before it is requeued
+HEARTBEAT_INTERVAL = 5.0
+STALE_AFTER = 60.0
+MAX_ATTEMPTS = 3
+
+# Progress is written at most this often, so busy jobs don't hog the write lock
+PROGRESS_INTERVAL = 0.5
+
+POLL_INTERVAL = 1.0
+
+JOB_COLUMNS = """
+    id, user_id, kind, params, status, progress, message, error,
+    cancel_requested, attempts, worker, created_at, started_at, finished_at, checkpoint
+"""
+
+class JobCancelled(Exception):
+    """Raised inside a running job once it has been cancelled"""
+
+def _simulation(pool, job, progress):
+    from simulation import simulate_projection
+    params = job['params']
+    simulation = simulate_projection(
+        params['inputs'], params['fees'], params['bonus'],
+        volatility=params.get('volatility', 0.15),
+        paths=params.get('paths', 10000),
+        seed=params.get('seed'),
+        workers=params.get('workers', 1),
+        progress=lambda done, total: progress(done / total, f"{done} of {total} chunks simulated")
+    )
+    return {
+        'monthly_contribution': simulation['monthly_contribution'],
+        'paths': simulation['paths'],
+        'shortfall_probability': simulation['shortfall_probability'],
+        'shortfall_by_year': simulation['shortfall_by_year'].tolist(),
+        # JSON object keys are strings, so keep the percentiles as pairs
+        'percentiles': [[percentile, band.tolist()]
+                        for percentile, band in simulation['percentiles'].items()],
+    }
+
+def _reproject(pool, job, progress):
+    from run_projections import open_writer, run_projections, stored_scenario_conditions, stored_scenarios
+    params = job['params']
+    state = progress.checkpoint
+    if state is None:
+        # Fix the projections to re-run on the first attempt, so that a retry
+        # covers the same set however many have been saved since
+        with pool.read() as conn:
+            through_id = conn.execute("SELECT MAX(id) FROM projections").fetchone()[0] or 0
+        state = {'through_id': through_id, 'persisted_through': None}
+        progress.save_checkpoint(state)
+    where, where_params = stored_scenario_conditions(job['user_id'], state['through_id'])
+    with pool.read() as conn:
+        total = conn.execute(f"SELECT COUNT(*) FROM projections p WHERE {where}", where_params).fetchone()[0]
+
+    writer = open_writer(params['output'])
+    try:
+        stats = run_projections(
+            stored_scenarios(pool, job['user_id'], state['through_id']), writer,
+            workers=params.get('workers', 1),
+            chunk_size=params.get('chunk_size', 64),
+            pool=pool if params.get('persist') else None,
+            progress=lambda stats: progress(
+                stats['scenarios'] / total if total else 1.0,
+                f"{stats['scenarios']:,} of {total:,} projections"
+            ),
+            # A retry writes the whole output again but updates only what is left
+            persisted_through=state['persisted_through'],
+            checkpoint=lambda conn, scenario_id: progress.save_checkpoint(
+                dict(state, persisted_through=scenario_id), conn
+            )
+        )
+    finally:
+        writer.close()
+    return dict(stats, output=params['output'])
+
+# kind -> function(pool, job, progress) returning a JSON-serializable result;
+# `job` is the claimed job, with its decoded params and checkpoint
+JOB_KINDS = {
+    'simulation': _simulation,
+    'reproject': _reproject,
+}
+
+def submit(pool, kind, params, user_id=None):
+    """Queue a job; returns its id"""
+    if kind not in JOB_KINDS:
+        raise ValueError(f"kind must be one of {', '.join(JOB_KINDS)}")
+    with pool.write() as conn:
+        return conn.execute("""
+            INSERT INTO jobs (user_id, kind, params, created_at)
+            VALUES (?, ?, ?, ?)
+        """, (user_id, kind, json.dumps(params), time.time())).lastrowid
+
+def cancel(pool, job_id):
+    """Cancel a queued job, or ask a running one to stop at its next progress report.
+
+    Returns False if the job had already finished.
+    """
+    with pool.write() as conn:
+        queued = conn.execute("""
+            UPDATE jobs SET status = 'cancelled', finished_at = ?
+            WHERE id = ? AND status = 'queued'
+        """, (time.time(), job_id)).rowcount
+        running = conn.execute("""
+            UPDATE jobs SET cancel_requested = 1
+            WHERE id = ? AND status = 'running'
+        """, (job_id,)).rowcount
+    return bool(queued or running)
+
+def _job(row):
+    job = dict(row)
+    job['params'] = json.loads(job['params'])
+    job['checkpoint'] = json.loads(job['checkpoint']) if job['checkpoint'] else None
+    return job
+
+def job_status(pool, job_id):
+    """A job's status, progress and params as a dict, or None if there is no such job"""
+    with pool.read() as conn:
+        row = conn.execute(f"SELECT {JOB_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return _job(row) if row else None
+
+def job_result(pool, job_id):
+    """A finished job's decoded result; None until the job is done"""
+    with pool.read() as conn:
+        row = conn.execute("SELECT result FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return json.loads(row['result']) if row and row['result'] is not None else None
+
+def user_jobs(pool, user_id, limit=10):
+    """A user's newest jobs first, without their results"""
+    with pool.read() as conn:
+        rows = conn.execute(f"""
+            SELECT {JOB_COLUMNS} FROM jobs
+            WHERE user_id = ?
+            ORDER BY id DESC
+            LIMIT ?
+        """, (user_id, limit)).fetchall()
+    return [_job(row) for row in rows]
+
+def claim(pool, worker):
+    """Mark the oldest queued job as running on `worker` and return it, or None"""
+    now = time.time()
+    with pool.write() as conn:
+        # BEGIN IMMEDIATE holds the write lock, so no other worker can claim it too
+        row = conn.execute(f"""
+            SELECT {JOB_COLUMNS} FROM jobs
+            WHERE status = 'queued'
+            ORDER BY id
+            LIMIT 1
+        """).fetchone()
+        if row is None:
+            return None
+        conn.execute("""
+            UPDATE jobs
+            SET status = 'running', worker = ?, attempts = attempts + 1,
+                started_at = ?, heartbeat_at = ?
+            WHERE id = ?
+        """, (worker, now, now, row['id']))
+    job = _job(row)
+    job.update(status='running', worker=worker, attempts=job['attempts'] + 1, started_at=now)
+    return job
+
+def requeue_stale(pool, stale_after=STALE_AFTER, max_attempts=MAX_ATTEMPTS):
+    """Requeue running jobs without a recent heartbeat; returns how many.
+
+    A stale job that was being cancelled is marked cancelled, and one that
+    has already been tried `max_attempts` times is marked failed.
+    """
+    now = time.time()
+    cutoff = now - stale_after
+    with pool.write() as conn:
+        conn.execute("""
+            UPDATE jobs
+            SET status = CASE WHEN cancel_requested THEN 'cancelled' ELSE 'failed' END,
+                error = CASE WHEN cancel_requested THEN NULL ELSE 'Worker stopped responding' END,
+                finished_at = ?
+            WHERE status = 'running' AND heartbeat_at < ?
+              AND (cancel_requested OR attempts >= ?)
+        """, (now, cutoff, max_attempts))
+        return conn.execute("""
+            UPDATE jobs
+            SET status = 'queued', worker = NULL, progress = 0, message = NULL
+            WHERE status = 'running' AND heartbeat_at < ?
+        """, (cutoff,)).rowcount
+
+class _Progress:
+    """The progress callback handed to a running job.
+
+    checkpoint is what an earlier attempt at the job last saved with
+    save_checkpoint(), or None on the first attempt.
+    """
+
+    def __init__(self, pool, job_id, checkpoint=None, interval=PROGRESS_INTERVAL):
+        self._pool = pool
+        self._job_id = job_id
+        self._interval = interval
+        self._reported = None
+        self.checkpoint = checkpoint
+
+    def save_checkpoint(self, checkpoint, conn=None):
+        """Record how far the job got; in `conn`'s write transaction if given"""
+        update = "UPDATE jobs SET checkpoint = ? WHERE id = ?"
+        if conn is None:
+            with self._pool.write() as conn:
+                conn.execute(update, (json.dumps(checkpoint), self._job_id))
+        else:
+            conn.execute(update, (json.dumps(checkpoint), self._job_id))
+        self.checkpoint = checkpoint
+
+    def __call__(self, fraction, message=None):
+        now = time.monotonic()
+        if self._reported is not None and now - self._reported < self._interval and fraction < 1:
+            return
+        self._reported = now
+        with self._pool.write() as conn:
+            conn.execute("""
+                UPDATE jobs SET progress = ?, message = ?, heartbeat_at = ? WHERE id = ?
+            """, (min(max(float(fraction), 0.0), 1.0), message, time.time(), self._job_id))
+            cancelled = conn.execute(
+                "SELECT cancel_requested FROM jobs WHERE id = ?", (self._job_id,)
+            ).fetchone()[0]
+        if cancelled:
+            raise JobCancelled()
+
+def _heartbeat(pool, job_id, worker, stop, interval):
+    while not stop.wait(interval):
+        with pool.write() as conn:
+            conn.execute("""
+                UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND worker = ? AND status = 'running'
+            """, (time.time(), job_id, worker))
+
+def run_job(pool, job, heartbeat_interval=HEARTBEAT_INTERVAL):
+    """Run a claimed job to completion and record the outcome; returns its final status.
+
+    The outcome is only recorded while the job is still running on this
+    worker: if it went stale and was requeued, failed or claimed again in
+    the meantime, the retry's record is kept and None is returned.
+    """
+    stop = threading.Event()
+    heartbeat = threading.Thread(
+        target=_heartbeat, args=(pool, job['id'], job['worker'], stop, heartbeat_interval), daemon=True
+    )
+    heartbeat.start()
+    result = error = None
+    try:
+        with instrumentation.timer('job', kind=job['kind']):
+            result = JOB_KINDS[job['kind']](pool, job, _Progress(pool, job['id'], job['checkpoint']))
+        status = 'done'
+    except JobCancelled:
+        status = 'cancelled'
+    except Exception as e:
+        status = 'failed'
+        error = f"{type(e).__name__}: {e}"
+    finally:
+        stop.set()
+        heartbeat.join()
+
+    with pool.write() as conn:
+        recorded = conn.execute("""
+            UPDATE jobs
+            SET status = ?, progress = CASE WHEN ? = 'done' THEN 1 ELSE progress END,
+                result = ?, error = ?, finished_at = ?, heartbeat_at = NULL
+            WHERE id = ? AND worker = ? AND attempts = ? AND status = 'running'
+        """, (status, status, None if result is None else json.dumps(result), error,
+              time.time(), job['id'], job['worker'], job['attempts'])).rowcount
+    if not recorded:
+        instrumentation.count('jobs_superseded')
+        return None
+    instrumentation.count(f'jobs_{status}')
+    return status
+
+def run_pending(pool, max_jobs=None, worker='inline'):
+    """Run queued jobs on this thread until the queue is empty; returns their ids"""
+    finished = []
+    while max_jobs is None or len(finished) < max_jobs:
+        job = claim(pool, worker)
+        if job is None:
+            break
+        run_job(pool, job)
+        finished.append(job['id'])
+    return finished
+
+def work(db_path=DEFAULT_DB_PATH, stop=None, poll_interval=POLL_INTERVAL):
+    """Worker loop: claim and run jobs until `stop` is set, requeueing stale ones while idle"""
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    pool = ConnectionPool(db_path, max_readers=2)
+    try:
+        while stop is None or not stop.is_set():
+            job = claim(pool, worker)
+            if job is not None:
+                run_job(pool, job)
+                continue
+            requeue_stale(pool)
+            if stop is None:
+                time.sleep(poll_interval)
+            else:
+                stop.wait(poll_interval)
+    finally:
+        pool.close()
+
+class JobWorkers:
+    """A local pool of worker processes running jobs from the database.
+
+    Workers are stopped at interpreter exit. A job still running after the
+    stop timeout is abandoned with its worker and requeued once it goes stale.
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, workers=1, poll_interval=POLL_INTERVAL):
+        self._stop = multiprocessing.Event()
+        # Not daemonic: jobs may start process pools of their own
+        self._processes = [
+            multiprocessing.Process(target=work, args=(db_path, self._stop, poll_interval),
+                                    name=f'job-worker-{number}')
+            for number in range(workers)
+        ]
+        for process in self._processes:
+            process.start()
+        atexit.register(self.stop)
+
+    def alive(self):
+        return sum(process.is_alive() for process in self._processes)
+
+    def stop(self, timeout=10.0):
+        self._stop.set()
+        deadline = time.monotonic() + timeout
+        for process in self._processes:
+            process.join(max(deadline - time.monotonic(), 0))
+            if process.is_alive():
+                process.terminate()
+                process.join()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run or manage background projection jobs")
+    parser.add_argument('--db', default=DEFAULT_DB_PATH)
+    commands = parser.add_subparsers(dest='command', required=True)
+    work_parser = commands.add_parser('work', help="run worker processes until interrupted")
+    work_parser.add_argument('--workers', type=int, default=1)
+    submit_parser = commands.add_parser('submit', help="queue a job")
+    submit_parser.add_argument('kind', choices=list(JOB_KINDS))
+    submit_parser.add_argument('params', nargs='?', default='{}', help="job parameters as JSON")
+    submit_parser.add_argument('--user-id', type=int)
+    for command in ('status', 'cancel'):
+        commands.add_parser(command).add_argument('job_id', type=int)
+    args = parser.parse_args()
+    configure_from_env()
+
+    if not create_database(args.db):
+        raise SystemExit(1)
+
+    if args.command == 'work':
+        # Finish the running job and exit on SIGTERM, as from a service manager
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+        if args.workers == 1:
+            try:
+                work(args.db, stop)
+            except KeyboardInterrupt:
+                pass
+            return
+        workers = JobWorkers(args.db, args.workers)
+        try:
+            while workers.alive() and not stop.wait(POLL_INTERVAL):
+                pass
+        except KeyboardInterrupt:
+            pass
+        workers.stop()
+        return
+
+    pool = ConnectionPool(args.db, max_readers=1)
+    try:
+        if args.command == 'submit':
+            print(f"Queued job {submit(pool, args.kind, json.loads(args.params), args.user_id)}")
+        elif args.command == 'cancel':
+            print("Cancelled" if cancel(pool, args.job_id) else "Job already finished")
+        else:
+            job = job_status(pool, args.job_id)
+            if job is None:
+                raise SystemExit(f"No job {args.job_id}")
+            print(json.dumps(job, indent=2))
+    finally:
+        pool.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+"""Concurrent multi-session load test of the database and auth layers.
+
+Simulates --users sessions against a throwaway copy of a synthetic database
+of --size projections (built and reused as in benchmark.py), so the users,
+projections and actual values a run adds never reach the cached file that
+later runs and benchmarks start from. Each session logs in as its own
+synthetic user and then, until --duration runs out, picks operations from
+the --mix weights:
+
+  register            Authenticator.register of a new user
+  login               Authenticator.login
+  save_projection     engine.store_projection
+  save_actual_values  engine.save_actual_values
+  history             the Historical Projections page query
+  series              a stored projection's yearly values
+
+With --mode threads every session shares one ConnectionPool and one
+Authenticator, like the app's sessions under init_connection; with --mode
+processes each session is a process with its own, like several app servers
+or workers on one database file. Throughput, p50/p99 latency and the rate of
+"database is locked" errors are reported per operation and written as JSON.
+
+Usage: python load_test.py [--users 8] [--size 100000] [--mode threads|processes]
+                           [--duration 30] [--mix history=50,series=20,...]
+                           [--busy-timeout 5000] [--output load_results.json]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+
+import engine
+from auth import Authenticator, hash_password
+from benchmark import INPUTS, default_tables, scratch_copy, summarize, synthetic_database
+from db import ConnectionPool, history_page, projection_series
+
+DEFAULT_MIX = {
+    'history': 50,
+    'series': 20,
+    'save_projection': 20,
+    'save_actual_values': 5,
+    'login': 4,
+    'register': 1,
+}
+
+PASSWORD = 'load-test'
+
+def _register(session):
+    session['authenticator'].register(f"load_{uuid.uuid4().hex}", PASSWORD)
+
+def _login(session):
+    status, _ = session['authenticator'].login(session['username'], PASSWORD)
+    if status != 'ok':
+        raise RuntimeError(f"login {status}")
+
+def _save_projection(session):
+    inputs = dict(INPUTS, seed_capital=session['rng'].uniform(0, 500000))
+    projection_id = engine.store_projection(
+        session['pool'], inputs, session['yearly_results'], session['user_id']
+    )
+    session['projection_ids'].append(projection_id)
+
+def _save_actual_values(session):
+    rng = session['rng']
+    engine.save_actual_values(session['pool'], rng.choice(list(engine.PROJECTION_YEARS)), {
+        'school_fees': rng.uniform(0, 600000),
+        'monthly_contribution': rng.uniform(5000, 20000),
+        'annual_bonus': rng.uniform(0, 100000),
+        'balance': rng.uniform(0, 2000000),
+    }, session['user_id'])
+
+def _history(session):
+    with session['pool'].read() as conn:
+        page, _ = history_page(conn, session['user_id'])
+    session['projection_ids'].extend(row['id'] for row in page[:1])
+
+def _series(session):
+    if not session['projection_ids']:
+        return _history(session)
+    with session['pool'].read() as conn:
+        projection_series(conn, session['rng'].choice(session['projection_ids']))
+
+OPERATIONS = {
+    'register': _register,
+    'login': _login,
+    'save_projection': _save_projection,
+    'save_actual_values': _save_actual_values,
+    'history': _history,
+    'series': _series,
+}
+
+def prepare_users(db_path, users):
+    """Give synthetic users user1..userN a known password; returns their ids"""
+    password_hash = hash_password(PASSWORD)
+    pool = ConnectionPool(db_path, max_readers=1)
+    try:
+        with pool.write() as conn:
+            conn.executemany("""
+                INSERT INTO users (username, password_hash) VALUES (?, ?)
+                ON CONFLICT (username) DO UPDATE SET password_hash = excluded.password_hash
+            """, ((f"user{number}", password_hash) for number in range(1, users + 1)))
+            return [conn.execute("SELECT id FROM users WHERE username = ?", (f"user{number}",)).fetchone()[0]
+                    for number in range(1, users + 1)]
+    finally:
+        pool.close()
+
+def run_session(db_path, number, user_id, duration, mix, seed=0, pool=None,
+                authenticator=None, busy_timeout=5000):
+    """One simulated user: weighted random operations until `duration` is up.
+
+    Opens its own pool and Authenticator unless they are given. Returns
+    {operation: {'timings': [...], 'locked': n, 'errors': n}}.
+    """
+    own_pool = pool is None
+    if own_pool:
+        pool = ConnectionPool(db_path, busy_timeout=busy_timeout)
+        authenticator = Authenticator(pool)
+    fees_df, bonus_df = default_tables()
+    session = {
+        'pool': pool,
+        'authenticator': authenticator,
+        'user_id': user_id,
+        'username': f"user{number}",
+        'rng': random.Random(seed * 1000003 + number),
+        'yearly_results': engine.calculate_projection(INPUTS, fees_df, bonus_df),
+        'projection_ids': [],
+    }
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    results = {name: {'timings': [], 'locked': 0, 'errors': 0} for name in names}
+
+    try:
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            name = session['rng'].choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                OPERATIONS[name](session)
+            except sqlite3.OperationalError as e:
+                if 'locked' in str(e) or 'busy' in str(e):
+                    results[name]['locked'] += 1
+                else:
+                    results[name]['errors'] += 1
+            except Exception:
+                results[name]['errors'] += 1
+            else:
+                results[name]['timings'].append(time.perf_counter() - started)
+    finally:
+        if own_pool:
+            pool.close()
+    return results
+
+def _run_session(args):
+    return run_session(*args)
+
+def run_load_test(db_path, users, mode, duration, mix, seed=0, busy_timeout=5000):
+    user_ids = prepare_users(db_path, users)
+    started = time.perf_counter()
+    pool_metrics = None
+    if mode == 'threads':
+        # One pool and Authenticator for every session, as in the app
+        pool = ConnectionPool(db_path, busy_timeout=busy_timeout)
+        authenticator = Authenticator(pool)
+        try:
+            with ThreadPoolExecutor(max_workers=users) as executor:
+                sessions = list(executor.map(
+                    lambda number: run_session(db_path, number, user_ids[number - 1], duration, mix,
+                                               seed, pool, authenticator),
+                    range(1, users + 1)
+                ))
+            pool_metrics = pool.metrics()
+        finally:
+            pool.close()
+    else:
+        with ProcessPoolExecutor(max_workers=users) as executor:
+            sessions = list(executor.map(_run_session, [
+                (db_path, number, user_ids[number - 1], duration, mix, seed, None, None, busy_timeout)
+                for number in range(1, users + 1)
+            ]))
+    elapsed = time.perf_counter() - started
+    return sessions, elapsed, pool_metrics
+
+def report(sessions, elapsed):
+    """Per-operation and overall throughput, latency and lock-error rates"""
+    operations = {}
+    totals = {'completed': 0, 'locked': 0, 'errors': 0}
+    for name in sessions[0]:
+        timings = [timing for session in sessions for timing in session[name]['timings']]
+        locked = sum(session[name]['locked'] for session in sessions)
+        errors = sum(session[name]['errors'] for session in sessions)
+        attempts = len(timings) + locked + errors
+        stats = summarize(timings) if timings else {'runs': 0}
+        stats.update({
+            'ops_per_sec': len(timings) / elapsed,
+            'locked': locked,
+            'errors': errors,
+            'locked_rate': locked / attempts if attempts else 0.0,
+        })
+        operations[name] = stats
+        totals['completed'] += len(timings)
+        totals['locked'] += locked
+        totals['errors'] += errors
+    attempts = totals['completed'] + totals['locked'] + totals['errors']
+    totals['ops_per_sec'] = totals['completed'] / elapsed
+    totals['locked_rate'] = totals['locked'] / attempts if attempts else 0.0
+    return {'operations': operations, 'total': totals}
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"unknown operation {name}")
+        mix[name] = float(weight)
+    return mix
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the database and auth layers")
+    parser.add_argument('--users', type=int, default=8)
+    parser.add_argument('--size', type=int, default=100000,
+                        help="synthetic database size in projections")
+    parser.add_argument('--mode', choices=('threads', 'processes'), default='threads')
+    parser.add_argument('--duration', type=float, default=30.0, help="seconds per session")
+    parser.add_argument('--mix', type=parse_mix,
+                        default=','.join(f"{name}={weight}" for name, weight in DEFAULT_MIX.items()),
+                        help="operation=weight pairs")
+    parser.add_argument('--busy-timeout', type=int, default=5000, help="SQLite busy timeout in ms")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--db-dir', default='bench_dbs')
+    parser.add_argument('--output', default='load_results.json')
+    args = parser.parse_args()
+
+    os.makedirs(args.db_dir, exist_ok=True)
+    with scratch_copy(synthetic_database(args.db_dir, args.size)) as db_path:
+        sessions, elapsed, pool_metrics = run_load_test(
+            db_path, args.users, args.mode, args.duration, args.mix, args.seed, args.busy_timeout
+        )
+    results = report(sessions, elapsed)
+    results['meta'] = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'users': args.users,
+        'size': args.size,
+        'mode': args.mode,
+        'duration': args.duration,
+        'busy_timeout_ms': args.busy_timeout,
+        'mix': args.mix,
+    }
+    if pool_metrics:
+        results['pool'] = pool_metrics
+    with open(args.output, 'w') as output:
+        json.dump(results, output, indent=2)
+
+    for name, stats in results['operations'].items():
+        latency = (f"p50 {stats['p50_ms']:9.2f} ms  p99 {stats['p99_ms']:9.2f} ms"
+                   if stats['runs'] else f"{'no completed runs':37}")
+        print(f"{name:20} {stats['ops_per_sec']:9.1f} ops/s  {latency}  "
+              f"locked {stats['locked_rate'] * 100:5.2f}%  errors {stats['errors']}")
+    total = results['total']
+    print(f"{'total':20} {total['ops_per_sec']:9.1f} ops/s  "
+          f"locked {total['locked_rate'] * 100:5.2f}% of {total['completed'] + total['locked'] + total['errors']:,} operations")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,357 @@
+import hashlib
+import itertools
+import logging
+import os
+import secrets
+import sqlite3
+import struct
+
+NAN = float('nan')
+
+logger = logging.getLogger('school_fees.migrations')
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'schema.sql')
+
+def _statements(script):
+    """Split an SQL script into complete statements"""
+    statement = ''
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            yield statement.strip()
+            statement = ''
+
+def _columns(conn, table):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+# Migrations must keep doing what they did when they were written, so the
+# db.py helpers they need are frozen here as they were at the time rather
+# than imported. Never change these; write a new migration instead.
+
+def _pack_series(values):
+    return struct.pack(f'<{len(values)}d', *values)
+
+def _series_columns(values):
+    years = [int(value[0]) for value in values]
+    first_year = min(years)
+    columns = [[NAN] * (max(years) - first_year + 1) for _ in range(4)]
+    seen = set()
+    for year, value in zip(years, values):
+        if year in seen:
+            continue
+        seen.add(year)
+        for column, amount in zip(columns, value[1:]):
+            column[year - first_year] = NAN if amount is None else float(amount)
+    return first_year, columns
+
+def _store_schedules(conn, blobs):
+    ids = {}
+    for blob in blobs:
+        if blob in ids:
+            continue
+        digest = hashlib.sha256(blob).digest()
+        conn.execute(
+            "INSERT OR IGNORE INTO schedules (digest, amounts) VALUES (?, ?)", (digest, blob)
+        )
+        ids[blob] = conn.execute(
+            "SELECT id FROM schedules WHERE digest = ?", (digest,)
+        ).fetchone()[0]
+    return ids
+
+def _pack_projection_values(conn, value_lists):
+    # (fees_schedule_id, bonus_schedule_id, first_year, monthly_contributions,
+    # balances) per list of (year, fees, contribution, bonus, balance) rows
+    packed = []
+    for values in value_lists:
+        first_year, columns = _series_columns(values)
+        packed.append((first_year, [_pack_series(column) for column in columns]))
+    schedule_ids = _store_schedules(conn, (
+        blob for _, columns in packed for blob in (columns[0], columns[2])
+    ))
+    return [
+        (schedule_ids[fees], schedule_ids[bonus], first_year, contributions, balances)
+        for first_year, (fees, contributions, bonus, balances) in packed
+    ]
+
+def _value_at(blob, index):
+    if 0 <= index < len(blob) // 8:
+        return struct.unpack_from('<d', blob, 8 * index)[0]
+    return NAN
+
+def _difference(projected, actual):
+    if projected is None or actual is None or projected != projected:
+        return None
+    return projected - actual
+
+def _refresh_variance(conn, user_id):
+    # Every (projection, year) of a user's projections with an actual value
+    actuals = {
+        year: values for year, *values in conn.execute("""
+            SELECT year, school_fees, monthly_contribution, actual_balance
+            FROM actual_values WHERE user_id = ?
+        """, (user_id,))
+    }
+    rows = conn.execute("""
+        SELECT p.id, s.first_year, s.monthly_contributions, s.balances, f.amounts
+        FROM projections p
+        JOIN projection_series s ON s.projection_id = p.id
+        JOIN schedules f ON f.id = p.fees_schedule_id
+        WHERE p.user_id = ?
+    """, (user_id,))
+    conn.executemany("""
+        INSERT OR IGNORE INTO projection_variance (
+            projection_id, year, user_id, balance_variance,
+            fees_variance, contribution_variance
+        )
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (
+        (projection_id, year, user_id,
+         _difference(balance, actual_balance),
+         _difference(_value_at(fees, year - first_year), actual_fees),
+         _difference(_value_at(contributions, year - first_year), actual_contribution))
+        for projection_id, first_year, contributions, balances, fees in rows
+        for year, (actual_fees, actual_contribution, actual_balance) in actuals.items()
+        for balance in [_value_at(balances, year - first_year)]
+        if balance == balance
+    ))
+
+def _baseline(conn):
+    with open(SCHEMA_PATH, 'r') as schema_file:
+        for statement in _statements(schema_file.read()):
+            conn.execute(statement)
+
+def _projection_user(conn):
+    # Databases built from the old schema.sql already have the column
+    if 'user_id' not in _columns(conn, 'projections'):
+        conn.execute("ALTER TABLE projections ADD COLUMN user_id INTEGER REFERENCES users(id)")
+
+def _history_indexes(conn):
+    # Historical Projections list: filter by user, newest first
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_projections_user_date
+        ON projections(user_id, projection_date, id)
+    """)
+    # Covers both the per-projection detail query and the value counts
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_projected_values_projection_year
+        ON projected_values(
+            projection_id, year, school_fees, monthly_contribution,
+            annual_bonus, projected_balance
+        )
+    """)
+
+def _packed_series(conn, batch_size=10000):
+    # Each distinct fees or bonus schedule is stored once, keyed by its hash
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schedules (
+            id INTEGER PRIMARY KEY,
+            digest BLOB UNIQUE NOT NULL,
+            amounts BLOB NOT NULL
+        )
+    """)
+    # One row per projection; yearly values are packed float64 arrays
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS projection_series (
+            projection_id INTEGER PRIMARY KEY REFERENCES projections(id),
+            first_year INTEGER NOT NULL,
+            monthly_contributions BLOB NOT NULL,
+            balances BLOB NOT NULL
+        )
+    """)
+    columns = _columns(conn, 'projections')
+    for column in ('fees_schedule_id', 'bonus_schedule_id'):
+        if column not in columns:
+            conn.execute(f"ALTER TABLE projections ADD COLUMN {column} INTEGER REFERENCES schedules(id)")
+
+    # Stream the old rows a projection at a time, in index order
+    rows = conn.execute("""
+        SELECT projection_id, year, school_fees, monthly_contribution,
+               annual_bonus, projected_balance
+        FROM projected_values
+        WHERE projection_id IS NOT NULL
+        ORDER BY projection_id, year, id
+    """)
+    groups = itertools.groupby(rows, key=lambda row: row[0])
+    while True:
+        batch = [
+            (projection_id, [tuple(row[1:]) for row in values])
+            for projection_id, values in itertools.islice(groups, batch_size)
+        ]
+        if not batch:
+            break
+        series = _pack_projection_values(conn, (values for _, values in batch))
+        conn.executemany("""
+            UPDATE projections SET fees_schedule_id = ?, bonus_schedule_id = ? WHERE id = ?
+        """, (packed[:2] + (projection_id,) for (projection_id, _), packed in zip(batch, series)))
+        conn.executemany("""
+            INSERT OR REPLACE INTO projection_series
+            (projection_id, first_year, monthly_contributions, balances)
+            VALUES (?, ?, ?, ?)
+        """, ((projection_id,) + packed[2:] for (projection_id, _), packed in zip(batch, series)))
+
+    conn.execute("DROP INDEX IF EXISTS idx_projected_values_projection_year")
+    conn.execute("DROP TABLE projected_values")
+
+def _jobs(conn):
+    # Background job queue; params, result and error are JSON text
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER REFERENCES users(id),
+            kind TEXT NOT NULL,
+            params TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            progress REAL NOT NULL DEFAULT 0,
+            message TEXT,
+            result TEXT,
+            error TEXT,
+            cancel_requested INTEGER NOT NULL DEFAULT 0,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            worker TEXT,
+            created_at REAL NOT NULL,
+            started_at REAL,
+            heartbeat_at REAL,
+            finished_at REAL
+        )
+    """)
+    # Workers claim the oldest queued job and look for stale running ones
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, id)")
+    # The job list in the app shows a user's newest jobs first
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_user ON jobs(user_id, id)")
+
+def _settings(conn):
+    # Application-wide settings; session_secret signs login session tokens
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS settings (
+            name TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        )
+    """)
+    conn.execute("""
+        INSERT OR IGNORE INTO settings (name, value) VALUES ('session_secret', ?)
+    """, (secrets.token_hex(32),))
+
+def _user_actual_values(conn):
+    # Rebuild actual_values with an owner; SQLite can't drop UNIQUE(year)
+    conn.execute("ALTER TABLE actual_values RENAME TO actual_values_shared")
+    conn.execute("""
+        CREATE TABLE actual_values (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER REFERENCES users(id),
+            year INTEGER NOT NULL,
+            school_fees DECIMAL,
+            monthly_contribution DECIMAL,
+            annual_bonus DECIMAL,
+            actual_balance DECIMAL,
+            recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (user_id, year)
+        )
+    """)
+    # Nothing records whose the shared rows were, so the oldest account
+    # (the only one, on most installs) gets them; without any user they stay
+    # unassigned. `python create_database.py --assign-actual-values` moves them.
+    owner = conn.execute("SELECT MIN(id) FROM users").fetchone()[0]
+    moved = conn.execute("""
+        INSERT INTO actual_values (
+            user_id, year, school_fees, monthly_contribution,
+            annual_bonus, actual_balance, recorded_at
+        )
+        SELECT ?, year, school_fees, monthly_contribution,
+               annual_bonus, actual_balance, recorded_at
+        FROM actual_values_shared
+    """, (owner,)).rowcount
+    if moved:
+        logger.warning("Migration 7: %d shared actual value rows %s", moved,
+                       f"assigned to user {owner}" if owner is not None else "left without an owner")
+    conn.execute("DROP TABLE actual_values_shared")
+
+    # Projected minus actual values, kept up to date as either side is saved
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS projection_variance (
+            projection_id INTEGER NOT NULL REFERENCES projections(id),
+            year INTEGER NOT NULL,
+            user_id INTEGER REFERENCES users(id),
+            balance_variance REAL,
+            fees_variance REAL,
+            contribution_variance REAL,
+            PRIMARY KEY (projection_id, year)
+        ) WITHOUT ROWID
+    """)
+    # Covers the per-user, per-year variance summary
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_projection_variance_user_year
+        ON projection_variance(
+            user_id, year, balance_variance, fees_variance, contribution_variance
+        )
+    """)
+    if owner is not None:
+        _refresh_variance(conn, owner)
+
+def _drop_projection_cache(conn):
+    # The projection cache now keeps its own file (cache.DEFAULT_CACHE_PATH)
+    conn.execute("DROP TABLE IF EXISTS projection_cache")
+
+def _job_checkpoints(conn):
+    # JSON a job saves as it goes, kept when a stale job is requeued
+    if 'checkpoint' not in _columns(conn, 'jobs'):
+        conn.execute("ALTER TABLE jobs ADD COLUMN checkpoint TEXT")
+
+def _token_versions(conn):
+    # Bumped on logout and password change to revoke session tokens
+    if 'token_version' not in _columns(conn, 'users'):
+        conn.execute("ALTER TABLE users ADD COLUMN token_version INTEGER NOT NULL DEFAULT 0")
+
+# (version, description, function). Append new migrations; never reorder.
+MIGRATIONS = [
+    (1, 'baseline schema', _baseline),
+    (2, 'projections.user_id', _projection_user),
+    (3, 'history indexes', _history_indexes),
+    (4, 'schedules and packed projection series', _packed_series),
+    (5, 'background jobs', _jobs),
+    (6, 'settings and session secret', _settings),
+    (7, 'per-user actual values and projection variance', _user_actual_values),
+    (8, 'projection cache moved out of the app database', _drop_projection_cache),
+    (9, 'job checkpoints', _job_checkpoints),
+    (10, 'session token versions', _token_versions),
+]
+
+# Migrations that drop enough data to be worth a VACUUM afterwards
+VACUUM_AFTER = {4}
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(conn):
+    """Apply every migration newer than the database's PRAGMA user_version.
+
+    Each migration runs in its own transaction together with the version
+    bump, so an interrupted upgrade resumes where it stopped. The file is
+    vacuumed after a migration in VACUUM_AFTER. Returns the versions applied.
+    """
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None
+    applied = []
+    try:
+        for version, description, apply in MIGRATIONS:
+            if version <= schema_version(conn):
+                continue
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Another process may have migrated while we waited for the lock
+                if version <= schema_version(conn):
+                    conn.execute("ROLLBACK")
+                    continue
+                apply(conn)
+                conn.execute(f"PRAGMA user_version = {version}")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            applied.append(version)
+        if VACUUM_AFTER.intersection(applied):
+            conn.execute("VACUUM")
+    finally:
+        conn.isolation_level = isolation_level
+    return applied
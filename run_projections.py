@@ -0,0 +1,298 @@
+"""Run calculate_projection for every scenario in a file across worker processes.
+
+Scenarios come from a CSV or JSONL file with seed_capital, investment_rate and
+contribution_escalation, plus optional id, user_id and start_year. JSONL
+scenarios may also give yearly fees and bonus lists, whose length sets the
+horizon, or fee_streams, one {"start_year", "fees"} object per child, with an
+optional horizon; the default plan is used otherwise.
+With --from-db every stored projection is re-run instead.
+
+Results are streamed to CSV or Parquet, one row per scenario year, as chunks
+finish; they are never collected in memory. --persist also saves each
+projection through the projections/projection_series tables: scenarios from
+a file as new projections, and re-run stored projections in place, so a
+nightly --from-db --persist run leaves every user's history the same size.
+
+Usage: python run_projections.py [SCENARIOS | --from-db] --output FILE
+                                 [--workers N] [--chunk-size N] [--persist]
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import engine
+from create_database import create_database
+from db import (ConnectionPool, insert_projections, projection_record, replace_projection_values,
+                series_values)
+from instrumentation import configure_from_env
+
+RESULT_FIELDS = ('scenario', 'user_id', 'year', 'school_fees', 'monthly_contribution',
+                 'annual_contributions', 'annual_bonus', 'balance', 'investment_return')
+
+def read_scenarios(path):
+    """Yield scenario dicts from a CSV or JSONL file"""
+    if path.endswith(('.jsonl', '.ndjson')):
+        with open(path) as scenario_file:
+            for number, line in enumerate(scenario_file, 1):
+                if line.strip():
+                    scenario = json.loads(line)
+                    scenario.setdefault('id', number)
+                    yield scenario
+    else:
+        with open(path, newline='') as scenario_file:
+            for number, row in enumerate(csv.DictReader(scenario_file), 1):
+                row.setdefault('id', number)
+                yield row
+
+def stored_scenario_conditions(user_id=None, through_id=None):
+    """WHERE clause and parameters selecting stored projections, for stored_scenarios"""
+    conditions, params = ['1'], []
+    if user_id is not None:
+        conditions.append('p.user_id = ?')
+        params.append(user_id)
+    if through_id is not None:
+        conditions.append('p.id <= ?')
+        params.append(through_id)
+    return ' AND '.join(conditions), params
+
+def stored_scenarios(pool, user_id=None, through_id=None, batch_size=1000):
+    """Yield stored projections' inputs in id order, for nightly re-projection.
+
+    Every projection by default, or only one user's and only those with an
+    id up to `through_id`. The fees and bonus schedules the projection was
+    saved with are reused when they have a value for every year; the
+    default plan is used otherwise. Each scenario's projection_id marks it
+    as a stored projection, which run_projections updates rather than adds.
+    """
+    where, params = stored_scenario_conditions(user_id, through_id)
+    with pool.read() as conn:
+        cursor = conn.execute(f"""
+            SELECT p.id, p.user_id, p.seed_capital, p.investment_rate,
+                   p.contribution_escalation, s.first_year,
+                   f.amounts as fees, b.amounts as bonus
+            FROM projections p
+            LEFT JOIN projection_series s ON s.projection_id = p.id
+            LEFT JOIN schedules f ON f.id = p.fees_schedule_id
+            LEFT JOIN schedules b ON b.id = p.bonus_schedule_id
+            WHERE {where}
+            ORDER BY p.id
+        """, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                scenario = dict(row)
+                schedules = {key: scenario.pop(key) for key in ('fees', 'bonus')}
+                scenario['start_year'] = scenario.pop('first_year')
+                scenario['projection_id'] = scenario['id']
+                for key, blob in schedules.items():
+                    if blob is not None:
+                        values = series_values(blob)
+                        # NaN marks a year the projection had no value for
+                        if all(value == value for value in values):
+                            scenario[key] = values
+                yield scenario
+
+def run_scenario(scenario):
+    """Project one scenario; returns (scenario, inputs, yearly_results)"""
+    inputs = {
+        'seed_capital': float(scenario['seed_capital']),
+        'investment_rate': float(scenario['investment_rate']),
+        'contribution_escalation': float(scenario['contribution_escalation'])
+    }
+    start_year = int(scenario.get('start_year') or engine.PROJECTION_YEARS.start)
+    streams = [(int(stream['start_year']), stream['fees'])
+               for stream in scenario.get('fee_streams') or []]
+    if streams:
+        end_year = max(stream_start + len(amounts) for stream_start, amounts in streams)
+        years = list(range(start_year, start_year + int(scenario.get('horizon') or end_year - start_year)))
+        fees = engine.combine_fee_streams(streams, years)
+    else:
+        fees = scenario.get('fees') or engine.DEFAULT_FEES
+        years = list(range(start_year, start_year + len(fees)))
+    # Bonus years past the end of the list are zero
+    bonus = list(scenario.get('bonus') or engine.DEFAULT_BONUS)
+    bonus = (bonus + [0.0] * len(years))[:len(years)]
+    yearly_results = engine.calculate_projection(
+        inputs, {'Year': years, 'Fees': fees}, {'Year': years, 'Bonus': bonus}
+    )
+    return scenario, inputs, yearly_results
+
+def run_chunk(scenarios):
+    return [run_scenario(scenario) for scenario in scenarios]
+
+def result_rows(scenario, yearly_results):
+    for year, values in yearly_results.items():
+        yield (
+            scenario['id'], scenario.get('user_id'), year, values['school_fees'],
+            values['monthly_contribution'], values['annual_contributions'],
+            values['annual_bonus'], values['balance'], values['investment_return']
+        )
+
+class CsvResultWriter:
+    def __init__(self, path):
+        self._file = open(path, 'w', newline='')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(RESULT_FIELDS)
+
+    def write(self, rows):
+        self._writer.writerows(rows)
+
+    def close(self):
+        self._file.close()
+
+class ParquetResultWriter:
+    """Buffers at most `row_group_size` rows before writing a row group"""
+
+    def __init__(self, path, row_group_size=50000):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Parquet output needs pyarrow: pip install pyarrow")
+        self._pa = pa
+        self._schema = pa.schema([
+            ('scenario', pa.string()), ('user_id', pa.int64()), ('year', pa.int64()),
+            *[(field, pa.float64()) for field in RESULT_FIELDS[3:]]
+        ])
+        self._writer = pq.ParquetWriter(path, self._schema)
+        self._row_group_size = row_group_size
+        self._buffer = []
+
+    def write(self, rows):
+        self._buffer.extend(rows)
+        if len(self._buffer) >= self._row_group_size:
+            self._flush()
+
+    def _flush(self):
+        if self._buffer:
+            columns = list(zip(*self._buffer))
+            columns[0] = [str(value) for value in columns[0]]
+            columns[1] = [int(value) if value not in (None, '') else None for value in columns[1]]
+            self._writer.write_table(self._pa.Table.from_arrays(
+                [self._pa.array(column, type=field.type)
+                 for column, field in zip(columns, self._schema)],
+                schema=self._schema
+            ))
+            self._buffer = []
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+def open_writer(path):
+    if path.endswith('.parquet'):
+        return ParquetResultWriter(path)
+    return CsvResultWriter(path)
+
+def run_projections(scenarios, writer, workers=None, chunk_size=64, pool=None, progress=None,
+                    persisted_through=None, checkpoint=None):
+    """Project `scenarios` in chunks across a process pool, streaming results.
+
+    At most 2 * workers chunks are in flight, so memory stays bounded however
+    many scenarios there are, and chunks are finished in order. If `pool` is
+    given each finished chunk is also saved in one write transaction,
+    leaving out scenarios with an id up to `persisted_through` (saved by an
+    earlier, interrupted run); `checkpoint(conn, scenario_id)` is called in
+    that transaction with the id of the chunk's last scenario. Scenarios
+    with a projection_id overwrite that projection's values; the rest are
+    saved as new projections. Returns run stats.
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = iter(lambda: list(itertools.islice(scenarios, chunk_size)), [])
+    stats = {'scenarios': 0, 'rows': 0, 'seconds': 0.0}
+    started = time.perf_counter()
+
+    def finish(results):
+        for scenario, inputs, yearly_results in results:
+            rows = list(result_rows(scenario, yearly_results))
+            writer.write(rows)
+            stats['rows'] += len(rows)
+        if pool is not None:
+            stored, new = [], []
+            for scenario, inputs, yearly_results in results:
+                if persisted_through is not None and scenario['id'] <= persisted_through:
+                    continue
+                record = projection_record(inputs, yearly_results, _user_id(scenario))
+                if scenario.get('projection_id') is None:
+                    new.append(record)
+                else:
+                    stored.append((scenario['projection_id'], record))
+            with pool.write() as conn:
+                insert_projections(conn, new)
+                replace_projection_values(conn, [projection_id for projection_id, _ in stored],
+                                          [record for _, record in stored])
+                if checkpoint:
+                    checkpoint(conn, results[-1][0]['id'])
+        stats['scenarios'] += len(results)
+        stats['seconds'] = time.perf_counter() - started
+        if progress:
+            progress(dict(stats))
+
+    if workers == 1:
+        for chunk in chunks:
+            finish(run_chunk(chunk))
+        return stats
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Oldest first, so results and checkpoints follow scenario order
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(run_chunk, chunk))
+            if len(pending) >= 2 * workers:
+                finish(pending.popleft().result())
+        while pending:
+            finish(pending.popleft().result())
+    return stats
+
+def _user_id(scenario):
+    user_id = scenario.get('user_id')
+    return int(user_id) if user_id not in (None, '') else None
+
+def main():
+    parser = argparse.ArgumentParser(description="Run projections for a file of scenarios")
+    parser.add_argument('scenarios', nargs='?')
+    parser.add_argument('--from-db', action='store_true',
+                        help="re-project every projection stored in the database")
+    parser.add_argument('--output', required=True, help="results file (.csv or .parquet)")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--chunk-size', type=int, default=64)
+    parser.add_argument('--persist', action='store_true',
+                        help="also save results: new projections for a scenarios file, "
+                             "updated in place with --from-db")
+    parser.add_argument('--db', default='school_fees.db')
+    args = parser.parse_args()
+    configure_from_env()
+    if bool(args.scenarios) == args.from_db:
+        parser.error("give a scenarios file or --from-db")
+
+    pool = None
+    if args.from_db or args.persist:
+        if not create_database(args.db):
+            raise SystemExit(1)
+        pool = ConnectionPool(args.db, max_readers=1)
+
+    scenarios = stored_scenarios(pool) if args.from_db else read_scenarios(args.scenarios)
+    writer = open_writer(args.output)
+    try:
+        stats = run_projections(
+            scenarios, writer, args.workers, args.chunk_size,
+            pool=pool if args.persist else None
+        )
+    finally:
+        writer.close()
+        if pool is not None:
+            pool.close()
+
+    rate = stats['scenarios'] / stats['seconds'] if stats['seconds'] else 0.0
+    print(f"Projected {stats['scenarios']:,} scenarios ({stats['rows']:,} rows) "
+          f"in {stats['seconds']:.1f}s, {rate:,.0f} scenarios/sec")
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
+-- Baseline schema (migration 1). Later changes live in migrations.py.
+
 CREATE TABLE IF NOT EXISTS projections (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     projection_date DATE NOT NULL,
@@ -34,6 +36,3 @@ CREATE TABLE IF NOT EXISTS users (
     password_hash TEXT NOT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
-
--- Add user_id to projections table
-ALTER TABLE projections ADD COLUMN user_id INTEGER REFERENCES users(id);
\ No newline at end of file
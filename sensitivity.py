@@ -0,0 +1,134 @@
+"""How a plan's outcome moves with its inputs, in batched NumPy passes.
+
+sensitivity_grid evaluates every (investment rate, contribution escalation)
+pair of a grid as one batch of scenarios, and tornado varies each input and
+each year's fees and bonus on its own, both down and up, in a second batch.
+Neither calls the scalar engine per scenario.
+
+Every scenario reports three metrics:
+  monthly_contribution  the required first-year monthly contribution
+  final_balance         the balance left at the end at a fixed contribution
+  minimum_balance       the least left after paying any year's fees, or at
+                        the end, at that contribution; negative means short
+The fixed contribution defaults to the one the unchanged plan requires.
+"""
+import numpy as np
+
+from batch import _broadcast_inputs, _solve, monthly_rates, project, year_factors
+from instrumentation import instrumentation
+
+METRICS = ('monthly_contribution', 'final_balance', 'minimum_balance')
+
+# The amount a tornado moves an input that is 0 by, per unit of `change`:
+# 10% of R 100,000 of seed capital, or of 10 percentage points of a rate
+ZERO_SCALES = {'seed_capital': 100000.0, 'investment_rate': 0.1, 'contribution_escalation': 0.1}
+
+def _evaluate(seed_capital, investment_rate, contribution_escalation, fees, bonus,
+              monthly_contribution):
+    seed_capital, investment_rate, contribution_escalation, fees, bonus = _broadcast_inputs(
+        seed_capital, investment_rate, contribution_escalation, fees, bonus
+    )
+    monthly_rate = monthly_rates(investment_rate)
+    required = _solve(seed_capital, year_factors(monthly_rate), contribution_escalation, fees, bonus)
+    payment = np.broadcast_to(np.asarray(monthly_contribution, dtype=float), seed_capital.shape).copy()
+    balance = project(seed_capital, payment, monthly_rate, contribution_escalation, fees, bonus)['balance']
+    # What is left once each year's fees are paid, and at the end
+    left = np.concatenate([balance[:, :-1] - fees[:, 1:], balance[:, -1:]], axis=1)
+    return {
+        'monthly_contribution': required,
+        'final_balance': balance[:, -1],
+        'minimum_balance': left.min(axis=1),
+    }
+
+def base_contribution(inputs, fees, bonus):
+    """Required monthly contribution of the unchanged plan"""
+    return float(_evaluate(inputs['seed_capital'], inputs['investment_rate'],
+                           inputs['contribution_escalation'], fees, bonus, 0.0)['monthly_contribution'][0])
+
+def sensitivity_grid(inputs, fees, bonus, investment_rates, contribution_escalations,
+                     monthly_contribution=None):
+    """Every metric over a grid of investment rates and contribution escalations.
+
+    Returns the two axes plus an (escalations, rates) array per metric, so
+    rows follow contribution escalation and columns investment rate, and the
+    fixed monthly contribution the balances were projected at.
+    """
+    investment_rates = np.asarray(investment_rates, dtype=float)
+    contribution_escalations = np.asarray(contribution_escalations, dtype=float)
+    if monthly_contribution is None:
+        monthly_contribution = base_contribution(inputs, fees, bonus)
+
+    with instrumentation.timer('sensitivity', cells=investment_rates.size * contribution_escalations.size):
+        rate, escalation = np.meshgrid(investment_rates, contribution_escalations)
+        metrics = _evaluate(inputs['seed_capital'], rate.ravel(), escalation.ravel(),
+                            fees, bonus, monthly_contribution)
+
+    grid = {name: values.reshape(rate.shape) for name, values in metrics.items()}
+    grid.update(
+        investment_rate=investment_rates,
+        contribution_escalation=contribution_escalations,
+        fixed_contribution=float(monthly_contribution),
+    )
+    return grid
+
+def tornado(inputs, fees, bonus, years, change=0.1, monthly_contribution=None):
+    """One-at-a-time sensitivity to each input and each year's fees and bonus.
+
+    Every input, and every year with fees or a bonus, is moved down and
+    then up by `change` (a fraction of its value) with everything else
+    held. An input that is 0 moves by `change` times its ZERO_SCALES amount
+    instead, and its name says by how much. Seed capital, fees and bonus
+    never go below 0. Returns the names, the base metrics, and low/high
+    arrays of each metric with one entry per name.
+    """
+    fees = np.asarray(fees, dtype=float)
+    bonus = np.asarray(bonus, dtype=float)
+    if monthly_contribution is None:
+        monthly_contribution = base_contribution(inputs, fees, bonus)
+
+    scalars = ('seed_capital', 'investment_rate', 'contribution_escalation')
+    fee_years = [index for index in range(len(fees)) if fees[index] != 0]
+    bonus_years = [index for index in range(len(bonus)) if bonus[index] != 0]
+    # Scaling 0 would leave it at 0, so those inputs take an absolute step
+    steps = {name: change * ZERO_SCALES[name] for name in scalars if float(inputs[name]) == 0}
+    names = [name.replace('_', ' ').title() for name in scalars]
+    for position, name in enumerate(scalars):
+        if name == 'seed_capital' and name in steps:
+            # Only up: there is no negative seed capital
+            names[position] += f" (+R {steps[name]:,.0f})"
+        elif name in steps:
+            names[position] += f" (±{steps[name]:.2%})"
+    names += [f"{years[index]} Fees" for index in fee_years]
+    names += [f"{years[index]} Bonus" for index in bonus_years]
+
+    # Scenario 0 is the base; then each factor low, then each factor high
+    count = len(names)
+    values = {name: np.full(1 + 2 * count, float(inputs[name])) for name in scalars}
+    schedules = np.tile(fees, (1 + 2 * count, 1))
+    bonuses = np.tile(bonus, (1 + 2 * count, 1))
+    for offset, sign in ((1, -1), (1 + count, 1)):
+        for position, name in enumerate(scalars):
+            if name in steps:
+                values[name][offset + position] += sign * steps[name]
+            else:
+                values[name][offset + position] *= 1 + sign * change
+        for position, index in enumerate(fee_years, len(scalars)):
+            schedules[offset + position, index] *= 1 + sign * change
+        for position, index in enumerate(bonus_years, len(scalars) + len(fee_years)):
+            bonuses[offset + position, index] *= 1 + sign * change
+    values['seed_capital'] = np.maximum(values['seed_capital'], 0.0)
+    schedules = np.maximum(schedules, 0.0)
+    bonuses = np.maximum(bonuses, 0.0)
+
+    with instrumentation.timer('sensitivity', cells=1 + 2 * count):
+        metrics = _evaluate(values['seed_capital'], values['investment_rate'],
+                            values['contribution_escalation'], schedules, bonuses, monthly_contribution)
+
+    return {
+        'names': names,
+        'change': change,
+        'fixed_contribution': float(monthly_contribution),
+        'base': {name: float(metric[0]) for name, metric in metrics.items()},
+        'low': {name: metric[1:1 + count] for name, metric in metrics.items()},
+        'high': {name: metric[1 + count:] for name, metric in metrics.items()},
+    }
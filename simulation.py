@@ -0,0 +1,103 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from batch import _broadcast_inputs, _solve, monthly_rates, project, year_factors
+
+PERCENTILES = (5, 50, 95)
+
+# Gaps smaller than half a cent are rounding, not a shortfall; the required
+# contribution leaves the binding year exactly at its fees
+SHORTFALL_TOLERANCE = 0.005
+
+def _simulate_chunk(args):
+    """Project one chunk of return paths; runs in a worker process"""
+    (seed_sequence, paths, seed_capital, monthly_payment, investment_rate,
+     volatility, contribution_escalation, fees, bonus) = args
+    rng = np.random.default_rng(seed_sequence)
+    years = fees.shape[0]
+
+    # Lognormal annual growth with mean 1 + investment_rate
+    log_mean = np.log1p(investment_rate) - volatility ** 2 / 2
+    annual_growth = np.exp(rng.normal(log_mean, volatility, size=(paths, years)))
+    monthly_rate = annual_growth ** (1/12) - 1
+
+    results = project(
+        np.full(paths, seed_capital),
+        np.full(paths, monthly_payment),
+        monthly_rate,
+        contribution_escalation,
+        np.broadcast_to(fees, (paths, years)),
+        np.broadcast_to(bonus, (paths, years)),
+    )
+    return results['balance']
+
+def simulate_projection(inputs, fees, bonus, volatility=0.15, paths=10000, seed=None,
+                        monthly_contribution=None, workers=1, chunk_size=25000, progress=None):
+    """Monte Carlo projection with a random investment return each year.
+
+    Every path goes through the same yearly fees deduction, monthly
+    contributions and bonus as calculate_projection, with the annual return
+    drawn from a lognormal distribution whose mean is `investment_rate` and
+    whose log-volatility is `volatility`. The monthly contribution defaults to
+    the deterministic required contribution.
+
+    Paths are generated in chunks of `chunk_size`, each from its own child of
+    `seed`, so results are reproducible whatever the number of `workers`.
+    With workers > 1 the chunks run in a process pool. `progress`, if given,
+    is called with (chunks done, total chunks) as each chunk finishes.
+
+    Returns a dict with the monthly contribution used, the probability that
+    the balance falls short of the fees in any year (or ends negative), the
+    per-year shortfall probability, and P5/P50/P95 balances per year.
+    """
+    seed_capital, investment_rate, contribution_escalation, fees_2d, bonus_2d = _broadcast_inputs(
+        inputs['seed_capital'], inputs['investment_rate'], inputs['contribution_escalation'],
+        fees, bonus
+    )
+    if len(seed_capital) != 1:
+        raise ValueError("simulate_projection takes a single scenario")
+
+    if monthly_contribution is None:
+        monthly_contribution = _solve(
+            seed_capital, year_factors(monthly_rates(investment_rate)),
+            contribution_escalation, fees_2d, bonus_2d
+        )[0]
+
+    fees = np.array(fees_2d[0])
+    bonus = np.array(bonus_2d[0])
+    chunk_sizes = [min(chunk_size, paths - start) for start in range(0, paths, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(chunk_sizes))
+    tasks = [
+        (child, size, float(seed_capital[0]), float(monthly_contribution),
+         float(investment_rate[0]), float(volatility), float(contribution_escalation[0]),
+         fees, bonus)
+        for child, size in zip(seeds, chunk_sizes)
+    ]
+
+    def report(chunks):
+        for done, chunk in enumerate(chunks, 1):
+            if progress:
+                progress(done, len(tasks))
+            yield chunk
+
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            balances = np.concatenate(list(report(executor.map(_simulate_chunk, tasks))))
+    else:
+        balances = np.concatenate(list(report(_simulate_chunk(task) for task in tasks)))
+
+    # Shortfall: balance going into a year can't cover that year's fees,
+    # or the plan ends below zero
+    short = np.zeros_like(balances, dtype=bool)
+    short[:, 1:] = balances[:, :-1] < fees[1:] - SHORTFALL_TOLERANCE
+    short[:, -1] |= balances[:, -1] < -SHORTFALL_TOLERANCE
+
+    bands = np.percentile(balances, PERCENTILES, axis=0)
+    return {
+        'monthly_contribution': float(monthly_contribution),
+        'paths': paths,
+        'shortfall_probability': float(short.any(axis=1).mean()),
+        'shortfall_by_year': short.mean(axis=0),
+        'percentiles': dict(zip(PERCENTILES, bands)),
+    }
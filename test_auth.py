@@ -0,0 +1,87 @@
+import os
+import tempfile
+import time
+
+from auth import SESSION_TTL, Authenticator, issue_token, verify_token
+from create_database import create_database
+from db import ConnectionPool
+
+SECRET = b'test-secret'
+
+def versions(current):
+    return lambda user_id: current.get(user_id)
+
+def test_token_round_trip_and_expiry():
+    now = time.time()
+    token = issue_token(SECRET, 1, 'alice', 0, now=now)
+    assert verify_token(SECRET, token, versions({1: 0}), now=now) == (1, 'alice')
+    assert verify_token(SECRET, token, versions({1: 0}), now=now + SESSION_TTL - 1) == (1, 'alice')
+    assert verify_token(SECRET, token, versions({1: 0}), now=now + SESSION_TTL) is None
+
+def test_token_rejections():
+    token = issue_token(SECRET, 1, 'alice', 0)
+    body, signature = token.split('.')
+    forged = issue_token(b'other-secret', 1, 'alice', 0)
+    for bad in (forged, body + '.' + signature[::-1], body, '', 'not a token', 'é.é'):
+        assert verify_token(SECRET, bad, versions({1: 0})) is None, bad
+    # Revoked by a newer version, or the user is gone
+    assert verify_token(SECRET, token, versions({1: 1})) is None
+    assert verify_token(SECRET, token, versions({})) is None
+
+def test_login_failure_window():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'auth.db')
+        assert create_database(path)
+        pool = ConnectionPool(path, max_readers=1)
+        authenticator = Authenticator(pool, workers=1, max_failures=3, window=60)
+        try:
+            user_id = authenticator.register('alice', 'secret')
+            assert authenticator.login('alice', 'secret') == ('ok', user_id)
+            for _ in range(3):
+                assert authenticator.login('alice', 'wrong') == ('invalid', None)
+            # Locked out, even with the right password
+            assert authenticator.login('alice', 'secret') == ('rate_limited', None)
+            assert authenticator.metrics()['locked_out_users'] == 1
+            # Other users are not affected
+            assert authenticator.login('bob', 'secret') == ('invalid', None)
+
+            # Failures age out of the window; unknown users skip bcrypt, so this is quick
+            authenticator = Authenticator(pool, workers=1, max_failures=3, window=0.2)
+            for _ in range(3):
+                assert authenticator.login('mallory', 'wrong') == ('invalid', None)
+            assert authenticator.login('mallory', 'wrong') == ('rate_limited', None)
+            time.sleep(0.3)
+            assert authenticator.login('mallory', 'wrong') == ('invalid', None)
+            assert authenticator.metrics()['locked_out_users'] == 0
+        finally:
+            pool.close()
+
+def test_logout_and_password_change_revoke_tokens():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'auth.db')
+        assert create_database(path)
+        pool = ConnectionPool(path, max_readers=1)
+        authenticator = Authenticator(pool, workers=1)
+        try:
+            user_id = authenticator.register('alice', 'secret')
+            token = authenticator.issue_token(user_id, 'alice')
+            assert authenticator.session(token) == (user_id, 'alice')
+
+            authenticator.revoke_sessions(user_id)
+            assert authenticator.session(token) is None
+            token = authenticator.issue_token(user_id, 'alice')
+            assert authenticator.session(token) == (user_id, 'alice')
+
+            authenticator.change_password(user_id, 'changed')
+            assert authenticator.session(token) is None
+            assert authenticator.login('alice', 'secret') == ('invalid', None)
+            assert authenticator.login('alice', 'changed') == ('ok', user_id)
+        finally:
+            pool.close()
+
+if __name__ == "__main__":
+    test_token_round_trip_and_expiry()
+    test_token_rejections()
+    test_login_failure_window()
+    test_logout_and_password_change_revoke_tokens()
+    print("Auth tests passed")
@@ -0,0 +1,80 @@
+import csv
+import json
+import os
+import tempfile
+
+from bulk_import import bulk_import
+from create_database import create_database
+from db import ConnectionPool, projection_series
+
+VALUE_COLUMNS = ('year', 'school_fees', 'monthly_contribution', 'annual_bonus', 'projected_balance')
+
+# Three projections; the second skips 2026, which is stored as a gap
+PROJECTIONS = [
+    ({'projection_date': '2025-01-01', 'seed_capital': 1000.0, 'investment_rate': 0.05,
+      'contribution_escalation': 0.02, 'user_id': 1},
+     [(2025, 0.0, 100.0, 0.0, 1100.0), (2026, 50.0, 102.0, 10.0, 2300.0)]),
+    ({'projection_date': '2025-02-01', 'seed_capital': 2000.0, 'investment_rate': 0.06,
+      'contribution_escalation': 0.03, 'user_id': 1},
+     [(2025, 0.0, 200.0, 0.0, 2200.0), (2027, 60.0, 206.0, 20.0, 4800.0)]),
+    ({'projection_date': '2025-03-01', 'seed_capital': 3000.0, 'investment_rate': 0.07,
+      'contribution_escalation': 0.04, 'user_id': ''},
+     [(2025, 0.0, 300.0, 0.0, 3300.0)]),
+]
+
+def write_csv(path):
+    with open(path, 'w', newline='') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(('projection', *PROJECTIONS[0][0], *VALUE_COLUMNS))
+        for number, (projection, values) in enumerate(PROJECTIONS):
+            for value in values:
+                writer.writerow((number, *projection.values(), *value))
+
+def write_jsonl(path):
+    with open(path, 'w') as jsonl_file:
+        for projection, values in PROJECTIONS:
+            row = dict(projection, values=[dict(zip(VALUE_COLUMNS, value)) for value in values])
+            jsonl_file.write(json.dumps(row) + '\n')
+
+def check_import(directory, path):
+    db_path = os.path.join(directory, 'import.db')
+    assert create_database(db_path)
+    pool = ConnectionPool(db_path, max_readers=1)
+    reports = []
+    try:
+        stats = bulk_import(pool, path, batch_size=2, commit_every=1, progress=reports.append)
+        assert (stats['projections'], stats['rows']) == (3, 8)
+        # One commit per batch of two projections
+        assert [report['projections'] for report in reports] == [2, 3]
+
+        with pool.read() as conn:
+            rows = conn.execute("""
+                SELECT id, projection_date, seed_capital, investment_rate,
+                       contribution_escalation, user_id
+                FROM projections ORDER BY id
+            """).fetchall()
+            assert len(rows) == 3
+            for row, (projection, values) in zip(rows, PROJECTIONS):
+                assert tuple(row)[1:] == tuple(projection.values())[:4] + (projection['user_id'] or None,)
+                series = projection_series(conn, row['id'])
+                for index, column in enumerate(VALUE_COLUMNS):
+                    assert series[column].tolist() == [value[index] for value in values], column
+    finally:
+        pool.close()
+
+def test_csv_import():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'projections.csv')
+        write_csv(path)
+        check_import(directory, path)
+
+def test_jsonl_import():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'projections.jsonl')
+        write_jsonl(path)
+        check_import(directory, path)
+
+if __name__ == "__main__":
+    test_csv_import()
+    test_jsonl_import()
+    print("Bulk import tests passed")
@@ -0,0 +1,70 @@
+import os
+import tempfile
+
+from cache import ProjectionCache, scenario_key
+from engine import PROJECTION_YEARS, DEFAULT_FEES, DEFAULT_BONUS, calculate_projection
+
+FEES = {'Year': list(PROJECTION_YEARS), 'Fees': DEFAULT_FEES}
+BONUS = {'Year': list(PROJECTION_YEARS), 'Bonus': DEFAULT_BONUS}
+
+def scenario(seed_capital):
+    return {'seed_capital': seed_capital, 'investment_rate': 0.0878, 'contribution_escalation': 0.05}
+
+def test_hits_and_misses():
+    with tempfile.TemporaryDirectory() as directory:
+        cache = ProjectionCache(os.path.join(directory, 'cache.db'))
+        calls = []
+
+        def compute(*args):
+            calls.append(args)
+            return calculate_projection(*args)
+
+        first = cache.projection(scenario(119000.0), FEES, BONUS, compute)
+        second = cache.projection(scenario(119000.0), FEES, BONUS, compute)
+        assert len(calls) == 1
+        assert first == second == calculate_projection(scenario(119000.0), FEES, BONUS)
+
+        # Results are copies; changing one must not change the cache
+        second[2030]['balance'] = -1
+        assert cache.projection(scenario(119000.0), FEES, BONUS, compute) == first
+
+        cache.projection(scenario(120000.0), FEES, BONUS, compute)
+        stats = cache.stats()
+        assert (stats['hits'], stats['misses'], stats['disk_hits']) == (2, 2, 0)
+        assert stats['hit_rate'] == 0.5
+
+def test_lru_eviction():
+    with tempfile.TemporaryDirectory() as directory:
+        cache = ProjectionCache(os.path.join(directory, 'cache.db'), max_entries=2, max_stored=3)
+        for seed_capital in (1.0, 2.0, 3.0):
+            cache.contribution(scenario(seed_capital), FEES, BONUS, lambda *args: seed_capital)
+        # Touch 2.0 so that 3.0 is the least recently used in memory
+        cache.contribution(scenario(2.0), FEES, BONUS, None)
+        assert cache.stats()['memory_entries'] == 2
+
+        # 1.0 fell out of memory but is still on disk
+        assert cache.contribution(scenario(1.0), FEES, BONUS, None) == 1.0
+        assert cache.stats()['disk_hits'] == 1
+
+        # A fourth entry pushes the least recently used one off the disk as well
+        cache.contribution(scenario(4.0), FEES, BONUS, lambda *args: 4.0)
+        kept = {row[0] for row in cache._conn.execute("SELECT key FROM projection_cache")}
+        assert kept == {scenario_key('contribution', scenario(seed_capital), FEES, BONUS)
+                        for seed_capital in (1.0, 2.0, 4.0)}
+
+def test_reads_do_not_write():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'cache.db')
+        ProjectionCache(path).contribution(scenario(1.0), FEES, BONUS, lambda *args: 1.0)
+
+        cache = ProjectionCache(path)
+        changes = cache._conn.total_changes
+        assert cache.contribution(scenario(1.0), FEES, BONUS, None) == 1.0
+        assert cache._conn.total_changes == changes
+        assert not cache._conn.in_transaction
+
+if __name__ == "__main__":
+    test_hits_and_misses()
+    test_lru_eviction()
+    test_reads_do_not_write()
+    print("Cache tests passed")
@@ -1,29 +1,70 @@
+import os
 import sqlite3
+import tempfile
+
+from create_database import create_database
+from db import (PROJECTION_SERIES_QUERY, ACTUAL_VALUES_QUERY, PROJECTION_VARIANCE_QUERY,
+                VARIANCE_SUMMARY_QUERY, history_query, projection_matrix_query)
+from migrations import LATEST_VERSION, schema_version
+
+# Tab queries whose plans must use an index on the filtered table
+INDEXED_QUERIES = {
+    'Historical Projections': history_query(1),
+    'Historical Projections (next page)': history_query(1, after=('2025-01-01', 1)),
+    'Historical Projections (filtered)': history_query(
+        1, {'date_from': '2024-01-01', 'min_rate': 0.05, 'max_seed': 200000.0}
+    ),
+    'Projection details': (PROJECTION_SERIES_QUERY, (1,)),
+    'Projection comparison': (projection_matrix_query(3), (1, 2, 3)),
+    'Actual Values': (ACTUAL_VALUES_QUERY, (1,)),
+    'Projected vs Actual': (VARIANCE_SUMMARY_QUERY, (1,)),
+    'Projection variance': (PROJECTION_VARIANCE_QUERY, (1,)),
+}
+
+def query_plan(cursor, query, params):
+    cursor.execute(f"EXPLAIN QUERY PLAN {query}", params)
+    return [row[-1] for row in cursor.fetchall()]
 
 def test_database():
-    try:
-        # Connect to the database
-        conn = sqlite3.connect('school_fees.db')
-        cursor = conn.cursor()
-
-        # Get list of tables
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-        tables = cursor.fetchall()
-        
-        print("Tables in database:")
-        for table in tables:
-            print(f"- {table[0]}")
-            # Show structure of each table
-            cursor.execute(f"PRAGMA table_info({table[0]})")
-            columns = cursor.fetchall()
-            for column in columns:
-                print(f"  * {column[1]} ({column[2]})")
-        
-        conn.close()
-        print("\nDatabase test completed successfully!")
-        
-    except sqlite3.Error as e:
-        print(f"An error occurred: {e}")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'school_fees.db')
+        assert create_database(path)
+        conn = sqlite3.connect(path)
+        try:
+            cursor = conn.cursor()
+
+            print(f"Schema version: {schema_version(conn)}")
+            assert schema_version(conn) == LATEST_VERSION
+
+            # Get list of tables
+            cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
+            tables = cursor.fetchall()
+            assert tables
+
+            print("Tables in database:")
+            for table in tables:
+                print(f"- {table[0]}")
+                # Show structure of each table
+                cursor.execute(f"PRAGMA table_info({table[0]})")
+                columns = cursor.fetchall()
+                for column in columns:
+                    print(f"  * {column[1]} ({column[2]})")
+                # Show indexes of each table
+                cursor.execute(f"PRAGMA index_list({table[0]})")
+                for index in cursor.fetchall():
+                    print(f"  # {index[1]}")
+
+            # Show how SQLite runs the tab queries
+            for name, (query, params) in INDEXED_QUERIES.items():
+                plan = query_plan(cursor, query, params)
+                print(f"\nQuery plan for {name}:")
+                for step in plan:
+                    print(f"  {step}")
+                scans = [step for step in plan if 'SCAN' in step]
+                assert not scans, f"{name} query scans: {scans}"
+        finally:
+            conn.close()
+    print("\nDatabase test completed successfully!")
 
 if __name__ == "__main__":
-    test_database() 
\ No newline at end of file
+    test_database()
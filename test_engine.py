@@ -0,0 +1,75 @@
+import random
+
+import numpy as np
+
+import engine
+from engine import PROJECTION_YEARS, DEFAULT_FEES, DEFAULT_BONUS
+
+YEARS = list(PROJECTION_YEARS)
+
+def scenarios(count=50, seed=1):
+    rng = random.Random(seed)
+    inputs = [{
+        'seed_capital': rng.uniform(0, 500000),
+        'investment_rate': rng.uniform(-0.02, 0.15),
+        'contribution_escalation': rng.uniform(0, 0.1),
+    } for _ in range(count)]
+    # Edge cases: no growth, no escalation, nothing saved up front
+    inputs.append({'seed_capital': 0.0, 'investment_rate': 0.0, 'contribution_escalation': 0.0})
+    fees = [[amount * rng.uniform(0.5, 1.5) for amount in DEFAULT_FEES] for _ in inputs]
+    return inputs, fees
+
+def column(inputs, name):
+    return np.array([scenario[name] for scenario in inputs])
+
+def test_batch_matches_scalar_engine():
+    inputs, fees = scenarios()
+    batch = engine.calculate_projection_batch(
+        column(inputs, 'seed_capital'), column(inputs, 'investment_rate'),
+        column(inputs, 'contribution_escalation'), np.array(fees), np.array(DEFAULT_BONUS, dtype=float)
+    )
+    for row, (scenario, schedule) in enumerate(zip(inputs, fees)):
+        expected = engine.calculate_projection(
+            scenario, {'Year': YEARS, 'Fees': schedule}, {'Year': YEARS, 'Bonus': DEFAULT_BONUS}
+        )
+        for index, year in enumerate(YEARS):
+            for key, value in expected[year].items():
+                assert batch[key][row, index] == value, (row, year, key)
+
+def test_batch_solver_matches_scalar_solver():
+    inputs, fees = scenarios(seed=2)
+    required = engine.solve_monthly_contribution_batch(
+        column(inputs, 'seed_capital'), column(inputs, 'investment_rate'),
+        column(inputs, 'contribution_escalation'), np.array(fees), DEFAULT_BONUS
+    )
+    expected = [
+        engine.solve_monthly_contribution(
+            scenario['seed_capital'], scenario['investment_rate'],
+            scenario['contribution_escalation'], schedule, DEFAULT_BONUS
+        )
+        for scenario, schedule in zip(inputs, fees)
+    ]
+    assert required.tolist() == expected
+
+def test_solved_contribution_is_minimal():
+    inputs, fees = scenarios(count=10, seed=3)
+    fees = np.array(fees)
+    required = engine.solve_monthly_contribution_batch(
+        column(inputs, 'seed_capital'), column(inputs, 'investment_rate'),
+        column(inputs, 'contribution_escalation'), fees, DEFAULT_BONUS
+    )
+    for payment, shortfall in ((required, False), (required * 0.999, True)):
+        balance = engine.calculate_projection_batch(
+            column(inputs, 'seed_capital'), column(inputs, 'investment_rate'),
+            column(inputs, 'contribution_escalation'), fees, DEFAULT_BONUS, payment
+        )['balance']
+        # Each year's fees come out of the previous year's closing balance
+        left = np.concatenate([balance[:, :-1] - fees[:, 1:], balance[:, -1:]], axis=1).min(axis=1)
+        tolerance = 1e-6 * fees.max()
+        assert ((left < -tolerance) == shortfall).all()
+
+if __name__ == "__main__":
+    test_batch_matches_scalar_engine()
+    test_batch_solver_matches_scalar_solver()
+    test_solved_contribution_is_minimal()
+    print("Engine tests passed")
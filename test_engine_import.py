@@ -0,0 +1,42 @@
+import os
+import subprocess
+import sys
+
+# Cold-import budget for the engine in seconds (override with ENGINE_IMPORT_BUDGET)
+IMPORT_BUDGET = float(os.environ.get('ENGINE_IMPORT_BUDGET', '0.25'))
+
+# Modules that must not be loaded just by importing the engine
+HEAVY_MODULES = ('streamlit', 'pandas', 'numpy', 'plotly', 'matplotlib', 'seaborn', 'bcrypt')
+
+PROBE = """
+import sys, time
+started = time.perf_counter()
+import engine
+elapsed = time.perf_counter() - started
+loaded = [name for name in sys.argv[1:] if name in sys.modules]
+print(elapsed, ','.join(loaded))
+"""
+
+def measure_import(runs=3):
+    """Best-of-`runs` cold import time of engine, each in a fresh interpreter"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    best = None
+    loaded = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', PROBE, *HEAVY_MODULES],
+            cwd=here, capture_output=True, text=True, check=True
+        ).stdout.split()
+        elapsed = float(output[0])
+        loaded = output[1].split(',') if len(output) > 1 else []
+        best = elapsed if best is None else min(best, elapsed)
+    return best, loaded
+
+def test_engine_import():
+    elapsed, loaded = measure_import()
+    print(f"engine cold import: {elapsed * 1000:.1f} ms (budget {IMPORT_BUDGET * 1000:.0f} ms)")
+    assert not loaded, f"importing engine loaded {', '.join(loaded)}"
+    assert elapsed <= IMPORT_BUDGET, f"engine import took {elapsed:.3f}s"
+
+if __name__ == "__main__":
+    test_engine_import()
@@ -0,0 +1,74 @@
+import csv
+import io
+import json
+import os
+import tempfile
+import zipfile
+
+from create_database import create_database
+from db import ConnectionPool, insert_projections
+from export import EXPORT_TABLES, export_archive, export_history
+
+def open_pool(directory):
+    path = os.path.join(directory, 'export.db')
+    assert create_database(path)
+    pool = ConnectionPool(path, max_readers=1)
+    with pool.write() as conn:
+        # User 1: three projections, one missing a year; user 2: one projection
+        insert_projections(conn, [
+            (('2025-01-01', 1000.0, 0.05, 0.02, 1),
+             [(2025, 0.0, 100.0, 0.0, 1100.0), (2026, 50.0, 105.0, 0.0, 1200.0)]),
+            (('2025-02-01', 2000.0, 0.06, 0.03, 1),
+             [(2025, 0.0, 200.0, 0.0, 2200.0), (2027, 60.0, 210.0, 5.0, 2500.0)]),
+            (('2025-03-01', 3000.0, 0.07, 0.04, 1), [(2025, 0.0, 300.0, 0.0, 3300.0)]),
+            (('2025-03-01', 4000.0, 0.07, 0.04, 2), [(2025, 0.0, 400.0, 0.0, 4400.0)]),
+        ])
+        conn.executemany("""
+            INSERT INTO actual_values (user_id, year, school_fees, monthly_contribution,
+                                       annual_bonus, actual_balance)
+            VALUES (?, ?, 0, 0, 0, ?)
+        """, [(1, 2025, 1000.0), (1, 2026, 1500.0), (2, 2025, 900.0)])
+    return pool
+
+EXPECTED = {'projections': 3, 'projected_values': 5, 'actual_values': 2}
+
+def read_rows(path, fmt):
+    with open(path, newline='') as export_file:
+        if fmt == 'csv':
+            return list(csv.DictReader(export_file))
+        return [json.loads(line) for line in export_file]
+
+def test_export_counts():
+    for fmt in ('csv', 'jsonl'):
+        with tempfile.TemporaryDirectory() as directory:
+            pool = open_pool(directory)
+            try:
+                output = os.path.join(directory, 'history')
+                assert export_history(pool, 1, output, fmt, batch_size=2) == EXPECTED
+                for table, count in EXPECTED.items():
+                    rows = read_rows(os.path.join(output, f'{table}.{fmt}'), fmt)
+                    assert len(rows) == count, (fmt, table)
+                    assert list(rows[0]) == [name for name, _ in EXPORT_TABLES[table]]
+                values = read_rows(os.path.join(output, f'projected_values.{fmt}'), fmt)
+                assert [float(row['projected_balance']) for row in values] == \
+                    [1100.0, 1200.0, 2200.0, 2500.0, 3300.0]
+            finally:
+                pool.close()
+
+def test_export_archive():
+    with tempfile.TemporaryDirectory() as directory:
+        pool = open_pool(directory)
+        try:
+            archive = io.BytesIO()
+            assert export_archive(pool, 2, archive, 'jsonl') == \
+                {'projections': 1, 'projected_values': 1, 'actual_values': 1}
+            with zipfile.ZipFile(archive) as zipped:
+                assert sorted(zipped.namelist()) == sorted(f'{table}.jsonl' for table in EXPORT_TABLES)
+                assert json.loads(zipped.read('actual_values.jsonl'))['actual_balance'] == 900.0
+        finally:
+            pool.close()
+
+if __name__ == "__main__":
+    test_export_counts()
+    test_export_archive()
+    print("Export tests passed")
@@ -0,0 +1,60 @@
+import math
+
+import numpy as np
+
+from engine import DEFAULT_FEES, DEFAULT_BONUS, solve_monthly_contribution
+from goal_seek import TARGETS, goal_seek
+
+INPUTS = {'seed_capital': 119000.0, 'investment_rate': 0.0878, 'contribution_escalation': 0.05}
+# Below the 14,365 a month the plan needs, so every target has a positive answer
+PAYMENTS = np.array([8000.0, 10000.0, 12000.0, 14000.0])
+
+def required_payment(target, value):
+    inputs = dict(INPUTS)
+    fees = DEFAULT_FEES
+    if target == 'fees_scale':
+        fees = [amount * value for amount in DEFAULT_FEES]
+    else:
+        inputs[target] = value
+    return solve_monthly_contribution(inputs['seed_capital'], inputs['investment_rate'],
+                                      inputs['contribution_escalation'], fees, DEFAULT_BONUS)
+
+def test_every_target_converges():
+    for target in TARGETS:
+        result = goal_seek(target, INPUTS, DEFAULT_FEES, DEFAULT_BONUS, PAYMENTS)
+        assert result['converged'].all(), (target, result)
+        for payment, value in zip(PAYMENTS, result['value']):
+            # The answer makes the given payment exactly the one required
+            assert math.isclose(required_payment(target, value), payment, rel_tol=1e-6), (target, payment)
+
+def test_rates_use_the_root_finder():
+    result = goal_seek('investment_rate', INPUTS, DEFAULT_FEES, DEFAULT_BONUS, PAYMENTS)
+    assert (result['iterations'] > 0).all()
+    # A bigger payment needs a smaller return
+    assert (np.diff(result['value']) < 0).all()
+
+def test_unreachable_and_already_met():
+    # No payment at all and nothing saved: no escalation can help
+    result = goal_seek('contribution_escalation', dict(INPUTS, seed_capital=0.0),
+                       DEFAULT_FEES, DEFAULT_BONUS, 0.0)
+    assert not result['converged'][0] and np.isnan(result['value'][0])
+
+    # Enough seed capital that the plan works at the bottom of the bracket
+    result = goal_seek('investment_rate', dict(INPUTS, seed_capital=1e8),
+                       DEFAULT_FEES, DEFAULT_BONUS, 0.0, bracket=(0.0, 0.5))
+    assert not result['converged'][0] and result['value'][0] == 0.0
+
+def test_fees_scale_without_fees():
+    result = goal_seek('fees_scale', INPUTS, [0.0] * len(DEFAULT_FEES), DEFAULT_BONUS, PAYMENTS)
+    assert not result['applicable'].any()
+    assert np.isnan(result['value']).all() and not result['converged'].any()
+    # With fees, and for the other targets, the answer applies
+    assert goal_seek('fees_scale', INPUTS, DEFAULT_FEES, DEFAULT_BONUS, PAYMENTS)['applicable'].all()
+    assert goal_seek('investment_rate', INPUTS, DEFAULT_FEES, DEFAULT_BONUS, PAYMENTS)['applicable'].all()
+
+if __name__ == "__main__":
+    test_every_target_converges()
+    test_rates_use_the_root_finder()
+    test_unreachable_and_already_met()
+    test_fees_scale_without_fees()
+    print("Goal seek tests passed")
@@ -0,0 +1,92 @@
+import os
+import tempfile
+from datetime import date
+
+from create_database import create_database
+from db import ConnectionPool, HistorySummaryCache, history_count, history_page, insert_projections
+
+VALUES = [(2025, 0.0, 100.0, 0.0, 1100.0), (2026, 50.0, 105.0, 0.0, 1200.0)]
+
+def store(pool, projections):
+    """Insert (projection_date, seed_capital, user_id) projections; returns their ids"""
+    with pool.write() as conn:
+        return insert_projections(conn, [
+            ((projection_date, seed_capital, 0.05, 0.02, user_id), VALUES)
+            for projection_date, seed_capital, user_id in projections
+        ])
+
+def open_pool(directory):
+    path = os.path.join(directory, 'history.db')
+    assert create_database(path)
+    return path, ConnectionPool(path, max_readers=1)
+
+def test_history_pages():
+    with tempfile.TemporaryDirectory() as directory:
+        _, pool = open_pool(directory)
+        try:
+            # Dates repeat, so pages must also break ties on id
+            dates = ['2025-01-01', '2025-03-01', '2025-03-01', '2025-03-01',
+                     '2025-02-01', '2025-04-01', '2025-03-01']
+            ids = store(pool, [(day, 1000.0 * number, 1) for number, day in enumerate(dates)])
+            store(pool, [('2025-03-01', 5.0, 2)])
+            # Newest first: (date, id) descending
+            stored = sorted(((day, projection_id, 1000.0 * number)
+                             for number, (day, projection_id) in enumerate(zip(dates, ids))), reverse=True)
+            expected = [projection_id for _, projection_id, _ in stored]
+
+            with pool.read() as conn:
+                seen, after, pages = [], None, 0
+                while True:
+                    rows, after = history_page(conn, 1, after=after, page_size=2)
+                    seen.extend(row['id'] for row in rows)
+                    pages += 1
+                    if after is None:
+                        break
+                assert seen == expected
+                assert pages == 4
+                assert all(row['value_count'] == 2 for row in rows)
+
+                # A filter applies on every page
+                filters = {'date_from': date(2025, 2, 1), 'max_seed': 5000.0}
+                seen, after = [], None
+                while True:
+                    rows, after = history_page(conn, 1, filters, after, page_size=2)
+                    seen.extend(row['id'] for row in rows)
+                    if after is None:
+                        break
+                assert seen == [projection_id for day, projection_id, seed_capital in stored
+                                if day >= '2025-02-01' and seed_capital <= 5000.0]
+                assert history_count(conn, 1, filters) == len(seen)
+
+                # An exact page ends without an empty one after it
+                rows, after = history_page(conn, 1, page_size=len(dates))
+                assert len(rows) == len(dates) and after is None
+        finally:
+            pool.close()
+
+def test_summary_catches_up():
+    with tempfile.TemporaryDirectory() as directory:
+        path, pool = open_pool(directory)
+        other = ConnectionPool(path, max_readers=1)
+        try:
+            store(pool, [('2025-02-01', 1.0, 1), ('2025-03-01', 2.0, 2)])
+            summaries = HistorySummaryCache(pool)
+            assert summaries.get(1) == {'count': 1, 'first_date': '2025-02-01', 'last_date': '2025-02-01'}
+            assert summaries.get(3) == {'count': 0, 'first_date': None, 'last_date': None}
+
+            # Rows stored through another pool, as by another process
+            store(other, [('2025-01-01', 3.0, 1), ('2025-05-01', 4.0, 1), ('2025-06-01', 5.0, 2)])
+            assert summaries.get(1) == {'count': 3, 'first_date': '2025-01-01', 'last_date': '2025-05-01'}
+            assert summaries.get(2) == {'count': 2, 'first_date': '2025-03-01', 'last_date': '2025-06-01'}
+            assert summaries.get(3)['count'] == 0
+
+            summaries.invalidate(1)
+            assert summaries.get(1)['count'] == 3
+        finally:
+            other.close()
+            pool.close()
+
+if __name__ == "__main__":
+    test_history_pages()
+    test_summary_catches_up()
+    print("History tests passed")
@@ -0,0 +1,58 @@
+import math
+
+from engine import PROJECTION_YEARS, DEFAULT_FEES, DEFAULT_BONUS, calculate_projection
+from incremental import IncrementalProjection
+
+YEARS = list(PROJECTION_YEARS)
+INPUTS = {'seed_capital': 119000.0, 'investment_rate': 0.0878, 'contribution_escalation': 0.05}
+
+def assert_matches_engine(results, fees, bonus):
+    expected = calculate_projection(INPUTS, {'Year': YEARS, 'Fees': fees}, {'Year': YEARS, 'Bonus': bonus})
+    assert list(results) == YEARS
+    for year in YEARS:
+        for key, value in expected[year].items():
+            assert math.isclose(results[year][key], value, rel_tol=1e-9, abs_tol=1e-6), (year, key)
+
+def edited(values, index, value):
+    values = list(values)
+    values[index] = value
+    return values
+
+def test_initial_projection():
+    projection = IncrementalProjection(INPUTS, DEFAULT_FEES, DEFAULT_BONUS)
+    assert_matches_engine(projection.yearly_results, DEFAULT_FEES, DEFAULT_BONUS)
+
+def test_single_year_edits():
+    projection = IncrementalProjection(INPUTS, DEFAULT_FEES, DEFAULT_BONUS)
+    fees, bonus = list(DEFAULT_FEES), list(DEFAULT_BONUS)
+
+    # Higher fees late in the plan: the required payment goes up
+    index = YEARS.index(2035)
+    fees = edited(fees, index, fees[index] * 1.5)
+    payment = projection.monthly_contribution
+    assert_matches_engine(projection.update(fees=fees), fees, bonus)
+    assert projection.monthly_contribution > payment
+
+    # A bigger bonus in one year
+    index = YEARS.index(2030)
+    bonus = edited(bonus, index, bonus[index] + 50000.0)
+    assert_matches_engine(projection.update(bonus=bonus), fees, bonus)
+
+    # No change at all returns the same results
+    assert projection.update(fees=fees, bonus=bonus) is projection.yearly_results
+
+def test_edit_that_keeps_the_payment():
+    # An edit to the final year's bonus leaves earlier years' results as they were
+    projection = IncrementalProjection(INPUTS, DEFAULT_FEES, DEFAULT_BONUS)
+    before = dict(projection.yearly_results)
+    bonus = edited(DEFAULT_BONUS, -1, DEFAULT_BONUS[-1] + 1000.0)
+    results = projection.update(bonus=bonus)
+    assert_matches_engine(results, DEFAULT_FEES, bonus)
+    assert all(results[year] is before[year] for year in YEARS[:-1])
+    assert results[YEARS[-1]]['balance'] == before[YEARS[-1]]['balance'] + 1000.0
+
+if __name__ == "__main__":
+    test_initial_projection()
+    test_single_year_edits()
+    test_edit_that_keeps_the_payment()
+    print("Incremental projection tests passed")
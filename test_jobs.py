@@ -0,0 +1,152 @@
+import os
+import tempfile
+import time
+
+import jobs
+from create_database import create_database
+from db import ConnectionPool
+from engine import PROJECTION_YEARS, DEFAULT_FEES, DEFAULT_BONUS, calculate_projection, store_projection
+
+def open_pool(directory):
+    path = os.path.join(directory, 'jobs.db')
+    assert create_database(path)
+    return ConnectionPool(path, max_readers=1)
+
+def make_stale(pool, job_id):
+    with pool.write() as conn:
+        conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ?", (time.time() - 3600, job_id))
+
+def test_claim_in_order_once():
+    with tempfile.TemporaryDirectory() as directory:
+        pool = open_pool(directory)
+        try:
+            first = jobs.submit(pool, 'simulation', {'n': 1}, user_id=7)
+            second = jobs.submit(pool, 'simulation', {'n': 2})
+            claimed = jobs.claim(pool, 'w1')
+            assert (claimed['id'], claimed['params'], claimed['status'], claimed['attempts']) == \
+                (first, {'n': 1}, 'running', 1)
+            assert jobs.claim(pool, 'w2')['id'] == second
+            assert jobs.claim(pool, 'w3') is None
+            assert [job['id'] for job in jobs.user_jobs(pool, 7)] == [first]
+        finally:
+            pool.close()
+
+def test_cancel():
+    with tempfile.TemporaryDirectory() as directory:
+        pool = open_pool(directory)
+        reports = []
+
+        def cancelling_job(pool, job, progress):
+            progress(0.25)
+            reports.append(0.25)
+            jobs.cancel(pool, job['id'])
+            progress(1.0)
+            reports.append(1.0)
+
+        jobs.JOB_KINDS['test'] = cancelling_job
+        try:
+            queued = jobs.submit(pool, 'simulation', {})
+            assert jobs.cancel(pool, queued)
+            assert jobs.job_status(pool, queued)['status'] == 'cancelled'
+            assert not jobs.cancel(pool, queued)
+
+            running = jobs.submit(pool, 'test', {})
+            assert jobs.run_pending(pool) == [running]
+            # The progress report after cancel() stopped the job
+            assert reports == [0.25]
+            assert jobs.job_status(pool, running)['status'] == 'cancelled'
+            assert jobs.job_result(pool, running) is None
+        finally:
+            del jobs.JOB_KINDS['test']
+            pool.close()
+
+def test_requeue_stale():
+    with tempfile.TemporaryDirectory() as directory:
+        pool = open_pool(directory)
+        attempts = []
+
+        def checkpointing_job(pool, job, progress):
+            attempts.append(progress.checkpoint)
+            progress.save_checkpoint({'done': len(attempts)})
+            return {'attempts': len(attempts)}
+
+        jobs.JOB_KINDS['test'] = checkpointing_job
+        try:
+            job_id = jobs.submit(pool, 'test', {})
+            # A worker dies after saving a checkpoint
+            assert jobs.claim(pool, 'w1')['id'] == job_id
+            jobs._Progress(pool, job_id).save_checkpoint({'done': 0})
+            assert jobs.requeue_stale(pool) == 0
+            make_stale(pool, job_id)
+            assert jobs.requeue_stale(pool) == 1
+            status = jobs.job_status(pool, job_id)
+            assert (status['status'], status['worker'], status['checkpoint']) == ('queued', None, {'done': 0})
+
+            # The retry sees the checkpoint and finishes
+            assert jobs.run_pending(pool) == [job_id]
+            assert attempts == [{'done': 0}]
+            assert jobs.job_result(pool, job_id) == {'attempts': 1}
+            assert jobs.job_status(pool, job_id)['attempts'] == 2
+
+            # Out of attempts: failed rather than requeued
+            job_id = jobs.submit(pool, 'test', {})
+            for _ in range(jobs.MAX_ATTEMPTS):
+                assert jobs.claim(pool, 'w1')['id'] == job_id
+                make_stale(pool, job_id)
+                jobs.requeue_stale(pool)
+            status = jobs.job_status(pool, job_id)
+            assert (status['status'], status['error']) == ('failed', 'Worker stopped responding')
+        finally:
+            del jobs.JOB_KINDS['test']
+            pool.close()
+
+def test_superseded_worker_keeps_retry():
+    with tempfile.TemporaryDirectory() as directory:
+        pool = open_pool(directory)
+        jobs.JOB_KINDS['test'] = lambda pool, job, progress: {'worker': job['worker']}
+        try:
+            job_id = jobs.submit(pool, 'test', {})
+            stalled = jobs.claim(pool, 'w1')
+            make_stale(pool, job_id)
+            assert jobs.requeue_stale(pool) == 1
+            retry = jobs.claim(pool, 'w2')
+            assert jobs.run_job(pool, retry) == 'done'
+
+            # The first worker finishing late does not overwrite the retry
+            assert jobs.run_job(pool, stalled) is None
+            assert jobs.job_result(pool, job_id) == {'worker': 'w2'}
+            status = jobs.job_status(pool, job_id)
+            assert (status['status'], status['worker'], status['attempts']) == ('done', 'w2', 2)
+        finally:
+            del jobs.JOB_KINDS['test']
+            pool.close()
+
+def test_reproject_persist_updates_in_place():
+    with tempfile.TemporaryDirectory() as directory:
+        pool = open_pool(directory)
+        fees = {'Year': list(PROJECTION_YEARS), 'Fees': DEFAULT_FEES}
+        bonus = {'Year': list(PROJECTION_YEARS), 'Bonus': DEFAULT_BONUS}
+        try:
+            for seed_capital, user_id in ((100000.0, 1), (150000.0, 1), (50000.0, 2)):
+                inputs = {'seed_capital': seed_capital, 'investment_rate': 0.0878,
+                          'contribution_escalation': 0.05}
+                store_projection(pool, inputs, calculate_projection(inputs, fees, bonus), user_id)
+            output = os.path.join(directory, 'nightly.csv')
+            # Twice, as on two nights
+            for _ in range(2):
+                job_id = jobs.submit(pool, 'reproject', {'output': output, 'persist': True}, user_id=1)
+                assert jobs.run_pending(pool) == [job_id]
+                assert jobs.job_result(pool, job_id)['scenarios'] == 2
+            with pool.read() as conn:
+                owners = conn.execute("SELECT user_id, COUNT(*) FROM projections GROUP BY user_id").fetchall()
+            assert [tuple(row) for row in owners] == [(1, 2), (2, 1)]
+        finally:
+            pool.close()
+
+if __name__ == "__main__":
+    test_claim_in_order_once()
+    test_cancel()
+    test_requeue_stale()
+    test_superseded_worker_keeps_retry()
+    test_reproject_persist_updates_in_place()
+    print("Job tests passed")
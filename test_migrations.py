@@ -0,0 +1,141 @@
+import logging
+import math
+import os
+import sqlite3
+import tempfile
+
+import migrations
+from create_database import assign_actual_values
+from db import ConnectionPool, projection_series, series_values
+
+def database_at(path, version):
+    """A database migrated only up to `version`"""
+    conn = sqlite3.connect(path)
+    latest = migrations.MIGRATIONS
+    migrations.MIGRATIONS = [migration for migration in latest if migration[0] <= version]
+    try:
+        migrations.migrate(conn)
+    finally:
+        migrations.MIGRATIONS = latest
+    assert migrations.schema_version(conn) == version
+    return conn
+
+def test_packed_series_migration():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'old.db')
+        conn = database_at(path, 3)
+        conn.execute("""
+            INSERT INTO projections (id, projection_date, seed_capital, investment_rate, contribution_escalation)
+            VALUES (1, '2024-01-01', 1000, 0.05, 0.02), (2, '2024-02-01', 2000, 0.06, 0.03)
+        """)
+        # Projection 1 has no 2026 row and a repeated 2025 row; projection 2 shares its fees
+        conn.executemany("""
+            INSERT INTO projected_values (projection_id, year, school_fees, monthly_contribution,
+                                          annual_bonus, projected_balance)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, [
+            (1, 2025, 0.0, 100.0, 5.0, 1100.0),
+            (1, 2025, 9.0, 999.0, 9.0, 9999.0),
+            (1, 2027, 50.0, 110.0, 6.0, 1200.0),
+            (2, 2025, 0.0, 200.0, 7.0, 2200.0),
+            (2, 2026, float('nan'), 205.0, 7.0, 2300.0),
+            (2, 2027, 50.0, 210.0, 7.0, 2400.0),
+        ])
+        conn.commit()
+        migrations.migrate(conn)
+        assert migrations.schema_version(conn) == migrations.LATEST_VERSION
+        assert 'projected_values' not in {
+            row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+        }
+
+        first_year, contributions, balances = conn.execute(
+            "SELECT first_year, monthly_contributions, balances FROM projection_series WHERE projection_id = 1"
+        ).fetchone()
+        assert first_year == 2025
+        # The first row for a year wins, and the missing year is NaN
+        assert series_values(contributions)[0::2] == [100.0, 110.0]
+        assert series_values(balances)[0::2] == [1100.0, 1200.0]
+        assert math.isnan(series_values(balances)[1])
+        # Both projections' fees pack to the same schedule, stored once
+        fees = conn.execute("""
+            SELECT DISTINCT s.amounts FROM projections p JOIN schedules s ON s.id = p.fees_schedule_id
+        """).fetchall()
+        assert len(fees) == 1
+        assert [value for value in series_values(fees[0][0]) if value == value] == [0.0, 50.0]
+        conn.close()
+
+        pool = ConnectionPool(path, max_readers=1)
+        try:
+            with pool.read() as conn:
+                series = projection_series(conn, 1)
+                assert series['year'].tolist() == [2025, 2027]
+                assert series['projected_balance'].tolist() == [1100.0, 1200.0]
+                assert series['annual_bonus'].tolist() == [5.0, 6.0]
+                assert projection_series(conn, 2)['year'].tolist() == [2025, 2026, 2027]
+        finally:
+            pool.close()
+
+def shared_actual_values(path, usernames):
+    """A version 6 database with shared actual values for 2025 and 2026"""
+    conn = database_at(path, 6)
+    conn.executemany("INSERT INTO users (username, password_hash) VALUES (?, 'x')",
+                     [(username,) for username in usernames])
+    conn.executemany("""
+        INSERT INTO actual_values (year, school_fees, monthly_contribution, annual_bonus, actual_balance)
+        VALUES (?, 10, 20, 30, ?)
+    """, [(2025, 1000.0), (2026, 2000.0)])
+    conn.commit()
+    return conn
+
+def owned_actual_values(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT user_id, year FROM actual_values ORDER BY user_id, year").fetchall()
+    finally:
+        conn.close()
+
+def test_actual_values_migration():
+    with tempfile.TemporaryDirectory() as directory:
+        # The oldest account gets the shared rows, and the migration says so
+        path = os.path.join(directory, 'users.db')
+        conn = shared_actual_values(path, ['alice', 'bob'])
+        warnings = []
+        handler = logging.Handler()
+        handler.emit = warnings.append
+        migrations.logger.addHandler(handler)
+        try:
+            migrations.migrate(conn)
+        finally:
+            migrations.logger.removeHandler(handler)
+            conn.close()
+        assert owned_actual_values(path) == [(1, 2025), (1, 2026)]
+        assert [record.getMessage() for record in warnings] == \
+            ["Migration 7: 2 shared actual value rows assigned to user 1"]
+
+        # Moved to the user they belonged to, except a year bob already has
+        pool = ConnectionPool(path, max_readers=1)
+        try:
+            with pool.write() as conn:
+                conn.execute("""
+                    INSERT INTO actual_values (user_id, year, actual_balance) VALUES (2, 2026, 5.0)
+                """)
+        finally:
+            pool.close()
+        assert assign_actual_values(path, 'bob', 'alice') == 1
+        assert owned_actual_values(path) == [(1, 2026), (2, 2025), (2, 2026)]
+
+        # Without any user the rows wait for an owner
+        path = os.path.join(directory, 'empty.db')
+        conn = shared_actual_values(path, [])
+        migrations.migrate(conn)
+        conn.execute("INSERT INTO users (username, password_hash) VALUES ('carol', 'x')")
+        conn.commit()
+        conn.close()
+        assert owned_actual_values(path) == [(None, 2025), (None, 2026)]
+        assert assign_actual_values(path, 'carol') == 2
+        assert owned_actual_values(path) == [(1, 2025), (1, 2026)]
+
+if __name__ == "__main__":
+    test_packed_series_migration()
+    test_actual_values_migration()
+    print("Migration tests passed")
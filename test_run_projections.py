@@ -0,0 +1,49 @@
+import os
+import tempfile
+
+from create_database import create_database
+from db import ConnectionPool, pack_series, projection_series
+from engine import PROJECTION_YEARS, DEFAULT_FEES, DEFAULT_BONUS, calculate_projection, store_projection
+from run_projections import CsvResultWriter, run_projections, stored_scenarios
+
+FEES = {'Year': list(PROJECTION_YEARS), 'Fees': DEFAULT_FEES}
+BONUS = {'Year': list(PROJECTION_YEARS), 'Bonus': DEFAULT_BONUS}
+
+def inputs(seed_capital):
+    return {'seed_capital': seed_capital, 'investment_rate': 0.0878, 'contribution_escalation': 0.05}
+
+def test_from_db_persist_updates_in_place():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'projections.db')
+        assert create_database(path)
+        pool = ConnectionPool(path, max_readers=1)
+        try:
+            ids = [store_projection(pool, inputs(seed_capital),
+                                    calculate_projection(inputs(seed_capital), FEES, BONUS), user_id)
+                   for seed_capital, user_id in ((100000.0, 1), (150000.0, 1), (50000.0, 2))]
+            # Stale stored balances, as if saved by an older engine
+            with pool.write() as conn:
+                conn.execute("UPDATE projection_series SET balances = ?",
+                             (pack_series([0.0] * len(PROJECTION_YEARS)),))
+
+            for _ in range(2):
+                writer = CsvResultWriter(os.path.join(directory, 'nightly.csv'))
+                try:
+                    stats = run_projections(stored_scenarios(pool), writer, workers=1, pool=pool)
+                finally:
+                    writer.close()
+                assert stats['scenarios'] == 3
+
+            with pool.read() as conn:
+                owners = conn.execute("SELECT id, user_id FROM projections ORDER BY id").fetchall()
+                assert [tuple(row) for row in owners] == list(zip(ids, (1, 1, 2)))
+                for projection_id, seed_capital in zip(ids, (100000.0, 150000.0, 50000.0)):
+                    expected = calculate_projection(inputs(seed_capital), FEES, BONUS)
+                    balances = projection_series(conn, projection_id)['projected_balance']
+                    assert balances.tolist() == [expected[year]['balance'] for year in PROJECTION_YEARS]
+        finally:
+            pool.close()
+
+if __name__ == "__main__":
+    test_from_db_persist_updates_in_place()
+    print("Run projections tests passed")
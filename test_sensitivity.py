@@ -0,0 +1,53 @@
+import math
+
+import numpy as np
+
+from engine import (PROJECTION_YEARS, DEFAULT_FEES, DEFAULT_BONUS, calculate_projection,
+                    solve_monthly_contribution)
+from sensitivity import sensitivity_grid, tornado
+
+YEARS = list(PROJECTION_YEARS)
+INPUTS = {'seed_capital': 119000.0, 'investment_rate': 0.0878, 'contribution_escalation': 0.05}
+RATES = [0.02, 0.0878, 0.12]
+ESCALATIONS = [0.0, 0.05, 0.08, 0.1]
+
+def test_grid_matches_scalar_solver():
+    grid = sensitivity_grid(INPUTS, DEFAULT_FEES, DEFAULT_BONUS, RATES, ESCALATIONS)
+    assert grid['monthly_contribution'].shape == (len(ESCALATIONS), len(RATES))
+    for row, escalation in enumerate(ESCALATIONS):
+        for column, rate in enumerate(RATES):
+            expected = solve_monthly_contribution(INPUTS['seed_capital'], rate, escalation,
+                                                  DEFAULT_FEES, DEFAULT_BONUS)
+            assert math.isclose(grid['monthly_contribution'][row, column], expected, rel_tol=1e-9)
+
+    # The unchanged plan's cell, at its own required contribution
+    projection = calculate_projection(INPUTS, {'Year': YEARS, 'Fees': DEFAULT_FEES},
+                                      {'Year': YEARS, 'Bonus': DEFAULT_BONUS})
+    base = (ESCALATIONS.index(0.05), RATES.index(0.0878))
+    assert math.isclose(grid['fixed_contribution'], projection[YEARS[0]]['monthly_contribution'], rel_tol=1e-9)
+    assert math.isclose(grid['final_balance'][base], projection[YEARS[-1]]['balance'],
+                        rel_tol=1e-9, abs_tol=1e-6)
+    assert grid['minimum_balance'][base] >= -1e-6
+
+def test_tornado_inputs():
+    result = tornado(dict(INPUTS, seed_capital=0.0), DEFAULT_FEES, DEFAULT_BONUS, YEARS)
+    fee_years = sum(1 for amount in DEFAULT_FEES if amount)
+    bonus_years = sum(1 for amount in DEFAULT_BONUS if amount)
+    assert len(result['names']) == 3 + fee_years + bonus_years
+    assert result['names'][0] == 'Seed Capital (+R 10,000)'
+    assert sum(name.endswith(' Bonus') for name in result['names']) == bonus_years
+
+    # Seed capital of 0 cannot go lower, so its low case is the base plan
+    base = result['base']['monthly_contribution']
+    assert result['low']['monthly_contribution'][0] == base
+    assert result['high']['monthly_contribution'][0] < base
+    # More bonus means a smaller payment
+    bonus = slice(3 + fee_years, None)
+    assert (result['high']['monthly_contribution'][bonus] <= base).all()
+    assert (result['low']['monthly_contribution'][bonus] >= base).all()
+    assert np.isfinite(result['low']['final_balance']).all()
+
+if __name__ == "__main__":
+    test_grid_matches_scalar_solver()
+    test_tornado_inputs()
+    print("Sensitivity tests passed")
@@ -0,0 +1,117 @@
+import os
+import tempfile
+
+from create_database import create_database
+from db import ConnectionPool, INSERT_VARIANCE, reassign_actual_values, year_variance
+from engine import (PROJECTION_YEARS, DEFAULT_FEES, DEFAULT_BONUS, calculate_projection,
+                    save_actual_values, store_projection)
+
+FEES = {'Year': list(PROJECTION_YEARS), 'Fees': DEFAULT_FEES}
+BONUS = {'Year': list(PROJECTION_YEARS), 'Bonus': DEFAULT_BONUS}
+YEAR = list(PROJECTION_YEARS)[3]
+
+def actual(balance):
+    return {'school_fees': 50000.0, 'monthly_contribution': 9000.0,
+            'annual_bonus': 0.0, 'balance': balance}
+
+def save(pool, seed_capital, user_id):
+    inputs = {'seed_capital': seed_capital, 'investment_rate': 0.0878, 'contribution_escalation': 0.05}
+    results = calculate_projection(inputs, FEES, BONUS)
+    return store_projection(pool, inputs, results, user_id), results
+
+def expected(projection_id, results, user_id, values, year=YEAR):
+    row = results[year]
+    return (projection_id, year, user_id, row['balance'] - values['balance'],
+            row['school_fees'] - values['school_fees'],
+            row['monthly_contribution'] - values['monthly_contribution'])
+
+def variance_rows(pool, year=YEAR):
+    with pool.read() as conn:
+        return set(map(tuple, conn.execute("""
+            SELECT projection_id, year, user_id, balance_variance,
+                   fees_variance, contribution_variance
+            FROM projection_variance WHERE year = ?
+        """, (year,))))
+
+def open_pool(directory):
+    path = os.path.join(directory, 'variance.db')
+    assert create_database(path)
+    pool = ConnectionPool(path, max_readers=1)
+    with pool.write() as conn:
+        for username in ('alice', 'bob'):
+            conn.execute("INSERT INTO users (username, password_hash) VALUES (?, 'x')", (username,))
+    return pool
+
+def test_variance_follows_saves():
+    with tempfile.TemporaryDirectory() as directory:
+        pool = open_pool(directory)
+        try:
+            first, first_results = save(pool, 119000.0, 1)
+            other, other_results = save(pool, 50000.0, 2)
+            # No actual values yet, so nothing to compare with
+            assert variance_rows(pool) == set()
+
+            save_actual_values(pool, YEAR, actual(200000.0), 1)
+            assert variance_rows(pool) == {expected(first, first_results, 1, actual(200000.0))}
+
+            # A projection saved later is compared with the actual values already there
+            second, second_results = save(pool, 150000.0, 1)
+            assert variance_rows(pool) == {
+                expected(first, first_results, 1, actual(200000.0)),
+                expected(second, second_results, 1, actual(200000.0)),
+            }
+
+            # Saving the year again replaces its rows, and leaves other users alone
+            save_actual_values(pool, YEAR, actual(150000.0), 2)
+            save_actual_values(pool, YEAR, actual(250000.0), 1)
+            assert variance_rows(pool) == {
+                expected(first, first_results, 1, actual(250000.0)),
+                expected(second, second_results, 1, actual(250000.0)),
+                expected(other, other_results, 2, actual(150000.0)),
+            }
+            # Other years have no actual values
+            assert variance_rows(pool, YEAR + 1) == set()
+        finally:
+            pool.close()
+
+def test_year_variance_ranges():
+    with tempfile.TemporaryDirectory() as directory:
+        pool = open_pool(directory)
+        try:
+            first, first_results = save(pool, 119000.0, 1)
+            second, second_results = save(pool, 150000.0, 1)
+            values = actual(200000.0)
+            args = (1, YEAR, (values['school_fees'], values['monthly_contribution'], values['balance']))
+            with pool.read() as conn:
+                assert year_variance(conn, *args, through_id=first) == \
+                    [expected(first, first_results, 1, values)]
+                assert year_variance(conn, *args, after_id=first) == \
+                    [expected(second, second_results, 1, values)]
+                # Years outside the projection have no value to compare
+                assert year_variance(conn, 1, PROJECTION_YEARS.start - 1, args[2]) == []
+                assert year_variance(conn, 1, PROJECTION_YEARS.stop, args[2]) == []
+            with pool.write() as conn:
+                conn.executemany(INSERT_VARIANCE, year_variance(conn, *args))
+            assert len(variance_rows(pool)) == 2
+        finally:
+            pool.close()
+
+def test_reassigned_actual_values_move_their_variance():
+    with tempfile.TemporaryDirectory() as directory:
+        pool = open_pool(directory)
+        try:
+            save(pool, 119000.0, 1)
+            other, other_results = save(pool, 50000.0, 2)
+            save_actual_values(pool, YEAR, actual(200000.0), 1)
+            assert reassign_actual_values(pool, 2, 1) == 1
+            assert variance_rows(pool) == {expected(other, other_results, 2, actual(200000.0))}
+            # Nothing left to move
+            assert reassign_actual_values(pool, 2, 1) == 0
+        finally:
+            pool.close()
+
+if __name__ == "__main__":
+    test_variance_follows_saves()
+    test_year_variance_ranges()
+    test_reassigned_actual_values_move_their_variance()
+    print("Variance tests passed")